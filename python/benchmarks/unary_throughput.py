@@ -0,0 +1,226 @@
+"""Measures traced unary RPC throughput across increasing numbers of threads."""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import itertools
+import sys
+import threading
+import time
+from concurrent import futures
+
+import grpc
+import opentracing
+
+from grpc_opentracing import open_tracing_client_interceptor,\
+    open_tracing_server_interceptor
+from grpc_opentracing.grpcext import intercept_channel, intercept_server
+
+_METHOD = '/benchmark/UnaryUnary'
+_REQUEST = b'\x00' * 64
+
+
+class _SpanContext(opentracing.SpanContext):
+
+    def __init__(self, span_id):
+        self.span_id = span_id
+
+
+class _Span(opentracing.Span):
+
+    def __init__(self, tracer, span_id, tags):
+        super(_Span, self).__init__(tracer, _SpanContext(span_id))
+        self.tags = dict(tags) if tags else {}
+        self.logs = []
+
+    def set_tag(self, key, value):
+        self.tags[key] = value
+        return self
+
+    def log_kv(self, key_values, timestamp=None):
+        self.logs.append(key_values)
+        return self
+
+
+class _Tracer(opentracing.Tracer):
+    """A tracer that allocates real spans without reporting them.
+
+  Span ids are drawn from per-thread sequences so that the tracer itself does
+  not serialize the threads being measured.
+  """
+
+    def __init__(self):
+        super(_Tracer, self).__init__()
+        self._local = threading.local()
+
+    def start_span(self,
+                   operation_name=None,
+                   child_of=None,
+                   references=None,
+                   tags=None,
+                   start_time=None,
+                   ignore_active_span=False):
+        ids = getattr(self._local, 'ids', None)
+        if ids is None:
+            ids = self._local.ids = itertools.count(threading.current_thread()
+                                                    .ident << 32)
+        return _Span(self, next(ids), tags)
+
+    def inject(self, span_context, format, carrier):
+        carrier['span-id'] = str(span_context.span_id)
+
+    def extract(self, format, carrier):
+        return _SpanContext(int(carrier['span-id']))
+
+
+class _ClientInfo(
+        collections.namedtuple('_ClientInfo', ('full_method', 'timeout'))):
+    pass
+
+
+class _ServerInfo(collections.namedtuple('_ServerInfo', ('full_method',))):
+    pass
+
+
+class _ServicerContext(object):
+
+    def __init__(self, metadata):
+        self._metadata = metadata
+
+    def invocation_metadata(self):
+        return self._metadata
+
+    def peer(self):
+        return 'ipv4:127.0.0.1:50051'
+
+    def time_remaining(self):
+        return None
+
+    def set_code(self, code):
+        pass
+
+    def set_details(self, details):
+        pass
+
+
+def _handle(request, servicer_context):
+    return request
+
+
+def _direct_call_factory(tracer):
+    """Invokes the interceptors directly, without gRPC."""
+    client_interceptor = open_tracing_client_interceptor(tracer)
+    server_interceptor = open_tracing_server_interceptor(tracer)
+    client_info = _ClientInfo(_METHOD, None)
+    server_info = _ServerInfo(_METHOD)
+
+    def invoker(request, metadata):
+        return server_interceptor.intercept_unary(
+            request, _ServicerContext(metadata), server_info, _handle)
+
+    def call():
+        return client_interceptor.intercept_unary(_REQUEST, None, client_info,
+                                                  invoker)
+
+    return call, lambda: None
+
+
+def _grpc_call_factory(tracer, max_threads):
+
+    class _GenericHandler(grpc.GenericRpcHandler):
+
+        def service(self, handler_call_details):
+            if handler_call_details.method == _METHOD:
+                return grpc.unary_unary_rpc_method_handler(_handle)
+            return None
+
+    server = intercept_server(
+        grpc.server(futures.ThreadPoolExecutor(max_workers=max_threads)),
+        open_tracing_server_interceptor(tracer))
+    server.add_generic_rpc_handlers((_GenericHandler(),))
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    channel = intercept_channel(
+        grpc.insecure_channel('127.0.0.1:%d' % port),
+        open_tracing_client_interceptor(tracer))
+    multi_callable = channel.unary_unary(_METHOD)
+
+    def call():
+        return multi_callable(_REQUEST)
+
+    return call, lambda: server.stop(None)
+
+
+def _measure(call, num_threads, duration):
+    counts = [0] * num_threads
+    start = threading.Event()
+    stop = threading.Event()
+
+    def run(index):
+        start.wait()
+        count = 0
+        while not stop.is_set():
+            call()
+            count += 1
+        counts[index] = count
+
+    threads = [
+        threading.Thread(target=run, args=(index,))
+        for index in range(num_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    begin = time.time()
+    start.set()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.time() - begin)
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--transport',
+        choices=('none', 'grpc'),
+        default='none',
+        help='invoke the interceptors directly or through a local gRPC server')
+    parser.add_argument(
+        '--max_threads',
+        type=int,
+        default=8,
+        help='the largest number of calling threads to measure')
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=2.0,
+        help='seconds to measure each number of threads for')
+    args = parser.parse_args()
+
+    tracer = _Tracer()
+    if args.transport == 'grpc':
+        call, close = _grpc_call_factory(tracer, args.max_threads)
+    else:
+        call, close = _direct_call_factory(tracer)
+
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('python %s, GIL %s, transport %s' %
+          (sys.version.split()[0], 'enabled'
+           if is_gil_enabled else 'disabled', args.transport))
+    print('%8s %14s %8s' % ('threads', 'rpcs/s', 'scaling'))
+    baseline = None
+    try:
+        for num_threads in range(1, args.max_threads + 1):
+            throughput = _measure(call, num_threads, args.duration)
+            if baseline is None:
+                baseline = throughput
+            print('%8d %14.0f %7.2fx' % (num_threads, throughput,
+                                         throughput / baseline))
+    finally:
+        close()
+
+
+if __name__ == '__main__':
+    run()
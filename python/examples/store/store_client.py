@@ -9,7 +9,7 @@ import grpc
 from jaeger_client import Config
 
 from grpc_opentracing import open_tracing_client_interceptor, \
-                             SpanDecorator
+                             SpanDecorator, field_extractor
 from grpc_opentracing.grpcext import intercept_channel
 
 import store_pb2
@@ -161,11 +161,27 @@ def read_and_execute(command_executer):
             break
 
 
+# The message fields to tag spans with, read straight from the messages.
+_FIELDS = {
+    '/store.Store/AddItem': {'AddItemRequest.name': 'store.item'},
+    '/store.Store/AddItems': {'AddItemRequest.name': 'store.item'},
+    '/store.Store/RemoveItem': {'RemoveItemRequest.name': 'store.item'},
+    '/store.Store/RemoveItems': {'RemoveItemRequest.name': 'store.item'},
+    '/store.Store/QueryQuantity': {
+        'QueryItemRequest.name': 'store.item',
+        'QuantityResponse.count': 'store.count',
+    },
+    '/store.Store/QueryQuantities': {
+        'QueryItemRequest.name': 'store.item',
+        'QuantityResponse.count': 'store.count',
+    },
+}
+
+
 class StoreSpanDecorator(SpanDecorator):
 
     def __call__(self, span, rpc_info):
         span.set_tag('grpc.method', rpc_info.full_method)
-        span.set_tag('grpc.headers', str(rpc_info.metadata))
         span.set_tag('grpc.deadline', str(rpc_info.timeout))
 
 
@@ -192,10 +208,15 @@ def run():
         service_name='store-client')
     tracer = config.initialize_tracer()
     span_decorator = None
+    extractor = None
     if args.include_grpc_tags:
         span_decorator = StoreSpanDecorator()
+        extractor = field_extractor(_FIELDS)
     tracer_interceptor = open_tracing_client_interceptor(
-        tracer, log_payloads=args.log_payloads, span_decorator=span_decorator)
+        tracer,
+        log_payloads=args.log_payloads,
+        span_decorator=span_decorator,
+        field_extractor=extractor)
     channel = grpc.insecure_channel('localhost:50051')
     channel = intercept_channel(channel, tracer_interceptor)
     stub = store_pb2.StoreStub(channel)
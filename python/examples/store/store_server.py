@@ -12,7 +12,7 @@ from concurrent import futures
 from jaeger_client import Config
 
 from grpc_opentracing import open_tracing_server_interceptor, \
-                             SpanDecorator
+                             SpanDecorator, field_extractor
 from grpc_opentracing.grpcext import intercept_server
 
 import store_pb2
@@ -66,11 +66,27 @@ class Store(store_pb2.StoreServicer):
             yield store_pb2.QuantityResponse(name=request.name, count=count)
 
 
+# The message fields to tag spans with, read straight from the messages.
+_FIELDS = {
+    '/store.Store/AddItem': {'AddItemRequest.name': 'store.item'},
+    '/store.Store/AddItems': {'AddItemRequest.name': 'store.item'},
+    '/store.Store/RemoveItem': {'RemoveItemRequest.name': 'store.item'},
+    '/store.Store/RemoveItems': {'RemoveItemRequest.name': 'store.item'},
+    '/store.Store/QueryQuantity': {
+        'QueryItemRequest.name': 'store.item',
+        'QuantityResponse.count': 'store.count',
+    },
+    '/store.Store/QueryQuantities': {
+        'QueryItemRequest.name': 'store.item',
+        'QuantityResponse.count': 'store.count',
+    },
+}
+
+
 class StoreSpanDecorator(SpanDecorator):
 
     def __call__(self, span, rpc_info):
         span.set_tag('grpc.method', rpc_info.full_method)
-        span.set_tag('grpc.headers', str(rpc_info.metadata))
         span.set_tag('grpc.deadline', str(rpc_info.timeout))
 
 
@@ -97,10 +113,15 @@ def serve():
         service_name='store-server')
     tracer = config.initialize_tracer()
     span_decorator = None
+    extractor = None
     if args.include_grpc_tags:
         span_decorator = StoreSpanDecorator()
+        extractor = field_extractor(_FIELDS)
     tracer_interceptor = open_tracing_server_interceptor(
-        tracer, log_payloads=args.log_payloads, span_decorator=span_decorator)
+        tracer,
+        log_payloads=args.log_payloads,
+        span_decorator=span_decorator,
+        field_extractor=extractor)
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
     server = intercept_server(server, tracer_interceptor)
 
@@ -48,49 +48,612 @@ class SpanDecorator(six.with_metaclass(abc.ABCMeta)):
         raise NotImplementedError()
 
 
+class SpanFinisher(six.with_metaclass(abc.ABCMeta)):
+    """Provides a mechanism to complete RPC spans off of the RPC's thread.
+
+  When an interceptor is given a SpanFinisher, the end-of-RPC work on a span
+  (payload and error logging, running the SpanDecorator and calling
+  span.finish()) is recorded while the RPC runs and handed to the finisher
+  as a single unit of work once the span would otherwise have been finished.
+  """
+
+    @abc.abstractmethod
+    def submit(self, work):
+        """Schedules the completion of a span.
+
+    Args:
+      work: A callable taking no arguments that completes the span.
+
+    Returns:
+      True if the work was accepted, False if it was dropped.
+    """
+        raise NotImplementedError()
+
+
+def background_span_finisher(max_queue_size=1024, num_threads=1):
+    """Creates a SpanFinisher that completes spans on background threads.
+
+  Work is placed on a bounded queue drained by daemon worker threads. When the
+  queue is full the work is dropped, and the span is never finished, rather
+  than blocking the RPC.
+
+  Args:
+    max_queue_size: The maximum number of spans waiting to be completed.
+    num_threads: The number of worker threads draining the queue.
+
+  Returns:
+    A SpanFinisher. In addition to submit(), it provides counters(), returning
+    a dict with the number of 'queued', 'completed', 'dropped' and 'failed'
+    spans, flush(timeout=None), which waits for queued work to complete and
+    returns whether it did, and close(timeout=None), which flushes and stops
+    the worker threads.
+  """
+    from grpc_opentracing import _finisher
+    return _finisher.BackgroundSpanFinisher(max_queue_size, num_threads)
+
+
+def baggage_limits(max_items=None,
+                   max_bytes=None,
+                   allowed_keys=None,
+                   header_prefixes=('ot-baggage-', 'uberctx-')):
+    """Creates limits on the baggage the interceptors propagate.
+
+  Interceptors given limits remove the baggage entries beyond them from the
+  text metadata they inject span contexts into and from the invocation
+  metadata before extracting span contexts from it, so a single large baggage
+  item cannot inflate the metadata of every hop. Entries are recognized by the
+  prefixes tracers put in front of baggage keys; binary and codec propagation
+  are not limited.
+
+  Args:
+    max_items: The maximum number of baggage items, or None for no limit.
+    max_bytes: The maximum total size of the keys and values of the baggage
+      entries, or None for no limit.
+    allowed_keys: An optional collection of the baggage keys to propagate.
+      Baggage items with other keys are removed.
+    header_prefixes: The prefixes of the metadata keys of baggage entries,
+      which depend on the tracer.
+
+  Returns:
+    Limits to pass to open_tracing_client_interceptor or
+    open_tracing_server_interceptor. They provide counters(), returning a dict
+    with the number of baggage items removed because they were 'disallowed',
+    'over_max_items' or 'over_max_bytes'.
+  """
+    from grpc_opentracing import _baggage
+    return _baggage.BaggageLimits(max_items, max_bytes, allowed_keys,
+                                  header_prefixes)
+
+
+def field_extractor(fields):
+    """Creates an extractor of protobuf message fields into span tags and logs.
+
+  Interceptors given an extractor read the declared fields of the request and
+  response messages of an RPC: those of unary messages become tags of the
+  RPC's span, and those of each streamed message are logged to it. This
+  replaces SpanDecorators that format whole messages or metadata. Field paths
+  are resolved against the message descriptors once per method and message
+  type and compiled into attribute getters, so no message is serialized or
+  formatted. Paths that cannot be resolved are logged and ignored.
+
+  Args:
+    fields: A dict from a full method name, e.g.,
+      '/store.Store/QueryQuantity', to the paths of the fields to read. A
+      path is the name of the request or response message type, e.g.,
+      'QueryItemRequest' or 'store.QueryItemRequest', followed by the names of
+      the fields leading to a singular scalar field, e.g.,
+      'QueryItemRequest.name'. The paths are either a list, in which case
+      they are also the tag and log keys, or a dict from paths to keys.
+      Enum fields are read as the names of their values.
+
+  Returns:
+    An extractor to pass to the interceptor factories.
+  """
+    from grpc_opentracing import _fields
+    return _fields.FieldExtractor(fields)
+
+
+def stream_summary(log_every=None):
+    """Creates a summary of the messages of streaming RPCs.
+
+  Interceptors given a summary no longer log every streamed message, which
+  makes the logs of long streams grow without bound. Instead, when a stream
+  ends they tag the RPC's span with the number of messages, their total and
+  largest size and the times of the first and the last message, under
+  '<key>.count', '<key>.bytes', '<key>.max_bytes', '<key>.first_time' and
+  '<key>.last_time' with 'request' or 'response' as the key. Sizes are the
+  lengths of bytes and strings or the ByteSize() of protobuf messages.
+
+  Args:
+    log_every: An optional sampling interval. If given, every log_every-th
+      message of a stream, starting with the first, is still logged as with
+      log_payloads and field_extractor; otherwise no streamed message is.
+
+  Returns:
+    A summary to pass to the interceptor factories.
+  """
+    from grpc_opentracing import _messages
+    return _messages.StreamSummary(log_every)
+
+
+def payload_store(directory):
+    """Creates a content-addressed store of the payloads of RPCs.
+
+  Interceptors given a store, along with log_payloads, store the bytes of
+  each logged request and response in it and log only their SHA-256 digest
+  and size, as '<key>.digest' and '<key>.size' with 'request' or 'response'
+  as the key, so spans stay small however large the payloads. Identical
+  payloads, e.g., of retries and polls, are stored once. Bytes payloads are
+  stored as they are, protobuf messages serialized and other payloads as
+  their UTF-8 encoded string representation.
+
+  Payloads are serialized on the RPC's thread. Digesting and writing them
+  costs time in proportion to their size, and happens on the RPC's thread
+  too unless the interceptor is given a span_finisher, which then does it
+  while completing the span.
+
+  Args:
+    directory: The directory to store payloads in, which is created if
+      needed and may be shared by several processes.
+
+  Returns:
+    A store to pass to the interceptor factories. It provides get(digest),
+    returning the bytes of a stored payload, and counters(), returning a
+    dict with the number of payloads 'stored' and 'deduplicated'.
+  """
+    from grpc_opentracing import _payload
+    return _payload.PayloadStore(directory)
+
+
+def message_spans(max_spans=100, sample_every=1, events=False):
+    """Creates a tracing of the individual messages of streaming RPCs.
+
+  Interceptors given a message tracing time how long a stream waits for each
+  streamed request and response, i.e., for the application to produce it or
+  for it to arrive, and record the wait as a child span of the RPC's span
+  named after the method and 'request' or 'response', e.g.,
+  '/store.Store/QueryQuantities response', tagged with the 'message.index'
+  of the message in its stream. So slow messages in long streams can be
+  found without tracing all of them: only every sample_every-th message is
+  traced, and at most max_spans per stream.
+
+  Args:
+    max_spans: The maximum number of messages traced per stream.
+    sample_every: The sampling interval, starting with the first message.
+    events: Whether to log each traced message as an event with its
+      'message.index' and 'message.seconds' rather than to create a span.
+
+  Returns:
+    A message tracing to pass to the interceptor factories. It provides
+    counters(), returning a dict with the number of messages 'traced' and of
+    sampled messages not traced because they were 'over_max_spans'.
+  """
+    from grpc_opentracing import _messages
+    return _messages.MessageSpans(max_spans, sample_every, events)
+
+
+def span_rotation(max_messages=None, max_seconds=None):
+    """Creates a rotation of the spans of long-lived streaming RPCs.
+
+  Interceptors given a rotation finish the span of a response-streaming RPC
+  once max_messages responses have passed or max_seconds have elapsed since
+  the span started, and continue the RPC in a new span with the same
+  operation name that follows from the finished one. So the spans of streams
+  that last hours, e.g., subscription feeds, are reported as the stream goes
+  and their logs do not accumulate until it ends. Spans are tagged with their
+  'stream.segment' number, from 0; a span that is never rotated is not.
+  Spans are rotated as responses pass, so a stream that is idle is not. On
+  the service side, the active span of the servicer context changes to the
+  continuation; the SpanDecorator runs on the last span only, and a
+  stream_summary covers the messages of each span.
+
+  Args:
+    max_messages: The optional number of responses after which to rotate.
+    max_seconds: The optional number of seconds after which to rotate.
+
+  Returns:
+    A rotation to pass to the interceptor factories.
+
+  Raises:
+    ValueError: If neither limit is given or a limit is not positive.
+  """
+    from grpc_opentracing import _rotation
+    return _rotation.SpanRotation(max_messages, max_seconds)
+
+
 def open_tracing_client_interceptor(tracer,
                                     active_span_source=None,
                                     log_payloads=False,
-                                    span_decorator=None):
+                                    span_decorator=None,
+                                    span_finisher=None,
+                                    binary_metadata_key=None,
+                                    propagation_codec=None,
+                                    baggage_limits=None,
+                                    max_payload_bytes=None,
+                                    field_extractor=None,
+                                    stream_summary=None,
+                                    span_rotation=None,
+                                    message_spans=None,
+                                    payload_store=None):
     """Creates an invocation-side interceptor that can be use with gRPC to add
     OpenTracing information.
 
   Args:
-    tracer: An object implmenting the opentracing.Tracer interface.
+    tracer: An object implmenting the opentracing.Tracer interface, or a
+      list or tuple of them. With several tracers every span is created in
+      each of them, by a single pass over the RPC's tags, logs and
+      SpanDecorator; span contexts are injected by the first tracer only.
     active_span_source: An optional ActiveSpanSource to customize how the
       active span is determined.
     log_payloads: Indicates whether requests should be logged.
     span_decorator: An optional SpanDecorator.
+    span_finisher: An optional SpanFinisher to complete spans with, e.g., one
+      created by background_span_finisher. By default spans are completed on
+      the RPC's thread.
+    binary_metadata_key: An optional metadata key, such as
+      'ot-span-context-bin', to propagate span contexts with. The span context
+      is injected in the opentracing.Format.BINARY format into a single
+      binary metadata entry with this key, rather than in the HTTP_HEADERS
+      format into several text entries. The key must end with '-bin'.
+    propagation_codec: An optional built-in codec to propagate span contexts
+      with instead of the tracer: 'w3c' for W3C Trace Context traceparent and
+      tracestate metadata entries, or 'b3' for a B3 single-header b3 entry.
+      The codec writes the entries straight into the metadata, bypassing
+      tracer.inject(), but does not propagate baggage. It requires a tracer
+      that provides span_context_from_ids(trace_id, span_id, sampled,
+      trace_state), such as the recording tracer, and whose span contexts
+      have integer trace_id and span_id attributes.
+    baggage_limits: Optional limits, created by baggage_limits, on the baggage
+      injected into the request metadata.
+    max_payload_bytes: An optional limit on the size of logged payloads. If
+      given, at most this many bytes or characters of a payload logged with
+      log_payloads, protobuf messages serialized, are kept when it is logged.
+      They are converted to a string of at most this many characters,
+      followed by a truncation marker, only when the tracer or reporter does
+      so.
+    field_extractor: An optional extractor, created by field_extractor, of
+      message fields into span tags and logs.
+    stream_summary: An optional summary, created by stream_summary, to tag
+      spans with instead of logging every streamed message.
+    span_rotation: An optional rotation, created by span_rotation, of the
+      spans of response-streaming RPCs.
+    message_spans: An optional tracing, created by message_spans, of the
+      individual messages of streaming RPCs.
+    payload_store: An optional store, created by payload_store, to keep the
+      payloads logged with log_payloads in instead of the spans. It cannot be
+      combined with max_payload_bytes.
 
   Returns:
     An invocation-side interceptor object.
   """
     from grpc_opentracing import _client
-    return _client.OpenTracingClientInterceptor(tracer, active_span_source,
-                                                log_payloads, span_decorator)
+    return _client.OpenTracingClientInterceptor(
+        tracer, active_span_source, log_payloads, span_decorator,
+        span_finisher, binary_metadata_key, propagation_codec, baggage_limits,
+        max_payload_bytes, field_extractor, stream_summary, span_rotation,
+        message_spans, payload_store)
 
 
 def open_tracing_server_interceptor(tracer,
                                     log_payloads=False,
-                                    span_decorator=None):
+                                    span_decorator=None,
+                                    span_finisher=None,
+                                    binary_metadata_key=None,
+                                    propagation_codec=None,
+                                    baggage_limits=None,
+                                    max_payload_bytes=None,
+                                    field_extractor=None,
+                                    stream_summary=None,
+                                    span_rotation=None,
+                                    message_spans=None,
+                                    payload_store=None):
     """Creates a service-side interceptor that can be use with gRPC to add
     OpenTracing information.
 
+  The span of a response-streaming RPC that is cancelled, e.g., by the client,
+  is finished with a 'cancelled' tag as soon as gRPC reports the RPC
+  terminated, rather than when the response stream is closed or abandoned.
+
   Args:
-    tracer: An object implmenting the opentracing.Tracer interface.
+    tracer: An object implmenting the opentracing.Tracer interface, or a
+      list or tuple of them. With several tracers every span is created in
+      each of them, by a single pass over the RPC's tags, logs and
+      SpanDecorator; span contexts are extracted by the first tracer only, so
+      in the others server spans have no remote parent.
     log_payloads: Indicates whether requests should be logged.
     span_decorator: An optional SpanDecorator.
+    span_finisher: An optional SpanFinisher to complete spans with, e.g., one
+      created by background_span_finisher. By default spans are completed on
+      the RPC's thread.
+    binary_metadata_key: An optional metadata key, such as
+      'ot-span-context-bin'. Span contexts are extracted in the
+      opentracing.Format.BINARY format from the metadata entry with this key
+      if the client sent one, and in the HTTP_HEADERS format otherwise. The
+      key must end with '-bin'.
+    propagation_codec: An optional built-in codec, 'w3c' or 'b3', to extract
+      span contexts with, as described for open_tracing_client_interceptor.
+      The codec reads the entries straight from the invocation metadata,
+      bypassing tracer.extract().
+    baggage_limits: Optional limits, created by baggage_limits, on the baggage
+      extracted from the invocation metadata.
+    max_payload_bytes: An optional limit on the size of logged payloads, as
+      described for open_tracing_client_interceptor.
+    field_extractor: An optional extractor, created by field_extractor, of
+      message fields into span tags and logs.
+    stream_summary: An optional summary, created by stream_summary, to tag
+      spans with instead of logging every streamed message.
+    span_rotation: An optional rotation, created by span_rotation, of the
+      spans of response-streaming RPCs.
+    message_spans: An optional tracing, created by message_spans, of the
+      individual messages of streaming RPCs.
+    payload_store: An optional store, created by payload_store, to keep the
+      payloads logged with log_payloads in instead of the spans. It cannot be
+      combined with max_payload_bytes.
 
   Returns:
     A service-side interceptor object.
   """
     from grpc_opentracing import _server
-    return _server.OpenTracingServerInterceptor(tracer, log_payloads,
-                                                span_decorator)
+    return _server.OpenTracingServerInterceptor(
+        tracer, log_payloads, span_decorator, span_finisher,
+        binary_metadata_key, propagation_codec, baggage_limits,
+        max_payload_bytes, field_extractor, stream_summary, span_rotation,
+        message_spans, payload_store)
+
+
+def open_telemetry_client_interceptor(tracer=None,
+                                      propagator=None,
+                                      active_span_source=None,
+                                      log_payloads=False,
+                                      span_decorator=None,
+                                      span_finisher=None,
+                                      propagation_codec=None,
+                                      max_payload_bytes=None,
+                                      field_extractor=None,
+                                      stream_summary=None,
+                                      span_rotation=None,
+                                      message_spans=None,
+                                      payload_store=None):
+    """Creates an invocation-side interceptor that creates OpenTelemetry spans.
+
+  The interceptor works like one created by open_tracing_client_interceptor,
+  but creates OpenTelemetry CLIENT spans directly rather than through the
+  OpenTracing shim. Spans carry the rpc.system, rpc.service, rpc.method and
+  rpc.grpc.status_code attributes of the semantic conventions; the span's
+  parent is the current OpenTelemetry span unless an active_span_source is
+  given. The continuation spans of a span_rotation start new traces, linked to
+  the spans they follow from. The span passed to a SpanDecorator implements
+  the opentracing.Span interface; its otel_span attribute is the OpenTelemetry
+  span. Requires the opentelemetry-api package.
+
+  Args:
+    tracer: An opentelemetry.trace.Tracer. Defaults to the tracer of the
+      global tracer provider.
+    propagator: An opentelemetry.propagators.textmap.TextMapPropagator to
+      inject span contexts into the request metadata with. Defaults to the
+      global propagator.
+    active_span_source: An optional ActiveSpanSource to customize how the
+      active span is determined.
+    log_payloads: Indicates whether requests should be logged as events.
+    span_decorator: An optional SpanDecorator.
+    span_finisher: An optional SpanFinisher to complete spans with.
+    propagation_codec: An optional built-in codec, 'w3c' or 'b3', to inject
+      span contexts with instead of the propagator, as described for
+      open_tracing_client_interceptor.
+    max_payload_bytes: An optional limit on the size of logged payloads, as
+      described for open_tracing_client_interceptor.
+    field_extractor: An optional extractor, created by field_extractor, of
+      message fields into span tags and logs.
+    stream_summary: An optional summary, created by stream_summary, to tag
+      spans with instead of logging every streamed message.
+    span_rotation: An optional rotation, created by span_rotation, of the
+      spans of response-streaming RPCs.
+    message_spans: An optional tracing, created by message_spans, of the
+      individual messages of streaming RPCs.
+    payload_store: An optional store, created by payload_store, to keep the
+      payloads logged with log_payloads in instead of the spans. It cannot be
+      combined with max_payload_bytes.
+
+  Returns:
+    An invocation-side interceptor object.
+  """
+    from grpc_opentracing import _client, _otel
+    return _client.OpenTracingClientInterceptor(
+        _otel.open_telemetry_tracer(tracer, propagator),
+        active_span_source,
+        log_payloads,
+        span_decorator,
+        span_finisher,
+        propagation_codec=propagation_codec,
+        max_payload_bytes=max_payload_bytes,
+        field_extractor=field_extractor,
+        stream_summary=stream_summary,
+        span_rotation=span_rotation,
+        message_spans=message_spans,
+        payload_store=payload_store)
+
+
+def open_telemetry_server_interceptor(tracer=None,
+                                      propagator=None,
+                                      log_payloads=False,
+                                      span_decorator=None,
+                                      span_finisher=None,
+                                      propagation_codec=None,
+                                      max_payload_bytes=None,
+                                      field_extractor=None,
+                                      stream_summary=None,
+                                      span_rotation=None,
+                                      message_spans=None,
+                                      payload_store=None):
+    """Creates a service-side interceptor that creates OpenTelemetry spans.
+
+  The interceptor works like one created by open_tracing_server_interceptor,
+  but creates OpenTelemetry SERVER spans directly rather than through the
+  OpenTracing shim, with the attributes described for
+  open_telemetry_client_interceptor. The span is the current OpenTelemetry
+  span while the handler runs, also if a span_finisher completes it.
+  Requires the opentelemetry-api package.
+
+  Args:
+    tracer: An opentelemetry.trace.Tracer. Defaults to the tracer of the
+      global tracer provider.
+    propagator: An opentelemetry.propagators.textmap.TextMapPropagator to
+      extract span contexts from the invocation metadata with. Defaults to the
+      global propagator.
+    log_payloads: Indicates whether requests should be logged as events.
+    span_decorator: An optional SpanDecorator.
+    span_finisher: An optional SpanFinisher to complete spans with.
+    propagation_codec: An optional built-in codec, 'w3c' or 'b3', to extract
+      span contexts with instead of the propagator.
+    max_payload_bytes: An optional limit on the size of logged payloads, as
+      described for open_tracing_client_interceptor.
+    field_extractor: An optional extractor, created by field_extractor, of
+      message fields into span tags and logs.
+    stream_summary: An optional summary, created by stream_summary, to tag
+      spans with instead of logging every streamed message.
+    span_rotation: An optional rotation, created by span_rotation, of the
+      spans of response-streaming RPCs.
+    message_spans: An optional tracing, created by message_spans, of the
+      individual messages of streaming RPCs.
+    payload_store: An optional store, created by payload_store, to keep the
+      payloads logged with log_payloads in instead of the spans. It cannot be
+      combined with max_payload_bytes.
+
+  Returns:
+    A service-side interceptor object.
+  """
+    from grpc_opentracing import _otel, _server
+    return _server.OpenTracingServerInterceptor(
+        _otel.open_telemetry_tracer(tracer, propagator),
+        log_payloads,
+        span_decorator,
+        span_finisher,
+        propagation_codec=propagation_codec,
+        max_payload_bytes=max_payload_bytes,
+        field_extractor=field_extractor,
+        stream_summary=stream_summary,
+        span_rotation=span_rotation,
+        message_spans=message_spans,
+        payload_store=payload_store)
+
+
+def inject_message_contexts(tracer, items, carrier):
+    """Attaches a span context to each request of a client-streaming RPC.
+
+  An RPC that batches requests from several traces, e.g., the items of many
+  users streamed in one call, can only propagate one span context in its
+  metadata. This propagates the span context of each request in the request
+  itself, for the service to trace with follow_message_contexts.
+
+  Args:
+    tracer: The opentracing.Tracer of the span contexts.
+    items: An iterable of (span_context, request) pairs. The span context may
+      also be a span, or None for a request without one.
+    carrier: A callable returning the mutable string mapping of a request to
+      inject the span context into in the opentracing.Format.TEXT_MAP
+      format, e.g., lambda request: request.trace_context for a
+      map<string, string> trace_context field.
+
+  Returns:
+    An iterator over the requests to pass to a stream_unary or stream_stream
+    multi-callable. Span contexts are injected lazily, as the requests are
+    sent.
+  """
+    from grpc_opentracing import _batching
+    return _batching.inject_message_contexts(tracer, items, carrier)
+
+
+def follow_message_contexts(request_iterator,
+                            active_span_source,
+                            carrier,
+                            operation_name='message'):
+    """Traces the requests of a client-streaming RPC in their own traces.
+
+  Wraps the request iterator of a handler so that each request that carries
+  a span context, attached by inject_message_contexts, is traced in a span
+  that follows from that span context, so it belongs to the request's trace,
+  and is a child of the RPC's span. The span covers the request from when it
+  is received until the handler asks for the next one, and is tagged with
+  the 'message.index' of the request in its stream.
+
+  Args:
+    request_iterator: The request iterator passed to the handler.
+    active_span_source: The servicer context passed to the handler by a
+      service-side interceptor, or another ActiveSpanSource of the RPC's span.
+      The spans are created by the tracer of that span.
+    carrier: A callable returning the string mapping of a request that the
+      span context was injected into.
+    operation_name: The operation name of the spans.
+
+  Returns:
+    An iterator over the requests. Its current_span attribute is the span of
+    the request last returned, or None, to create child spans of; its close()
+    method finishes that span if the handler stops iterating early.
+  """
+    from grpc_opentracing import _batching
+    return _batching.MessageContextIterator(request_iterator,
+                                            active_span_source, carrier,
+                                            operation_name)
+
+
+def _check_interceptors(interceptors):
+    from grpc_opentracing import _client, _server
+    for interceptor in interceptors:
+        if not isinstance(interceptor, (_client.OpenTracingClientInterceptor,
+                                        _server.OpenTracingServerInterceptor)):
+            raise TypeError('interceptor must be created by either '
+                            'open_tracing_client_interceptor or '
+                            'open_tracing_server_interceptor')
+
+
+def rebind_tracer(tracer, *interceptors):
+    """Makes interceptors use a different tracer for subsequent RPCs.
+
+  Args:
+    tracer: An object implementing the opentracing.Tracer interface, or a
+      list or tuple of them.
+    interceptors: Interceptors created by open_tracing_client_interceptor or
+      open_tracing_server_interceptor.
+
+  Raises:
+    TypeError: If an interceptor was created otherwise.
+  """
+    _check_interceptors(interceptors)
+    for interceptor in interceptors:
+        interceptor._rebind_tracer(tracer)
+
+
+def rebind_tracer_after_fork(tracer_factory, *interceptors):
+    """Re-binds interceptors to a freshly initialized tracer in forked children.
+
+  Interceptors created before os.fork() would otherwise keep using a tracer
+  whose reporter threads and connections only exist in the parent. Per-process
+  state of the interceptors themselves, such as the queues and threads of a
+  background_span_finisher, is reset in the child regardless. Requires
+  os.register_at_fork (Python 3.7+); otherwise this has no effect.
+
+  Args:
+    tracer_factory: A callable taking no arguments that returns the tracer, or
+      the list or tuple of tracers, to use. It is called once in each child
+      process, right after the fork.
+    interceptors: Interceptors created by open_tracing_client_interceptor or
+      open_tracing_server_interceptor. Only weak references are kept.
+
+  Raises:
+    TypeError: If an interceptor was created otherwise.
+  """
+    from grpc_opentracing import _fork
+    _check_interceptors(interceptors)
+    _fork.rebind_tracer_after_fork(tracer_factory, interceptors)
 
 
 ###################################  __all__  #################################
 
-__all__ = ('ActiveSpanSource', 'RpcInfo', 'SpanDecorator',
+__all__ = ('ActiveSpanSource', 'RpcInfo', 'SpanDecorator', 'SpanFinisher',
+           'background_span_finisher', 'baggage_limits', 'field_extractor',
+           'follow_message_contexts', 'inject_message_contexts',
+           'message_spans', 'open_telemetry_client_interceptor',
+           'open_telemetry_server_interceptor',
            'open_tracing_client_interceptor',
-           'open_tracing_server_interceptor',)
+           'open_tracing_server_interceptor', 'payload_store', 'rebind_tracer',
+           'rebind_tracer_after_fork', 'span_rotation', 'stream_summary',)
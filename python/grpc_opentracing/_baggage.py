@@ -0,0 +1,56 @@
+"""Limits on the baggage that is propagated in text metadata entries."""
+
+from grpc_opentracing._counters import ShardedCounters
+
+
+class BaggageLimits(object):
+    """Removes baggage entries from a text carrier beyond the limits.
+
+  Baggage entries are recognized by the prefixes of their keys, since tracers
+  encode baggage items as one header each. Entries are kept in the order the
+  carrier holds them until a limit is reached.
+  """
+
+    def __init__(self, max_items, max_bytes, allowed_keys, header_prefixes):
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._allowed_keys = None if allowed_keys is None else frozenset(
+            key.lower() for key in allowed_keys)
+        self._header_prefixes = tuple(
+            prefix.lower() for prefix in header_prefixes)
+        self._counters = ShardedCounters(('disallowed', 'over_max_items',
+                                          'over_max_bytes'))
+
+    def _baggage_key(self, header):
+        header = header.lower()
+        for prefix in self._header_prefixes:
+            if header.startswith(prefix):
+                return header[len(prefix):]
+        return None
+
+    def limit(self, carrier):
+        """Removes the baggage entries beyond the limits from a dict carrier."""
+        items = size = 0
+        for header in [
+                header for header in carrier
+                if header.lower().startswith(self._header_prefixes)
+        ]:
+            value = carrier[header]
+            if self._allowed_keys is not None and \
+                    self._baggage_key(header) not in self._allowed_keys:
+                reason = 'disallowed'
+            elif self._max_items is not None and items >= self._max_items:
+                reason = 'over_max_items'
+            elif self._max_bytes is not None and \
+                    size + len(header) + len(value) > self._max_bytes:
+                reason = 'over_max_bytes'
+            else:
+                items += 1
+                size += len(header) + len(value)
+                continue
+            del carrier[header]
+            self._counters.increment(reason)
+        return carrier
+
+    def counters(self):
+        return self._counters.snapshot()
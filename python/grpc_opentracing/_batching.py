@@ -0,0 +1,87 @@
+"""Per-message span contexts for client-streaming RPCs that batch requests
+from several traces."""
+
+import logging
+
+import opentracing
+from opentracing.ext import tags as ot_tags
+
+
+def inject_message_contexts(tracer, items, carrier):
+    for span_context, request in items:
+        if isinstance(span_context, opentracing.Span):
+            span_context = span_context.context
+        if span_context is not None:
+            try:
+                tracer.inject(span_context, opentracing.Format.TEXT_MAP,
+                              carrier(request))
+            except (opentracing.UnsupportedFormatException,
+                    opentracing.InvalidCarrierException,
+                    opentracing.SpanContextCorruptedException):
+                logging.exception('tracer.inject() failed')
+        yield request
+
+
+class MessageContextIterator(object):
+    """Traces each request that carries a span context in a span that follows
+  from it, from when the request is received until the next one is asked
+  for."""
+
+    def __init__(self, request_iterator, active_span_source, carrier,
+                 operation_name):
+        self._request_iterator = request_iterator
+        self._active_span_source = active_span_source
+        self._carrier = carrier
+        self._operation_name = operation_name
+        self._index = 0
+        self.current_span = None
+
+    def __iter__(self):
+        return self
+
+    def _finish_current_span(self):
+        span = self.current_span
+        if span is not None:
+            self.current_span = None
+            span.finish()
+
+    def _start_span(self, request, index):
+        rpc_span = self._active_span_source.get_active_span()
+        if rpc_span is None:
+            return None
+        tracer = rpc_span.tracer
+        try:
+            span_context = tracer.extract(opentracing.Format.TEXT_MAP,
+                                          dict(self._carrier(request)))
+        except (opentracing.UnsupportedFormatException,
+                opentracing.InvalidCarrierException,
+                opentracing.SpanContextCorruptedException):
+            logging.exception('tracer.extract() failed')
+            return None
+        if span_context is None:
+            return None
+        return tracer.start_span(
+            operation_name=self._operation_name,
+            references=[
+                opentracing.follows_from(span_context),
+                opentracing.child_of(rpc_span.context)
+            ],
+            tags={
+                ot_tags.COMPONENT: 'grpc',
+                'message.index': index
+            })
+
+    def next(self):
+        self._finish_current_span()
+        request = next(self._request_iterator)
+        index = self._index
+        self._index = index + 1
+        self.current_span = self._start_span(request, index)
+        return request
+
+    def __next__(self):
+        return self.next()
+
+    def close(self):
+        """Finishes the span of the last request."""
+        self._finish_current_span()
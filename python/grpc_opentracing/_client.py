@@ -4,55 +4,34 @@ import sys
 import logging
 import time
 
-from six import iteritems
-
 import grpc
-from grpc_opentracing import grpcext
+from grpc_opentracing import grpcext, _finisher, _messages, _payload, \
+    _propagation, _rotation, _tee
 from grpc_opentracing._utilities import get_method_type, get_deadline_millis,\
-    log_or_wrap_request_or_iterator, RpcInfo
+    GuardedSpan, RpcInfo
 import opentracing
 from opentracing.ext import tags as ot_tags
 
 
-class _GuardedSpan(object):
-
-    def __init__(self, span):
-        self.span = span
-        self._engaged = True
-
-    def __enter__(self):
-        self.span.__enter__()
-        return self
-
-    def __exit__(self, *args, **kwargs):
-        if self._engaged:
-            return self.span.__exit__(*args, **kwargs)
-        else:
-            return False
-
-    def release(self):
-        self._engaged = False
-        return self.span
-
-
-def _inject_span_context(tracer, span, metadata):
-    headers = {}
+def _inject_span_context(tracer, span, metadata, propagation):
+    metadata = () if metadata is None else tuple(metadata)
     try:
-        tracer.inject(span.context, opentracing.Format.HTTP_HEADERS, headers)
+        return propagation.inject(tracer, span.context, metadata)
     except (opentracing.UnsupportedFormatException,
             opentracing.InvalidCarrierException,
             opentracing.SpanContextCorruptedException) as e:
         logging.exception('tracer.inject() failed')
         span.log_kv({'event': 'error', 'error.object': e})
         return metadata
-    metadata = () if metadata is None else tuple(metadata)
-    return metadata + tuple(iteritems(headers))
 
 
-def _make_future_done_callback(span, rpc_info, log_payloads, span_decorator):
+def _make_future_done_callback(span, rpc_info, messages, span_decorator,
+                               requests):
 
     def callback(response_future):
         with span:
+            if requests is not None:
+                requests.end()
             code = response_future.code()
             if code != grpc.StatusCode.OK:
                 span.set_tag('error', True)
@@ -67,8 +46,9 @@ def _make_future_done_callback(span, rpc_info, log_payloads, span_decorator):
                 return
             response = response_future.result()
             rpc_info.response = response
-            if log_payloads:
-                span.log_kv({'response': response})
+            if messages is not None:
+                messages.unary(span, rpc_info.full_method, 'response',
+                               response)
             if span_decorator is not None:
                 span_decorator(span, rpc_info)
 
@@ -79,15 +59,31 @@ class OpenTracingClientInterceptor(grpcext.UnaryClientInterceptor,
                                    grpcext.StreamClientInterceptor):
 
     def __init__(self, tracer, active_span_source, log_payloads,
-                 span_decorator):
+                 span_decorator, span_finisher, binary_metadata_key=None, propagation_codec=None,
+                 baggage_limits=None, max_payload_bytes=None,
+                 field_extractor=None, stream_summary=None,
+                 span_rotation=None, message_spans=None, payload_store=None):
+        tracer = _tee.tee(tracer)
         self._tracer = tracer
         self._active_span_source = active_span_source
-        self._log_payloads = log_payloads
+        self._messages = _messages.message_logging(
+            _payload.payload_logging(log_payloads, max_payload_bytes,
+                                     payload_store, span_finisher is not None),
+            field_extractor, stream_summary, message_spans)
+        self._propagation = _propagation.propagation(
+            tracer, propagation_codec, binary_metadata_key, baggage_limits)
+        self._span_rotation = span_rotation
+        self._span_finisher = span_finisher
+        if span_finisher is not None and span_decorator is not None:
+            span_decorator = _finisher.defer_decorator(span_decorator)
         self._span_decorator = span_decorator
 
-    def _start_span(self, method):
+    def _rebind_tracer(self, tracer):
+        self._tracer = _tee.tee(tracer)
+
+    def _start_span(self, method, references=None, segment=None):
         active_span_context = None
-        if self._active_span_source is not None:
+        if references is None and self._active_span_source is not None:
             active_span = self._active_span_source.get_active_span()
             if active_span is not None:
                 active_span_context = active_span.context
@@ -95,17 +91,28 @@ class OpenTracingClientInterceptor(grpcext.UnaryClientInterceptor,
             ot_tags.COMPONENT: 'grpc',
             ot_tags.SPAN_KIND: ot_tags.SPAN_KIND_RPC_CLIENT
         }
-        return self._tracer.start_span(
-            operation_name=method, child_of=active_span_context, tags=tags)
-
-    def _trace_result(self, guarded_span, rpc_info, result):
+        if segment is not None:
+            tags[_rotation.SEGMENT_TAG] = segment
+        span = self._tracer.start_span(
+            operation_name=method,
+            child_of=active_span_context,
+            references=references,
+            tags=tags)
+        if self._span_finisher is not None:
+            span = _finisher.defer_span(span, self._span_finisher)
+        return span
+
+    def _trace_result(self, guarded_span, rpc_info, result, requests=None):
         # If the RPC is called asynchronously, release the guard and add a callback
         # so that the span can be finished once the future is done.
         if isinstance(result, grpc.Future):
             result.add_done_callback(
-                _make_future_done_callback(guarded_span.release(
-                ), rpc_info, self._log_payloads, self._span_decorator))
+                _make_future_done_callback(
+                    guarded_span.release(), rpc_info, self._messages,
+                    self._span_decorator, requests))
             return result
+        if requests is not None:
+            requests.end()
         response = result
         # Handle the case when the RPC is initiated via the with_call
         # method and the result is a tuple with the first element as the
@@ -114,26 +121,26 @@ class OpenTracingClientInterceptor(grpcext.UnaryClientInterceptor,
         if isinstance(result, tuple):
             response = result[0]
         rpc_info.response = response
-        if self._log_payloads:
-            guarded_span.span.log_kv({'response': response})
+        if self._messages is not None:
+            self._messages.unary(guarded_span.span, rpc_info.full_method,
+                                 'response', response)
         if self._span_decorator is not None:
             self._span_decorator(guarded_span.span, rpc_info)
         return result
 
     def _start_guarded_span(self, *args, **kwargs):
-        return _GuardedSpan(self._start_span(*args, **kwargs))
+        return GuardedSpan(self._start_span(*args, **kwargs))
 
     def intercept_unary(self, request, metadata, client_info, invoker):
         with self._start_guarded_span(client_info.full_method) as guarded_span:
             metadata = _inject_span_context(self._tracer, guarded_span.span,
-                                            metadata)
-            rpc_info = RpcInfo(
-                full_method=client_info.full_method,
-                metadata=metadata,
-                timeout=client_info.timeout,
-                request=request)
-            if self._log_payloads:
-                guarded_span.span.log_kv({'request': request})
+                                            metadata, self._propagation)
+            rpc_info = RpcInfo(client_info.full_method, metadata,
+                               client_info.timeout, request)
+            if self._messages is not None:
+                self._messages.unary(guarded_span.span,
+                                     client_info.full_method, 'request',
+                                     request)
             try:
                 result = invoker(request, metadata)
             except:
@@ -151,23 +158,41 @@ class OpenTracingClientInterceptor(grpcext.UnaryClientInterceptor,
     # result in a new generator that yields the response values.
     def _intercept_server_stream(self, request_or_iterator, metadata,
                                  client_info, invoker):
-        with self._start_span(client_info.full_method) as span:
-            metadata = _inject_span_context(self._tracer, span, metadata)
-            rpc_info = RpcInfo(
-                full_method=client_info.full_method,
-                metadata=metadata,
-                timeout=client_info.timeout)
+        with self._start_guarded_span(client_info.full_method) as guarded_span:
+            span = guarded_span.span
+            metadata = _inject_span_context(self._tracer, span, metadata,
+                                            self._propagation)
+            rpc_info = RpcInfo(client_info.full_method, metadata,
+                               client_info.timeout)
             if client_info.is_client_stream:
                 rpc_info.request = request_or_iterator
-            if self._log_payloads:
-                request_or_iterator = log_or_wrap_request_or_iterator(
-                    span, client_info.is_client_stream, request_or_iterator)
+            requests = responses = None
+            if self._messages is not None:
+                request_or_iterator, requests = self._messages.requests(
+                    span, client_info.full_method,
+                    client_info.is_client_stream, request_or_iterator)
+                responses = self._messages.stream(span,
+                                                  client_info.full_method,
+                                                  'response')
+            segments = None
+            if self._span_rotation is not None:
+                segments = _rotation.Segments(self._span_rotation)
             try:
                 result = invoker(request_or_iterator, metadata)
+                if responses is not None:
+                    responses.wait()
                 for response in result:
-                    if self._log_payloads:
-                        span.log_kv({'response': response})
+                    if responses is not None:
+                        responses.message(response)
+                    if segments is not None and segments.due():
+                        span = segments.rotate(
+                            guarded_span,
+                            lambda references, segment: self._start_span(
+                                client_info.full_method, references, segment),
+                            (requests, responses))
                     yield response
+                    if responses is not None:
+                        responses.wait()
             except:
                 e = sys.exc_info()[0]
                 span.set_tag('error', True)
@@ -176,6 +201,11 @@ class OpenTracingClientInterceptor(grpcext.UnaryClientInterceptor,
                 if self._span_decorator is not None:
                     self._span_decorator(span, rpc_info)
                 raise
+            finally:
+                if requests is not None:
+                    requests.end()
+                if responses is not None:
+                    responses.end()
             if self._span_decorator is not None:
                 self._span_decorator(span, rpc_info)
 
@@ -186,19 +216,19 @@ class OpenTracingClientInterceptor(grpcext.UnaryClientInterceptor,
                                                  client_info, invoker)
         with self._start_guarded_span(client_info.full_method) as guarded_span:
             metadata = _inject_span_context(self._tracer, guarded_span.span,
-                                            metadata)
-            rpc_info = RpcInfo(
-                full_method=client_info.full_method,
-                metadata=metadata,
-                timeout=client_info.timeout,
-                request=request_or_iterator)
-            if self._log_payloads:
-                request_or_iterator = log_or_wrap_request_or_iterator(
-                    guarded_span.span, client_info.is_client_stream,
-                    request_or_iterator)
+                                            metadata, self._propagation)
+            rpc_info = RpcInfo(client_info.full_method, metadata,
+                               client_info.timeout, request_or_iterator)
+            requests = None
+            if self._messages is not None:
+                request_or_iterator, requests = self._messages.requests(
+                    guarded_span.span, client_info.full_method,
+                    client_info.is_client_stream, request_or_iterator)
             try:
                 result = invoker(request_or_iterator, metadata)
             except:
+                if requests is not None:
+                    requests.end()
                 e = sys.exc_info()[0]
                 guarded_span.span.set_tag('error', True)
                 guarded_span.span.log_kv({'event': 'error', 'error.object': e})
@@ -206,4 +236,5 @@ class OpenTracingClientInterceptor(grpcext.UnaryClientInterceptor,
                 if self._span_decorator is not None:
                     self._span_decorator(guarded_span.span, rpc_info)
                 raise
-            return self._trace_result(guarded_span, rpc_info, result)
+            return self._trace_result(guarded_span, rpc_info, result,
+                                      requests)
@@ -0,0 +1,77 @@
+"""Counters that are sharded per thread."""
+
+import collections
+import threading
+import weakref
+
+from grpc_opentracing import _fork
+
+
+class _ShardOwner(object):
+    __slots__ = ('__weakref__',)
+
+
+class ShardedCounters(object):
+    """A set of named counters.
+
+  Each thread increments its own shard, so counting never contends on a lock
+  or on shared memory, which matters on free-threaded builds of CPython. Reads
+  sum the shards. When a thread exits its shard is folded into the retired
+  totals so that short-lived threads do not accumulate shards. The counters
+  count per process: they are zeroed in forked children.
+  """
+
+    def __init__(self, names):
+        self._names = tuple(names)
+        self.reset()
+        _fork.register(self)
+
+    def _after_fork_in_child(self):
+        self.reset()
+
+    def _retire(self, owner_ref):
+        # Runs as a weakref callback, possibly on a thread that holds the
+        # lock, e.g., if garbage collection starts in snapshot(), so the shard
+        # is only queued, to be folded the next time the lock is taken.
+        self._retiring.append(owner_ref)
+
+    def _fold_retired(self):
+        while self._retiring:
+            shard = self._shards.pop(self._retiring.popleft(), None)
+            if shard is not None:
+                for name, value in shard.items():
+                    self._retired[name] += value
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            owner = _ShardOwner()
+            shard = dict.fromkeys(self._names, 0)
+            with self._lock:
+                self._fold_retired()
+                self._shards[weakref.ref(owner, self._retire)] = shard
+            self._local.owner = owner
+            self._local.shard = shard
+        return shard
+
+    def increment(self, name, value=1):
+        self._shard()[name] += value
+
+    def snapshot(self):
+        """Returns a dict mapping each counter name to its total."""
+        with self._lock:
+            self._fold_retired()
+            totals = dict(self._retired)
+            shards = list(self._shards.values())
+        for shard in shards:
+            for name in self._names:
+                totals[name] += shard[name]
+        return totals
+
+    def reset(self):
+        """Zeroes the counters, e.g., in a forked child process."""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = {}
+        self._retiring = collections.deque()
+        self._retired = dict.fromkeys(self._names, 0)
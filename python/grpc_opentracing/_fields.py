@@ -0,0 +1,112 @@
+"""Extraction of protobuf message fields into span tags and logs."""
+
+import logging
+import operator
+
+import six
+
+
+def _is_repeated(field):
+    is_repeated = getattr(field, 'is_repeated', None)
+    if is_repeated is None:
+        return field.label == field.LABEL_REPEATED
+    return is_repeated
+
+
+def _enum_getter(getter, enum_type):
+    names = dict((value.number, value.name) for value in enum_type.values)
+
+    def get(message):
+        number = getter(message)
+        return names.get(number, number)
+
+    return get
+
+
+def _compile(descriptor, path, key):
+    """Returns a function reading the field at path from a message of the
+  descriptor's type, or None if path does not name one of its fields."""
+    for prefix in (descriptor.full_name + '.', descriptor.name + '.'):
+        if path.startswith(prefix):
+            break
+    else:
+        return None
+    names = path[len(prefix):].split('.')
+    field = None
+    for name in names:
+        if field is not None:
+            if field.message_type is None or _is_repeated(field):
+                raise ValueError('%s is not a singular message field' %
+                                 field.full_name)
+            descriptor = field.message_type
+        field = descriptor.fields_by_name.get(name)
+        if field is None:
+            raise ValueError('%s has no field %s' % (descriptor.full_name,
+                                                     name))
+    if field.message_type is not None or _is_repeated(field):
+        raise ValueError('%s is not a singular scalar field' % field.full_name)
+    getter = operator.attrgetter('.'.join(names))
+    if field.enum_type is not None:
+        getter = _enum_getter(getter, field.enum_type)
+    return key, getter
+
+
+class FieldExtractor(object):
+    """Reads the declared fields of the messages of RPCs.
+
+  Field paths are resolved against the descriptor of the first message of
+  each type that an RPC method sends or receives, and compiled into
+  attribute getters that are cached for the later messages.
+  """
+
+    def __init__(self, fields):
+        self._fields = {}
+        for method, paths in six.iteritems(fields):
+            if isinstance(paths, six.string_types):
+                raise TypeError('the field paths of %s must be a collection' %
+                                method)
+            if isinstance(paths, dict):
+                paths = tuple(six.iteritems(paths))
+            else:
+                paths = tuple((path, path) for path in paths)
+            self._fields[method] = paths
+        # (method, message type) -> ((key, getter), ...)
+        self._getters = {}
+
+    def _compile(self, method, message_type):
+        getters = []
+        descriptor = getattr(message_type, 'DESCRIPTOR', None)
+        if descriptor is not None:
+            for path, key in self._fields[method]:
+                try:
+                    getter = _compile(descriptor, path, key)
+                except ValueError:
+                    logging.exception('Field path %s of %s cannot be read',
+                                      path, method)
+                    continue
+                if getter is not None:
+                    getters.append(getter)
+        getters = tuple(getters)
+        self._getters[(method, message_type)] = getters
+        return getters
+
+    def extract(self, method, message):
+        """Returns the (key, value) pairs of the declared fields of a message
+    of the method."""
+        if method not in self._fields:
+            return ()
+        message_type = type(message)
+        getters = self._getters.get((method, message_type))
+        if getters is None:
+            getters = self._compile(method, message_type)
+        return [(key, getter(message)) for key, getter in getters]
+
+    def tag(self, span, method, message):
+        for key, value in self.extract(method, message):
+            span.set_tag(key, value)
+
+    def log(self, span, method, message):
+        key_values = self.extract(method, message)
+        if key_values:
+            span.log_kv(dict(key_values))
+
@@ -0,0 +1,197 @@
+"""Completion of RPC spans off of the RPC's thread."""
+
+import logging
+import threading
+import time
+
+from six.moves import queue
+
+import grpc_opentracing
+from grpc_opentracing import _fork
+from grpc_opentracing._counters import ShardedCounters
+import opentracing
+
+_SET_TAG = 0
+_LOG_KV = 1
+_SET_OPERATION_NAME = 2
+_DECORATE = 3
+
+_STOP = object()
+
+
+class _DeferredSpan(opentracing.Span):
+    """Records the operations applied to a span so that they can be replayed,
+    along with span.finish(), by a SpanFinisher.
+
+  Baggage is applied immediately since it must be visible to child spans
+  started while the RPC is still running. For the same reason, entering the
+  span enters the wrapped span, e.g., to make an OpenTelemetry span current,
+  and exiting it calls the wrapped span's detach() method, if it has one,
+  rather than finishing the wrapped span.
+  """
+
+    def __init__(self, span, span_finisher):
+        super(_DeferredSpan, self).__init__(span.tracer, span.context)
+        self._span = span
+        self._span_finisher = span_finisher
+        self._operations = []
+
+    @property
+    def context(self):
+        return self._span.context
+
+    def set_operation_name(self, operation_name):
+        self._operations.append((_SET_OPERATION_NAME, operation_name, None))
+        return self
+
+    def set_tag(self, key, value):
+        self._operations.append((_SET_TAG, key, value))
+        return self
+
+    def log_kv(self, key_values, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self._operations.append((_LOG_KV, key_values, timestamp))
+        return self
+
+    def set_baggage_item(self, key, value):
+        self._span.set_baggage_item(key, value)
+        return self
+
+    def get_baggage_item(self, key):
+        return self._span.get_baggage_item(key)
+
+    def __enter__(self):
+        self._span.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            super(_DeferredSpan, self).__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            detach = getattr(self._span, 'detach', None)
+            if detach is not None:
+                detach()
+
+    def defer(self, span_decorator, rpc_info):
+        self._operations.append((_DECORATE, span_decorator, rpc_info))
+
+    def finish(self, finish_time=None):
+        if finish_time is None:
+            finish_time = time.time()
+        operations, self._operations = self._operations, []
+        span = self._span
+
+        def work():
+            for operation, first, second in operations:
+                if operation == _SET_TAG:
+                    span.set_tag(first, second)
+                elif operation == _LOG_KV:
+                    span.log_kv(first, second)
+                elif operation == _SET_OPERATION_NAME:
+                    span.set_operation_name(first)
+                else:
+                    first(span, second)
+            span.finish(finish_time)
+
+        self._span_finisher.submit(work)
+
+
+def defer_span(span, span_finisher):
+    return _DeferredSpan(span, span_finisher)
+
+
+def defer_decorator(span_decorator):
+    """Wraps a SpanDecorator so that it runs when a _DeferredSpan is completed
+  rather than when the interceptor invokes it."""
+
+    def decorator(span, rpc_info):
+        span.defer(span_decorator, rpc_info)
+
+    return decorator
+
+
+class BackgroundSpanFinisher(grpc_opentracing.SpanFinisher):
+
+    def __init__(self, max_queue_size, num_threads):
+        self._max_queue_size = max_queue_size
+        self._queue = queue.Queue(max_queue_size)
+        self._num_threads = num_threads
+        self._lock = threading.Lock()
+        self._threads = []
+        self._counters = ShardedCounters(('queued', 'completed', 'dropped',
+                                          'failed'))
+        _fork.register(self)
+
+    def _after_fork_in_child(self):
+        # The worker threads do not exist in the child and the queue's locks
+        # may have been held by one of them, so start over. Work queued in
+        # the parent is the parent's to complete.
+        self._queue = queue.Queue(self._max_queue_size)
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for _ in range(self._num_threads):
+                thread = threading.Thread(
+                    target=self._run, name='grpc_opentracing-span-finisher')
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            work = self._queue.get()
+            try:
+                if work is _STOP:
+                    return
+                work()
+                self._counters.increment('completed')
+            except Exception:
+                logging.exception('span completion failed')
+                self._counters.increment('failed')
+            finally:
+                self._queue.task_done()
+
+    def submit(self, work):
+        if not self._threads:
+            self._start()
+        try:
+            self._queue.put_nowait(work)
+        except queue.Full:
+            self._counters.increment('dropped')
+            return False
+        self._counters.increment('queued')
+        return True
+
+    def counters(self):
+        return self._counters.snapshot()
+
+    def flush(self, timeout=None):
+        # Waits on the queue's own bookkeeping of unfinished work rather than
+        # on a separate pending count so that submitting and completing spans
+        # takes no lock beyond the one the queue already takes.
+        deadline = None if timeout is None else time.time() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                if deadline is None:
+                    self._queue.all_tasks_done.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        flushed = self.flush(timeout)
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(_STOP)
+        for thread in threads:
+            thread.join(timeout)
+        return flushed
@@ -0,0 +1,84 @@
+"""Resetting of per-process state in the child processes of os.fork()."""
+
+import logging
+import os
+import threading
+import weakref
+
+_lock = threading.Lock()
+_resettables = weakref.WeakSet()
+_rebindings = []
+_hooks_registered = False
+
+
+def _before_fork():
+    _lock.acquire()
+
+
+def _after_fork_in_parent():
+    _lock.release()
+
+
+def _after_fork_in_child():
+    global _lock
+    # The lock was held by the forking thread, which is the only thread the
+    # child has, but re-creating it is simpler than reasoning about that.
+    _lock = threading.Lock()
+    for resettable in list(_resettables):
+        try:
+            resettable._after_fork_in_child()
+        except Exception:
+            logging.exception('resetting %r after fork failed', resettable)
+    _prune_rebindings()
+    for tracer_factory, interceptor_refs in list(_rebindings):
+        interceptors = [ref() for ref in interceptor_refs]
+        interceptors = [
+            interceptor for interceptor in interceptors
+            if interceptor is not None
+        ]
+        if not interceptors:
+            continue
+        try:
+            tracer = tracer_factory()
+        except Exception:
+            logging.exception('tracer factory failed after fork')
+            continue
+        for interceptor in interceptors:
+            interceptor._rebind_tracer(tracer)
+
+
+def _prune_rebindings():
+    # Drops the rebindings of interceptors that no longer exist.
+    _rebindings[:] = [(tracer_factory, interceptor_refs)
+                      for tracer_factory, interceptor_refs in _rebindings
+                      if any(ref() is not None for ref in interceptor_refs)]
+
+
+def _register_hooks():
+    global _hooks_registered
+    if not _hooks_registered and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(
+            before=_before_fork,
+            after_in_parent=_after_fork_in_parent,
+            after_in_child=_after_fork_in_child)
+    _hooks_registered = True
+
+
+def register(resettable):
+    """Registers an object whose _after_fork_in_child() method resets its
+  per-process state, e.g., locks, queues and threads, in forked children.
+
+  Only a weak reference to the object is kept.
+  """
+    with _lock:
+        _register_hooks()
+        _resettables.add(resettable)
+
+
+def rebind_tracer_after_fork(tracer_factory, interceptors):
+    with _lock:
+        _register_hooks()
+        _prune_rebindings()
+        _rebindings.append((tracer_factory,
+                            [weakref.ref(interceptor)
+                             for interceptor in interceptors]))
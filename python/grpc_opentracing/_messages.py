@@ -0,0 +1,263 @@
+"""Logging of the request and response messages of RPCs."""
+
+import time
+
+import six
+
+from grpc_opentracing._counters import ShardedCounters
+
+
+class StreamSummary(object):
+    """Summarizes the messages of streams in span tags.
+
+  For each stream of an RPC, keyed 'request' or 'response', the span is
+  tagged with:
+
+    <key>.count: The number of messages.
+    <key>.bytes, <key>.max_bytes: The total and the largest size of the
+      messages, if their sizes are known: the lengths of bytes and strings,
+      or the ByteSize() of protobuf messages.
+    <key>.first_time, <key>.last_time: The times, in seconds since the epoch,
+      the first and the last message passed the interceptor.
+  """
+
+    def __init__(self, log_every):
+        if log_every is not None and log_every < 1:
+            raise ValueError('log_every must be positive')
+        self.log_every = log_every
+
+
+class MessageSpans(object):
+    """Traces the individual messages of streams.
+
+  The time a stream waited for each sampled message, i.e., for a request or
+  response to be produced by the application or to arrive, becomes a child
+  span of the RPC's span or, with events, a log of it.
+  """
+
+    def __init__(self, max_spans, sample_every, events):
+        if max_spans < 0:
+            raise ValueError('max_spans must not be negative')
+        if sample_every < 1:
+            raise ValueError('sample_every must be positive')
+        self.max_spans = max_spans
+        self.sample_every = sample_every
+        self.events = events
+        self._counters = ShardedCounters(('traced', 'over_max_spans'))
+
+    def trace(self, span, method, key, index, start_time):
+        finish_time = time.time()
+        self._counters.increment('traced')
+        if self.events:
+            span.log_kv({
+                'event': key,
+                'message.index': index,
+                'message.seconds': finish_time - start_time
+            }, finish_time)
+            return
+        span.tracer.start_span(
+            operation_name='%s %s' % (method, key),
+            child_of=span.context,
+            tags={
+                'component': 'grpc',
+                'message.index': index
+            },
+            start_time=start_time).finish(finish_time)
+
+    def over_max_spans(self):
+        self._counters.increment('over_max_spans')
+
+    def counters(self):
+        return self._counters.snapshot()
+
+
+def _size(message):
+    if isinstance(message, (six.binary_type, six.text_type)):
+        return len(message)
+    byte_size = getattr(message, 'ByteSize', None)
+    if byte_size is None:
+        return None
+    return byte_size()
+
+
+class _StreamStats(object):
+    __slots__ = ('log_every', 'count', 'bytes', 'max_bytes', 'first_time',
+                 'last_time')
+
+    def __init__(self, log_every):
+        self.log_every = log_every
+        self.count = 0
+        self.bytes = None
+        self.max_bytes = None
+        self.first_time = None
+        self.last_time = None
+
+    def add(self, message):
+        """Counts a message and returns whether it is to be logged."""
+        now = time.time()
+        if not self.count:
+            self.first_time = now
+        self.last_time = now
+        size = _size(message)
+        if size is not None:
+            if self.bytes is None:
+                self.bytes = self.max_bytes = size
+            else:
+                self.bytes += size
+                if size > self.max_bytes:
+                    self.max_bytes = size
+        count = self.count
+        self.count = count + 1
+        return self.log_every is not None and count % self.log_every == 0
+
+    def tag(self, span, key):
+        span.set_tag(key + '.count', self.count)
+        if self.bytes is not None:
+            span.set_tag(key + '.bytes', self.bytes)
+            span.set_tag(key + '.max_bytes', self.max_bytes)
+        if self.count:
+            span.set_tag(key + '.first_time', self.first_time)
+            span.set_tag(key + '.last_time', self.last_time)
+
+
+class StreamLog(object):
+    """Logs the messages of one stream of an RPC."""
+
+    __slots__ = ('_messages', '_span', '_method', '_key', '_stats', '_index',
+                 '_traced', '_waiting_since', '_ended')
+
+    def __init__(self, messages, span, method, key):
+        self._messages = messages
+        self._span = span
+        self._method = method
+        self._key = key
+        summary = messages.stream_summary
+        self._stats = None if summary is None else _StreamStats(
+            summary.log_every)
+        self._index = 0
+        self._traced = 0
+        self._waiting_since = None
+        self._ended = False
+
+    def wait(self):
+        """Called when the stream starts waiting for its next message."""
+        if self._messages.message_spans is not None and not self._ended:
+            self._waiting_since = time.time()
+
+    def _trace(self, message_spans):
+        index = self._index
+        self._index = index + 1
+        waiting_since = self._waiting_since
+        if waiting_since is None or index % message_spans.sample_every:
+            return
+        self._waiting_since = None
+        if self._traced >= message_spans.max_spans:
+            message_spans.over_max_spans()
+            return
+        self._traced += 1
+        message_spans.trace(self._span, self._method, self._key, index,
+                            waiting_since)
+
+    def message(self, message):
+        if self._ended:
+            # E.g., a request consumed after the RPC's span was finished.
+            return
+        if self._messages.message_spans is not None:
+            self._trace(self._messages.message_spans)
+        if self._stats is not None and not self._stats.add(message):
+            return
+        messages = self._messages
+        if messages.payloads is not None:
+            messages.payloads.log(self._span, self._key, message)
+        if messages.field_extractor is not None:
+            messages.field_extractor.log(self._span, self._method, message)
+
+    def rotate(self, span):
+        """Tags the current span with the summary of the stream so far and
+    continues the stream in span."""
+        stats = self._stats
+        if stats is not None:
+            stats.tag(self._span, self._key)
+            self._stats = _StreamStats(stats.log_every)
+        self._span = span
+
+    def end(self):
+        """Tags the span with the summary of the stream, once, and ignores the
+    messages of the stream from then on."""
+        self._ended = True
+        stats = self._stats
+        if stats is not None:
+            self._stats = None
+            stats.tag(self._span, self._key)
+
+
+class _RequestLoggingIterator(object):
+
+    def __init__(self, request_iterator, stream):
+        self._request_iterator = request_iterator
+        self._stream = stream
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        self._stream.wait()
+        try:
+            request = next(self._request_iterator)
+        except StopIteration:
+            self._stream.end()
+            raise
+        self._stream.message(request)
+        return request
+
+    def __next__(self):
+        return self.next()
+
+
+class MessageLogging(object):
+    """How an interceptor logs the messages of its RPCs.
+
+  Unary messages are logged as payloads and their fields are tagged;
+  streamed messages are logged as payloads and their fields are logged, all
+  or, with a StreamSummary, every log_every-th of them, and traced with
+  MessageSpans.
+  """
+
+    def __init__(self, payloads, field_extractor, stream_summary,
+                 message_spans):
+        self.payloads = payloads
+        self.field_extractor = field_extractor
+        self.stream_summary = stream_summary
+        self.message_spans = message_spans
+
+    def unary(self, span, method, key, message):
+        if self.payloads is not None:
+            self.payloads.log(span, key, message)
+        if self.field_extractor is not None:
+            self.field_extractor.tag(span, method, message)
+
+    def stream(self, span, method, key):
+        return StreamLog(self, span, method, key)
+
+    def requests(self, span, method, is_client_stream, request_or_iterator):
+        """Logs a request, or wraps a request iterator to log each request.
+
+    Returns:
+      The request or the wrapped iterator, and the StreamLog of the requests
+      or None.
+    """
+        if not is_client_stream:
+            self.unary(span, method, 'request', request_or_iterator)
+            return request_or_iterator, None
+        stream = self.stream(span, method, 'request')
+        return _RequestLoggingIterator(request_or_iterator, stream), stream
+
+
+def message_logging(payloads, field_extractor, stream_summary, message_spans):
+    """Returns the MessageLogging for the interceptor options, or None if
+  messages are not logged."""
+    if payloads is None and field_extractor is None and \
+            stream_summary is None and message_spans is None:
+        return None
+    return MessageLogging(payloads, field_extractor, stream_summary,
+                          message_spans)
@@ -0,0 +1,269 @@
+"""Creation of OpenTelemetry spans by the interceptors.
+
+The interceptors are written against the opentracing.Tracer interface. Rather
+than going through the OpenTracing shim, which wraps every OpenTelemetry span
+and span context in OpenTracing objects and activates a scope for each span,
+OpenTelemetryTracer creates one OpenTelemetry span per RPC, passes it the
+semantic-convention rpc.* attributes when starting it and translates the
+interceptors' tags and logs into attributes and events.
+"""
+
+import traceback
+
+import grpc
+import opentracing
+from opentracing.ext import tags as ot_tags
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, TraceFlags, TraceState
+from opentelemetry.trace.status import Status, StatusCode
+
+_KINDS = {
+    ot_tags.SPAN_KIND_RPC_CLIENT: SpanKind.CLIENT,
+    ot_tags.SPAN_KIND_RPC_SERVER: SpanKind.SERVER,
+}
+
+# OpenTracing tags that the span kind and the rpc.* attributes replace.
+_DROPPED_TAGS = frozenset((ot_tags.SPAN_KIND, ot_tags.COMPONENT))
+
+_ATTRIBUTE_NAMES = {
+    ot_tags.PEER_HOST_IPV4: 'network.peer.address',
+    ot_tags.PEER_HOST_IPV6: 'network.peer.address',
+    ot_tags.PEER_PORT: 'network.peer.port',
+}
+
+_STATUS_CODES = dict(
+    (str(code), code.value[0]) for code in grpc.StatusCode)
+
+_ATTRIBUTE_TYPES = (bool, str, bytes, int, float)
+
+
+def _to_ns(seconds):
+    return int(seconds * 1e9)
+
+
+def _attribute_value(value):
+    if isinstance(value, _ATTRIBUTE_TYPES):
+        return value
+    if isinstance(value, type):
+        return value.__name__
+    return str(value)
+
+
+def _rpc_attributes(full_method, tags):
+    attributes = {'rpc.system': 'grpc'}
+    if full_method:
+        service, _, method = full_method.lstrip('/').rpartition('/')
+        if service:
+            attributes['rpc.service'] = service
+        attributes['rpc.method'] = method
+    if tags:
+        for key, value in tags.items():
+            if key not in _DROPPED_TAGS:
+                key = _ATTRIBUTE_NAMES.get(key, key)
+                if key == 'network.peer.port':
+                    value = int(value)
+                attributes[key] = _attribute_value(value)
+    return attributes
+
+
+def _exception_attributes(key_values, attributes):
+    """Translates the fields of an OpenTracing error log into the attributes
+  of an OpenTelemetry exception event."""
+    for key, value in key_values.items():
+        if key == 'event':
+            continue
+        if key == 'error.object':
+            if isinstance(value, BaseException):
+                attributes['exception.type'] = type(value).__name__
+                attributes.setdefault('exception.message', str(value))
+            else:
+                attributes['exception.type'] = _attribute_value(value)
+        elif key == 'error.kind':
+            attributes.setdefault('exception.type', _attribute_value(value))
+        elif key == 'message':
+            attributes['exception.message'] = _attribute_value(value)
+        elif key == 'stack':
+            attributes['exception.stacktrace'] = ''.join(
+                traceback.format_tb(value)) if value is not None else ''
+        else:
+            attributes[key] = _attribute_value(value)
+
+
+def _span_context(context):
+    """Returns the trace.SpanContext of a span, a span context or a context
+  extracted by extract()."""
+    if isinstance(context, _Span):
+        return context.otel_span.get_span_context()
+    if isinstance(context, trace.SpanContext):
+        return context
+    return trace.get_current_span(context).get_span_context()
+
+
+class _Span(opentracing.Span):
+
+    def __init__(self, tracer, span, kind):
+        # The context is read from the OpenTelemetry span when needed.
+        super(_Span, self).__init__(tracer, None)
+        self.otel_span = span
+        self._kind = kind
+        self._error = False
+        self._status_code = None
+        self._token = None
+
+    @property
+    def context(self):
+        return self.otel_span.get_span_context()
+
+    def set_operation_name(self, operation_name):
+        self.otel_span.update_name(operation_name)
+        return self
+
+    def set_tag(self, key, value):
+        if key == ot_tags.ERROR:
+            self._error = bool(value)
+        elif key not in _DROPPED_TAGS:
+            key = _ATTRIBUTE_NAMES.get(key, key)
+            self.otel_span.set_attribute(key, _attribute_value(value))
+        return self
+
+    def log_kv(self, key_values, timestamp=None):
+        name = key_values.get('event', 'log')
+        attributes = {}
+        if name == 'error':
+            name = 'exception'
+            _exception_attributes(key_values, attributes)
+            status_code = _STATUS_CODES.get(key_values.get('error.kind'))
+            if status_code is not None:
+                self._status_code = status_code
+        else:
+            for key, value in key_values.items():
+                if key != 'event':
+                    attributes[key] = _attribute_value(value)
+        self.otel_span.add_event(
+            name, attributes, None if timestamp is None else _to_ns(timestamp))
+        return self
+
+    def set_baggage_item(self, key, value):
+        # OpenTelemetry baggage belongs to contexts rather than spans; set it
+        # with opentelemetry.baggage instead.
+        return self
+
+    def get_baggage_item(self, key):
+        return None
+
+    def __enter__(self):
+        if self._kind == SpanKind.SERVER:
+            # Spans started by the handler with the OpenTelemetry API become
+            # children of the RPC's span.
+            self._token = otel_context.attach(
+                trace.set_span_in_context(self.otel_span))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            super(_Span, self).__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            self.detach()
+
+    def detach(self):
+        """Undoes __enter__ without finishing the span."""
+        if self._token is not None:
+            otel_context.detach(self._token)
+            self._token = None
+
+    def finish(self, finish_time=None):
+        span = self.otel_span
+        if self._status_code is not None:
+            span.set_attribute('rpc.grpc.status_code', self._status_code)
+        elif not self._error:
+            span.set_attribute('rpc.grpc.status_code',
+                               grpc.StatusCode.OK.value[0])
+        if self._error:
+            span.set_status(Status(StatusCode.ERROR))
+        span.end(None if finish_time is None else _to_ns(finish_time))
+
+
+class OpenTelemetryTracer(opentracing.Tracer):
+    """Presents an OpenTelemetry tracer to the interceptors."""
+
+    def __init__(self, tracer, propagator):
+        super(OpenTelemetryTracer, self).__init__()
+        self._tracer = tracer
+        self._propagator = propagator
+
+    def start_span(self,
+                   operation_name=None,
+                   child_of=None,
+                   references=None,
+                   tags=None,
+                   start_time=None,
+                   ignore_active_span=False):
+        # The first CHILD_OF reference is the parent; FOLLOWS_FROM and any
+        # further references become links.
+        links = []
+        for reference in references or ():
+            if child_of is None and \
+                    reference.type == opentracing.ReferenceType.CHILD_OF:
+                child_of = reference.referenced_context
+            else:
+                links.append(
+                    trace.Link(_span_context(reference.referenced_context)))
+        if isinstance(child_of, _Span):
+            context = trace.set_span_in_context(child_of.otel_span)
+        elif isinstance(child_of, trace.SpanContext):
+            context = trace.set_span_in_context(
+                trace.NonRecordingSpan(child_of))
+        elif child_of is not None:
+            # A context extracted by extract().
+            context = child_of
+        elif ignore_active_span or links:
+            context = otel_context.Context()
+        else:
+            context = None
+        kind = _KINDS.get(tags.get(ot_tags.SPAN_KIND) if tags else None,
+                          SpanKind.INTERNAL)
+        span = self._tracer.start_span(
+            operation_name.lstrip('/') if operation_name else operation_name,
+            context=context,
+            kind=kind,
+            links=links,
+            attributes=_rpc_attributes(operation_name, tags),
+            start_time=None if start_time is None else _to_ns(start_time))
+        return _Span(self, span, kind)
+
+    def inject(self, span_context, format, carrier):
+        if format not in (opentracing.Format.TEXT_MAP,
+                          opentracing.Format.HTTP_HEADERS):
+            raise opentracing.UnsupportedFormatException(format)
+        self._propagator.inject(
+            carrier,
+            context=trace.set_span_in_context(
+                trace.NonRecordingSpan(span_context)))
+
+    def extract(self, format, carrier):
+        if format not in (opentracing.Format.TEXT_MAP,
+                          opentracing.Format.HTTP_HEADERS):
+            raise opentracing.UnsupportedFormatException(format)
+        context = self._propagator.extract(carrier)
+        if not trace.get_current_span(context).get_span_context().is_valid:
+            return None
+        return context
+
+    def span_context_from_ids(self, trace_id, span_id, sampled, trace_state):
+        return trace.SpanContext(
+            trace_id,
+            span_id,
+            is_remote=True,
+            trace_flags=TraceFlags(TraceFlags.DEFAULT if sampled is False else
+                                   TraceFlags.SAMPLED),
+            trace_state=None if trace_state is None else
+            TraceState.from_header([trace_state]))
+
+
+def open_telemetry_tracer(tracer, propagator):
+    if tracer is None:
+        tracer = trace.get_tracer('grpc_opentracing')
+    if propagator is None:
+        propagator = propagate.get_global_textmap()
+    return OpenTelemetryTracer(tracer, propagator)
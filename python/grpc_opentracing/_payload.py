@@ -0,0 +1,230 @@
+"""Bounded, lazily formatted or content-addressed payload logs."""
+
+import collections
+import errno
+import hashlib
+import os
+import threading
+import time
+
+import six
+
+from grpc_opentracing import _fork
+from grpc_opentracing._counters import ShardedCounters
+
+
+class LazyPayload(object):
+    """Stands in for a payload in a span's logs.
+
+  A bounded snapshot of the payload is taken right away, on the RPC's thread,
+  so that the log neither keeps the payload alive nor reflects later changes
+  to it: bytes, and protobuf messages serialized as by serialize(), are cut
+  to max_bytes bytes, and strings, and the string representations of other
+  payloads, to max_bytes characters. The snapshot is converted to a string of
+  at most max_bytes characters, followed by a truncation marker, only when a
+  tracer or reporter does so.
+  """
+
+    __slots__ = ('_snapshot', '_size', '_max_bytes', '_text')
+
+    def __init__(self, payload, max_bytes):
+        if not isinstance(payload, six.text_type):
+            if isinstance(payload, six.binary_type) or \
+                    hasattr(payload, 'SerializeToString'):
+                payload = serialize(payload)
+            else:
+                payload = six.text_type(payload)
+        self._size = len(payload)
+        self._snapshot = payload[:max_bytes]
+        self._max_bytes = max_bytes
+        self._text = None
+
+    def _format(self):
+        snapshot = self._snapshot
+        if isinstance(snapshot, six.text_type):
+            text = snapshot
+            unit = 'characters'
+        else:
+            # Escaping makes the representation of bytes longer than the
+            # bytes, so fewer of them may fit into max_bytes characters.
+            snapshot = snapshot[:_repr_prefix_length(snapshot,
+                                                     self._max_bytes)]
+            text = repr(snapshot)
+            unit = 'bytes'
+        truncated = self._size - len(snapshot)
+        if truncated > 0:
+            text = '%s...<%d %s truncated>' % (text, truncated, unit)
+        self._text = text
+        return text
+
+    def __str__(self):
+        text = self._text
+        return self._format() if text is None else text
+
+    __repr__ = __str__
+
+
+def _repr_prefix_length(data, max_length):
+    """Returns the length of the longest prefix of data whose repr() is at most
+  max_length characters long."""
+    low, high = 0, len(data)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if len(repr(data[:middle])) <= max_length:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def serialize(payload):
+    """Returns the bytes of a payload: bytes as they are, strings encoded as
+  UTF-8, protobuf messages serialized deterministically, and the string
+  representation of other payloads."""
+    if isinstance(payload, six.binary_type):
+        return payload
+    serialize_to_string = getattr(payload, 'SerializeToString', None)
+    if serialize_to_string is not None:
+        return serialize_to_string(deterministic=True)
+    if not isinstance(payload, six.text_type):
+        payload = six.text_type(payload)
+    return payload.encode('utf-8')
+
+
+class PayloadLogging(object):
+    """Logs the payloads of an interceptor's RPCs to their spans.
+
+  Payloads are logged as they are, as LazyPayloads if a max_payload_bytes is
+  given, or only as the digests and sizes they are stored under if a
+  PayloadStore is. Stored payloads are serialized on the RPC's thread but, if
+  spans are deferred to a SpanFinisher, digested and written by it.
+  """
+
+    def __init__(self, max_payload_bytes, payload_store, deferred):
+        self._max_payload_bytes = max_payload_bytes
+        self._payload_store = payload_store
+        self._deferred = deferred
+
+    def _log_stored(self, span, key, data, timestamp=None):
+        digest, size = self._payload_store.put_bytes(data)
+        span.log_kv({key + '.digest': digest, key + '.size': size}, timestamp)
+
+    def log(self, span, key, payload):
+        if self._payload_store is not None:
+            # Serialized right away, since the application may reuse the
+            # payload once the RPC is done with it.
+            data = serialize(payload)
+            if not self._deferred:
+                self._log_stored(span, key, data)
+                return
+            timestamp = time.time()
+            span.defer(
+                lambda span, _: self._log_stored(span, key, data, timestamp),
+                None)
+            return
+        if self._max_payload_bytes is not None:
+            payload = LazyPayload(payload, self._max_payload_bytes)
+        span.log_kv({key: payload})
+
+
+def payload_logging(log_payloads, max_payload_bytes, payload_store,
+                    deferred):
+    """Returns the PayloadLogging for the interceptor options, or None if
+  payloads are not logged."""
+    if max_payload_bytes is not None and payload_store is not None:
+        raise ValueError('max_payload_bytes and payload_store cannot be '
+                         'combined')
+    if not log_payloads:
+        return None
+    return PayloadLogging(max_payload_bytes, payload_store, deferred)
+
+
+class PayloadStore(object):
+    """Stores serialized payloads in a directory, once per content.
+
+  A payload is stored in the file <directory>/<digest[:2]>/<digest[2:]>
+  named by the SHA-256 digest of its bytes. Files are written to a temporary
+  name and renamed, so readers and concurrent writers, also in other
+  processes, never see partial payloads. The digests of the max_known payloads
+  stored or found most recently are remembered so that repeated payloads skip
+  the file system.
+  """
+
+    def __init__(self, directory, max_known=65536):
+        self._directory = directory
+        self._max_known = max_known
+        self._lock = threading.Lock()
+        # The known digests, least recently used first.
+        self._known = collections.OrderedDict()
+        self._counters = ShardedCounters(('stored', 'deduplicated'))
+        _make_directory(directory)
+        _fork.register(self)
+
+    def _after_fork_in_child(self):
+        # The payloads the parent stored are found in the directory.
+        self._lock = threading.Lock()
+        self._known = collections.OrderedDict()
+
+    def _is_known(self, digest):
+        with self._lock:
+            if digest not in self._known:
+                return False
+            self._known[digest] = self._known.pop(digest)
+            return True
+
+    def _add_known(self, digest):
+        with self._lock:
+            self._known[digest] = True
+            if len(self._known) > self._max_known:
+                self._known.popitem(last=False)
+
+    def _path(self, digest):
+        return os.path.join(self._directory, digest[:2], digest[2:])
+
+    def _write(self, path, data):
+        _make_directory(os.path.dirname(path))
+        temporary = '%s.%d.%d.tmp' % (path, os.getpid(),
+                                      threading.current_thread().ident)
+        with open(temporary, 'wb') as stream:
+            stream.write(data)
+        try:
+            os.rename(temporary, path)
+        except OSError:
+            # Another writer renamed first, e.g., on Windows.
+            os.remove(temporary)
+
+    def put(self, payload):
+        """Stores a payload, unless it is stored already, and returns the
+    (digest, size) of its bytes."""
+        return self.put_bytes(serialize(payload))
+
+    def put_bytes(self, data):
+        """Stores the bytes of a serialized payload, as put() does."""
+        digest = hashlib.sha256(data).hexdigest()
+        if self._is_known(digest):
+            self._counters.increment('deduplicated')
+            return digest, len(data)
+        path = self._path(digest)
+        if os.path.exists(path):
+            self._counters.increment('deduplicated')
+        else:
+            self._write(path, data)
+            self._counters.increment('stored')
+        self._add_known(digest)
+        return digest, len(data)
+
+    def get(self, digest):
+        """Returns the bytes of the payload with the digest."""
+        with open(self._path(digest), 'rb') as stream:
+            return stream.read()
+
+    def counters(self):
+        return self._counters.snapshot()
+
+
+def _make_directory(directory):
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
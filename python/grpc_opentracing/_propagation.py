@@ -0,0 +1,224 @@
+"""Propagation of span contexts in gRPC metadata.
+
+By default span contexts are injected and extracted by the tracer, in the
+HTTP_HEADERS format, with a dict as the carrier. Alternatively, they are
+injected in the BINARY format into a single binary metadata entry, or encoded
+by one of the codecs here in the W3C Trace Context or B3 single-header format,
+straight from and into the metadata tuple, parsing header values at their
+fixed offsets. The codecs work with tracers that
+provide span_context_from_ids(trace_id, span_id, sampled, trace_state) and
+whose span contexts have integer trace_id and span_id attributes. As both
+formats require, ids of zero are invalid, and hex digits are lowercase.
+"""
+
+import six
+from six import iteritems
+
+import opentracing
+from grpc_opentracing._utilities import context_ids
+
+_HEX_DIGITS = frozenset('0123456789abcdef')
+# The flags whose sampled bit is set end with one of these.
+_ODD_HEX_DIGITS = frozenset('13579bdf')
+
+_TRACEPARENT = 'traceparent'
+_TRACESTATE = 'tracestate'
+# version "-" trace id "-" parent id "-" flags
+_TRACEPARENT_LENGTH = 55
+_SAMPLED = 0x01
+
+_B3 = 'b3'
+_MAX_64_BIT_ID = (1 << 64) - 1
+
+
+class TextPropagation(object):
+
+    def __init__(self, baggage_limits=None):
+        self._baggage_limits = baggage_limits
+
+    def inject(self, tracer, span_context, metadata):
+        headers = {}
+        tracer.inject(span_context, opentracing.Format.HTTP_HEADERS, headers)
+        if self._baggage_limits is not None:
+            self._baggage_limits.limit(headers)
+        return metadata + tuple(iteritems(headers))
+
+    def extract(self, tracer, metadata):
+        headers = dict(metadata)
+        if self._baggage_limits is not None:
+            self._baggage_limits.limit(headers)
+        return tracer.extract(opentracing.Format.HTTP_HEADERS, headers)
+
+
+_TEXT = TextPropagation()
+
+
+class BinaryPropagation(object):
+
+    def __init__(self, key, text):
+        if not key.endswith('-bin') or key != key.lower():
+            raise ValueError(
+                'binary metadata keys must be lowercase and end with -bin')
+        self._key = key
+        self._text = text
+
+    def inject(self, tracer, span_context, metadata):
+        carrier = bytearray()
+        tracer.inject(span_context, opentracing.Format.BINARY, carrier)
+        return metadata + ((self._key, bytes(carrier)),)
+
+    def extract(self, tracer, metadata):
+        for key, value in metadata:
+            if key == self._key:
+                return tracer.extract(opentracing.Format.BINARY,
+                                      bytearray(value))
+        # Clients that do not propagate binary span contexts send text headers.
+        return self._text.extract(tracer, metadata)
+
+
+def _hex_id(value):
+    # int() would also accept uppercase digits, signs, underscores, whitespace
+    # and a 0x prefix.
+    if not _HEX_DIGITS.issuperset(value):
+        raise opentracing.SpanContextCorruptedException()
+    hex_id = int(value, 16)
+    if not hex_id:
+        raise opentracing.SpanContextCorruptedException()
+    return hex_id
+
+
+def _ids(span_context):
+    trace_id, span_id = context_ids(span_context)
+    if not isinstance(trace_id, six.integer_types) or \
+            not isinstance(span_id, six.integer_types):
+        # The tracer's span contexts cannot be encoded.
+        raise opentracing.UnsupportedFormatException()
+    if trace_id <= 0 or span_id <= 0:
+        raise opentracing.SpanContextCorruptedException()
+    return trace_id, span_id
+
+
+def _sampled(span_context):
+    return bool(getattr(span_context, 'trace_flags', _SAMPLED) & _SAMPLED)
+
+
+def parse_traceparent(value):
+    """Returns the (trace_id, span_id, sampled) of a traceparent header
+  value."""
+    length = len(value)
+    if length < _TRACEPARENT_LENGTH or value[2] != '-' or \
+            value[35] != '-' or value[52] != '-':
+        raise opentracing.SpanContextCorruptedException()
+    if length > _TRACEPARENT_LENGTH:
+        # Only versions after 00 may append fields.
+        if value[0:2] == '00' or value[_TRACEPARENT_LENGTH] != '-':
+            raise opentracing.SpanContextCorruptedException()
+    version = value[0:2]
+    flags = value[53:55]
+    if version == 'ff' or not _HEX_DIGITS.issuperset(version + flags):
+        raise opentracing.SpanContextCorruptedException()
+    return (_hex_id(value[3:35]), _hex_id(value[36:52]),
+            flags[1] in _ODD_HEX_DIGITS)
+
+
+class W3CPropagation(object):
+    """Propagates span contexts in traceparent and tracestate entries."""
+
+    def inject(self, tracer, span_context, metadata):
+        trace_id, span_id = _ids(span_context)
+        metadata += ((_TRACEPARENT, '00-%032x-%016x-%02x' %
+                      (trace_id, span_id,
+                       _SAMPLED if _sampled(span_context) else 0)),)
+        trace_state = getattr(span_context, 'trace_state', None)
+        if trace_state:
+            if not isinstance(trace_state, six.string_types):
+                trace_state = trace_state.to_header()
+            metadata += ((_TRACESTATE, trace_state),)
+        return metadata
+
+    def extract(self, tracer, metadata):
+        traceparent = None
+        trace_states = []
+        for key, value in metadata:
+            if key == _TRACEPARENT:
+                traceparent = value
+            elif key == _TRACESTATE:
+                trace_states.append(value)
+        if traceparent is None:
+            return None
+        trace_id, span_id, sampled = parse_traceparent(traceparent)
+        return tracer.span_context_from_ids(
+            trace_id, span_id, sampled,
+            ','.join(trace_states) if trace_states else None)
+
+
+def parse_b3(value):
+    """Returns the (trace_id, span_id, sampled) of a b3 header value, or None
+  if it only carries a sampling decision; sampled is None if it carries
+  none."""
+    if len(value) <= 1:
+        # Only a sampling decision.
+        return None
+    trace_end = 32 if len(value) > 32 and value[32] == '-' else 16
+    span_end = trace_end + 17
+    if len(value) < span_end or value[trace_end] != '-' or \
+            (len(value) > span_end and value[span_end] != '-'):
+        raise opentracing.SpanContextCorruptedException()
+    trace_id = _hex_id(value[0:trace_end])
+    span_id = _hex_id(value[trace_end + 1:span_end])
+    sampled = None
+    if len(value) > span_end:
+        # The sampling decision, optionally followed by the parent span id.
+        sampling = value[span_end + 1:span_end + 2]
+        if len(value) > span_end + 2 and value[span_end + 2] != '-':
+            raise opentracing.SpanContextCorruptedException()
+        if sampling in ('1', 'd'):
+            sampled = True
+        elif sampling == '0':
+            sampled = False
+        else:
+            raise opentracing.SpanContextCorruptedException()
+    return trace_id, span_id, sampled
+
+
+class B3Propagation(object):
+    """Propagates span contexts in a b3 single-header entry."""
+
+    def inject(self, tracer, span_context, metadata):
+        trace_id, span_id = _ids(span_context)
+        return metadata + ((_B3, ('%016x-%016x-%s' if trace_id <=
+                                  _MAX_64_BIT_ID else '%032x-%016x-%s') %
+                            (trace_id, span_id,
+                             '1' if _sampled(span_context) else '0')),)
+
+    def extract(self, tracer, metadata):
+        for key, value in metadata:
+            if key == _B3:
+                ids = parse_b3(value)
+                if ids is None:
+                    return None
+                trace_id, span_id, sampled = ids
+                return tracer.span_context_from_ids(trace_id, span_id, sampled,
+                                                    None)
+        return None
+
+
+_CODECS = {'w3c': W3CPropagation(), 'b3': B3Propagation()}
+
+
+def propagation(tracer, codec, binary_metadata_key, baggage_limits=None):
+    """Returns the propagation for the interceptor options."""
+    if codec is not None:
+        if binary_metadata_key is not None:
+            raise ValueError('a propagation codec and a binary metadata key '
+                             'cannot be combined')
+        if codec not in _CODECS:
+            raise ValueError('propagation_codec must be one of %s' %
+                             ', '.join(sorted(_CODECS)))
+        if getattr(tracer, 'span_context_from_ids', None) is None:
+            raise ValueError('the tracer does not support propagation codecs')
+        return _CODECS[codec]
+    text = _TEXT if baggage_limits is None else TextPropagation(baggage_limits)
+    if binary_metadata_key is not None:
+        return BinaryPropagation(binary_metadata_key, text)
+    return text
@@ -0,0 +1,66 @@
+"""Rotation of the spans of long-lived streaming RPCs."""
+
+import time
+
+import opentracing
+
+SEGMENT_TAG = 'stream.segment'
+
+
+class SpanRotation(object):
+    """Finishes the span of a response stream every max_messages messages or
+  max_seconds seconds and continues the RPC in a new span that follows from
+  it."""
+
+    def __init__(self, max_messages, max_seconds):
+        if max_messages is None and max_seconds is None:
+            raise ValueError('max_messages or max_seconds must be given')
+        if max_messages is not None and max_messages < 1:
+            raise ValueError('max_messages must be positive')
+        if max_seconds is not None and max_seconds <= 0:
+            raise ValueError('max_seconds must be positive')
+        self.max_messages = max_messages
+        self.max_seconds = max_seconds
+
+
+class Segments(object):
+    """Tracks the segment of a stream that its current span covers."""
+
+    __slots__ = ('_max_messages', '_max_seconds', '_messages', '_deadline',
+                 'index')
+
+    def __init__(self, rotation):
+        self._max_messages = rotation.max_messages
+        self._max_seconds = rotation.max_seconds
+        self.index = 0
+        self._start()
+
+    def _start(self):
+        self._messages = 0
+        self._deadline = None if self._max_seconds is None else \
+            time.time() + self._max_seconds
+
+    def due(self):
+        """Counts a message and returns whether the span is to be rotated."""
+        self._messages += 1
+        if self._max_messages is not None and \
+                self._messages >= self._max_messages:
+            return True
+        return self._deadline is not None and time.time() >= self._deadline
+
+    def rotate(self, guarded_span, start_span, streams):
+        """Finishes the guarded span and replaces it with the continuation
+    returned by start_span(references, segment), also in the streams."""
+        previous = guarded_span.span
+        if not self.index:
+            previous.set_tag(SEGMENT_TAG, 0)
+        self.index += 1
+        span = start_span([opentracing.follows_from(previous.context)],
+                          self.index)
+        for stream in streams:
+            if stream is not None:
+                stream.rotate(span)
+        guarded_span.span = span
+        previous.finish()
+        self._start()
+        return span
@@ -3,11 +3,13 @@
 import sys
 import logging
 import re
+import threading
 
 import grpc
-from grpc_opentracing import grpcext, ActiveSpanSource
+from grpc_opentracing import grpcext, ActiveSpanSource, _finisher, \
+    _messages, _payload, _propagation, _rotation, _tee
 from grpc_opentracing._utilities import get_method_type, get_deadline_millis,\
-    log_or_wrap_request_or_iterator, RpcInfo
+    GuardedSpan, RpcInfo
 import opentracing
 from opentracing.ext import tags as ot_tags
 
@@ -64,16 +66,22 @@ class _OpenTracingServicerContext(grpc.ServicerContext, ActiveSpanSource):
     def get_active_span(self):
         return self._active_span
 
+    def set_active_span(self, span):
+        self._active_span = span
+
+
+# Compiled once rather than looked up in the shared `re` cache on every RPC.
+_IPV4_RE = re.compile(r"ipv4:(?P<address>.+):(?P<port>\d+)")
+_IPV6_RE = re.compile(r"ipv6:\[(?P<address>.+)\]:(?P<port>\d+)")
+
 
 def _add_peer_tags(peer_str, tags):
-    ipv4_re = r"ipv4:(?P<address>.+):(?P<port>\d+)"
-    match = re.match(ipv4_re, peer_str)
+    match = _IPV4_RE.match(peer_str)
     if match:
         tags[ot_tags.PEER_HOST_IPV4] = match.group('address')
         tags[ot_tags.PEER_PORT] = match.group('port')
         return
-    ipv6_re = r"ipv6:\[(?P<address>.+)\]:(?P<port>\d+)"
-    match = re.match(ipv6_re, peer_str)
+    match = _IPV6_RE.match(peer_str)
     if match:
         tags[ot_tags.PEER_HOST_IPV6] = match.group('address')
         tags[ot_tags.PEER_PORT] = match.group('port')
@@ -94,48 +102,138 @@ def _check_error_code(span, servicer_context, rpc_info):
         rpc_info.error = servicer_context.code
 
 
+class _StreamCompletion(object):
+    """Completes the span of a response stream once: when the stream ends or,
+  if the RPC is cancelled first, as soon as gRPC reports it terminated rather
+  than when gRPC closes the stream, if it ever does. A cancelled RPC's RpcInfo
+  then drops its metadata and payloads right away.
+  """
+
+    def __init__(self, guarded_span, rpc_info, streams):
+        self._lock = threading.Lock()
+        self._guarded_span = guarded_span
+        self._rpc_info = rpc_info
+        self._streams = streams
+
+    def _claim(self):
+        with self._lock:
+            guarded_span = self._guarded_span
+            self._guarded_span = None
+            return guarded_span
+
+    def _end_streams(self):
+        for stream in self._streams:
+            if stream is not None:
+                stream.end()
+
+    def rotate(self, segments, start_span):
+        """Rotates the span unless the RPC has been cancelled; returns the new
+    span or None."""
+        with self._lock:
+            if self._guarded_span is None:
+                return None
+            return segments.rotate(self._guarded_span, start_span,
+                                   self._streams)
+
+    def end(self):
+        """Called by the stream as it ends; returns whether the stream still
+    owns the span. If it does not, the span was finished when the RPC was
+    cancelled."""
+        if self._claim() is None:
+            return False
+        self._end_streams()
+        self._streams = self._rpc_info = None
+        return True
+
+    def cancel(self):
+        """Called by gRPC once the RPC has terminated."""
+        guarded_span = self._claim()
+        if guarded_span is None:
+            return
+        span = guarded_span.span
+        span.set_tag('cancelled', True)
+        self._end_streams()
+        # The stream may not be closed for a long time, if ever.
+        rpc_info = self._rpc_info
+        rpc_info.metadata = rpc_info.request = rpc_info.response = None
+        span.finish()
+        self._streams = self._rpc_info = None
+
+
 class OpenTracingServerInterceptor(grpcext.UnaryServerInterceptor,
                                    grpcext.StreamServerInterceptor):
 
-    def __init__(self, tracer, log_payloads, span_decorator):
+    def __init__(self, tracer, log_payloads, span_decorator, span_finisher,
+                 binary_metadata_key=None, propagation_codec=None,
+                 baggage_limits=None, max_payload_bytes=None,
+                 field_extractor=None, stream_summary=None,
+                 span_rotation=None, message_spans=None, payload_store=None):
+        tracer = _tee.tee(tracer)
         self._tracer = tracer
-        self._log_payloads = log_payloads
+        self._messages = _messages.message_logging(
+            _payload.payload_logging(log_payloads, max_payload_bytes,
+                                     payload_store, span_finisher is not None),
+            field_extractor, stream_summary, message_spans)
+        self._propagation = _propagation.propagation(
+            tracer, propagation_codec, binary_metadata_key, baggage_limits)
+        self._span_rotation = span_rotation
+        self._span_finisher = span_finisher
+        if span_finisher is not None and span_decorator is not None:
+            span_decorator = _finisher.defer_decorator(span_decorator)
         self._span_decorator = span_decorator
 
-    def _start_span(self, servicer_context, method):
+    def _rebind_tracer(self, tracer):
+        self._tracer = _tee.tee(tracer)
+
+    def _start_span(self,
+                    servicer_context,
+                    method,
+                    span_context=None,
+                    references=None,
+                    segment=None):
+        tags = {
+            ot_tags.COMPONENT: 'grpc',
+            ot_tags.SPAN_KIND: ot_tags.SPAN_KIND_RPC_SERVER
+        }
+        _add_peer_tags(servicer_context.peer(), tags)
+        if segment is not None:
+            tags[_rotation.SEGMENT_TAG] = segment
+        span = self._tracer.start_span(
+            operation_name=method,
+            child_of=span_context,
+            references=references,
+            tags=tags)
+        if self._span_finisher is not None:
+            span = _finisher.defer_span(span, self._span_finisher)
+        return span
+
+    def _start_guarded_span(self, servicer_context, method):
         span_context = None
         error = None
         metadata = servicer_context.invocation_metadata()
         try:
             if metadata:
-                span_context = self._tracer.extract(
-                    opentracing.Format.HTTP_HEADERS, dict(metadata))
+                span_context = self._propagation.extract(self._tracer, metadata)
         except (opentracing.UnsupportedFormatException,
                 opentracing.InvalidCarrierException,
                 opentracing.SpanContextCorruptedException) as e:
             logging.exception('tracer.extract() failed')
             error = e
-        tags = {
-            ot_tags.COMPONENT: 'grpc',
-            ot_tags.SPAN_KIND: ot_tags.SPAN_KIND_RPC_SERVER
-        }
-        _add_peer_tags(servicer_context.peer(), tags)
-        span = self._tracer.start_span(
-            operation_name=method, child_of=span_context, tags=tags)
+        span = self._start_span(servicer_context, method, span_context)
         if error is not None:
             span.log_kv({'event': 'error', 'error.object': error})
-        return span
+        return GuardedSpan(span)
 
     def intercept_unary(self, request, servicer_context, server_info, handler):
-        with self._start_span(servicer_context,
-                              server_info.full_method) as span:
-            rpc_info = RpcInfo(
-                full_method=server_info.full_method,
-                metadata=servicer_context.invocation_metadata(),
-                timeout=servicer_context.time_remaining(),
-                request=request)
-            if self._log_payloads:
-                span.log_kv({'request': request})
+        with self._start_guarded_span(servicer_context,
+                                      server_info.full_method) as guarded_span:
+            span = guarded_span.span
+            rpc_info = RpcInfo(server_info.full_method,
+                               servicer_context.invocation_metadata(),
+                               servicer_context.time_remaining(), request)
+            if self._messages is not None:
+                self._messages.unary(span, server_info.full_method, 'request',
+                                     request)
             servicer_context = _OpenTracingServicerContext(
                 servicer_context, span)
             try:
@@ -148,8 +246,9 @@ class OpenTracingServerInterceptor(grpcext.UnaryServerInterceptor,
                 if self._span_decorator is not None:
                     self._span_decorator(span, rpc_info)
                 raise
-            if self._log_payloads:
-                span.log_kv({'response': response})
+            if self._messages is not None:
+                self._messages.unary(span, server_info.full_method,
+                                     'response', response)
             _check_error_code(span, servicer_context, rpc_info)
             rpc_info.response = response
             if self._span_decorator is not None:
@@ -161,26 +260,54 @@ class OpenTracingServerInterceptor(grpcext.UnaryServerInterceptor,
     # result in a new generator that yields the response values.
     def _intercept_server_stream(self, request_or_iterator, servicer_context,
                                  server_info, handler):
-        with self._start_span(servicer_context,
-                              server_info.full_method) as span:
-            rpc_info = RpcInfo(
-                full_method=server_info.full_method,
-                metadata=servicer_context.invocation_metadata(),
-                timeout=servicer_context.time_remaining())
+        with self._start_guarded_span(servicer_context,
+                                      server_info.full_method) as guarded_span:
+            span = guarded_span.span
+            rpc_info = RpcInfo(server_info.full_method,
+                               servicer_context.invocation_metadata(),
+                               servicer_context.time_remaining())
             if not server_info.is_client_stream:
                 rpc_info.request = request_or_iterator
-            if self._log_payloads:
-                request_or_iterator = log_or_wrap_request_or_iterator(
-                    span, server_info.is_client_stream, request_or_iterator)
+            requests = responses = None
+            if self._messages is not None:
+                request_or_iterator, requests = self._messages.requests(
+                    span, server_info.full_method,
+                    server_info.is_client_stream, request_or_iterator)
+                responses = self._messages.stream(span,
+                                                  server_info.full_method,
+                                                  'response')
+            segments = None
+            if self._span_rotation is not None:
+                segments = _rotation.Segments(self._span_rotation)
+            completion = _StreamCompletion(guarded_span, rpc_info,
+                                           (requests, responses))
+            servicer_context.add_callback(completion.cancel)
             servicer_context = _OpenTracingServicerContext(
                 servicer_context, span)
             try:
                 result = handler(request_or_iterator, servicer_context)
+                if responses is not None:
+                    responses.wait()
                 for response in result:
-                    if self._log_payloads:
-                        span.log_kv({'response': response})
+                    if responses is not None:
+                        responses.message(response)
+                    if segments is not None and segments.due():
+                        rotated = completion.rotate(
+                            segments,
+                            lambda references, segment: self._start_span(
+                                servicer_context, server_info.full_method,
+                                None, references, segment))
+                        if rotated is not None:
+                            span = rotated
+                            servicer_context.set_active_span(span)
                     yield response
+                    if responses is not None:
+                        responses.wait()
             except:
+                if not completion.end():
+                    # The span was finished when the RPC was cancelled.
+                    guarded_span.release()
+                    raise
                 e = sys.exc_info()[0]
                 span.set_tag('error', True)
                 span.log_kv({'event': 'error', 'error.object': e})
@@ -188,6 +315,9 @@ class OpenTracingServerInterceptor(grpcext.UnaryServerInterceptor,
                 if self._span_decorator is not None:
                     self._span_decorator(span, rpc_info)
                 raise
+            if not completion.end():
+                guarded_span.release()
+                return
             _check_error_code(span, servicer_context, rpc_info)
             if self._span_decorator is not None:
                 self._span_decorator(span, rpc_info)
@@ -197,20 +327,24 @@ class OpenTracingServerInterceptor(grpcext.UnaryServerInterceptor,
         if server_info.is_server_stream:
             return self._intercept_server_stream(
                 request_or_iterator, servicer_context, server_info, handler)
-        with self._start_span(servicer_context,
-                              server_info.full_method) as span:
-            rpc_info = RpcInfo(
-                full_method=server_info.full_method,
-                metadata=servicer_context.invocation_metadata(),
-                timeout=servicer_context.time_remaining())
-            if self._log_payloads:
-                request_or_iterator = log_or_wrap_request_or_iterator(
-                    span, server_info.is_client_stream, request_or_iterator)
+        with self._start_guarded_span(servicer_context,
+                                      server_info.full_method) as guarded_span:
+            span = guarded_span.span
+            rpc_info = RpcInfo(server_info.full_method,
+                               servicer_context.invocation_metadata(),
+                               servicer_context.time_remaining())
+            requests = None
+            if self._messages is not None:
+                request_or_iterator, requests = self._messages.requests(
+                    span, server_info.full_method,
+                    server_info.is_client_stream, request_or_iterator)
             servicer_context = _OpenTracingServicerContext(
                 servicer_context, span)
             try:
                 response = handler(request_or_iterator, servicer_context)
             except:
+                if requests is not None:
+                    requests.end()
                 e = sys.exc_info()[0]
                 span.set_tag('error', True)
                 span.log_kv({'event': 'error', 'error.object': e})
@@ -218,8 +352,12 @@ class OpenTracingServerInterceptor(grpcext.UnaryServerInterceptor,
                 if self._span_decorator is not None:
                     self._span_decorator(span, rpc_info)
                 raise
-            if self._log_payloads:
-                span.log_kv({'response': response})
+            # The handler may return before consuming all requests.
+            if requests is not None:
+                requests.end()
+            if self._messages is not None:
+                self._messages.unary(span, server_info.full_method,
+                                     'response', response)
             _check_error_code(span, servicer_context, rpc_info)
             rpc_info.response = response
             if self._span_decorator is not None:
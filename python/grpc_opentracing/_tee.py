@@ -0,0 +1,134 @@
+"""A tracer that creates every span in several tracers at once."""
+
+import opentracing
+
+
+class _TeeSpanContext(opentracing.SpanContext):
+
+    def __init__(self, contexts):
+        self.contexts = contexts
+
+    @property
+    def baggage(self):
+        return self.contexts[0].baggage
+
+    def __getattr__(self, name):
+        # Expose the ids, and whatever else a propagation reads, of the
+        # primary tracer's span context.
+        if name == 'contexts':
+            raise AttributeError(name)
+        return getattr(self.contexts[0], name)
+
+
+class _TeeSpan(opentracing.Span):
+
+    def __init__(self, tracer, spans):
+        super(_TeeSpan, self).__init__(
+            tracer, _TeeSpanContext([span.context for span in spans]))
+        self.spans = spans
+
+    def set_operation_name(self, operation_name):
+        for span in self.spans:
+            span.set_operation_name(operation_name)
+        return self
+
+    def set_tag(self, key, value):
+        for span in self.spans:
+            span.set_tag(key, value)
+        return self
+
+    def log_kv(self, key_values, timestamp=None):
+        for span in self.spans:
+            span.log_kv(key_values, timestamp)
+        return self
+
+    def set_baggage_item(self, key, value):
+        for span in self.spans:
+            span.set_baggage_item(key, value)
+        # Baggage may replace the spans' contexts.
+        self._context = _TeeSpanContext([span.context for span in self.spans])
+        return self
+
+    def get_baggage_item(self, key):
+        return self.spans[0].get_baggage_item(key)
+
+    def finish(self, finish_time=None):
+        for span in self.spans:
+            span.finish(finish_time)
+
+
+class TeeTracer(opentracing.Tracer):
+    """Creates every span in each of its tracers.
+
+  Span contexts are only injected and extracted by the first, primary, tracer.
+  A span whose parent is a span of the TeeTracer is a child of the
+  corresponding span in every tracer; a span whose parent was extracted is a
+  child of it in the primary tracer only and a root span in the others.
+  """
+
+    def __init__(self, tracers):
+        scope_manager = getattr(tracers[0], 'scope_manager', None)
+        if scope_manager is None:
+            super(TeeTracer, self).__init__()
+        else:
+            super(TeeTracer, self).__init__(scope_manager)
+        self._tracers = tuple(tracers)
+        self._primary = self._tracers[0]
+        span_context_from_ids = getattr(self._primary, 'span_context_from_ids',
+                                        None)
+        if span_context_from_ids is not None:
+            self.span_context_from_ids = span_context_from_ids
+
+    def start_span(self,
+                   operation_name=None,
+                   child_of=None,
+                   references=None,
+                   tags=None,
+                   start_time=None,
+                   ignore_active_span=False):
+        if child_of is not None:
+            references = [opentracing.child_of(child_of)] + list(references or
+                                                                 ())
+        kwargs = {'ignore_active_span': True} if ignore_active_span else {}
+        spans = []
+        for index, tracer in enumerate(self._tracers):
+            tracer_references = []
+            for reference in references or ():
+                context = reference.referenced_context
+                if isinstance(context, opentracing.Span):
+                    context = context.context
+                if isinstance(context, _TeeSpanContext):
+                    context = context.contexts[index]
+                elif index != 0:
+                    # A span context of the primary tracer.
+                    continue
+                tracer_references.append(
+                    opentracing.Reference(reference.type, context))
+            spans.append(
+                tracer.start_span(
+                    operation_name=operation_name,
+                    references=tracer_references or None,
+                    # A tracer may keep the dict and add the span's tags to it.
+                    tags=tags if index == 0 or tags is None else dict(tags),
+                    start_time=start_time,
+                    **kwargs))
+        return _TeeSpan(self, spans)
+
+    def inject(self, span_context, format, carrier):
+        if isinstance(span_context, _TeeSpanContext):
+            span_context = span_context.contexts[0]
+        return self._primary.inject(span_context, format, carrier)
+
+    def extract(self, format, carrier):
+        return self._primary.extract(format, carrier)
+
+
+def tee(tracer):
+    """Returns tracer, or a TeeTracer if it is a sequence of tracers."""
+    if not isinstance(tracer, (list, tuple)):
+        return tracer
+    if not tracer:
+        raise ValueError('at least one tracer is required')
+    if len(tracer) == 1:
+        return tracer[0]
+    return TeeTracer(tracer)
@@ -2,6 +2,7 @@
 
 import collections
 import grpc_opentracing
+import opentracing
 
 
 class RpcInfo(grpc_opentracing.RpcInfo):
@@ -21,6 +22,49 @@ class RpcInfo(grpc_opentracing.RpcInfo):
         self.error = error
 
 
+class GuardedSpan(object):
+    """Finishes a span on exit unless it has been released."""
+
+    def __init__(self, span):
+        self.span = span
+        self._engaged = True
+
+    def __enter__(self):
+        self.span.__enter__()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        if self._engaged:
+            return self.span.__exit__(*args, **kwargs)
+        else:
+            return False
+
+    def release(self):
+        """Transfers the ownership of the span to the caller, who finishes
+    it."""
+        self._engaged = False
+        return self.span
+
+
+def context_ids(span_context):
+    """Returns the (trace_id, span_id) of a span context, with None for the ids
+  it does not expose."""
+    return (getattr(span_context, 'trace_id', None),
+            getattr(span_context, 'span_id', None))
+
+
+def parent_reference(child_of, references):
+    """Returns the (span_context, reference_type) of the parent of a span
+  started with the given child_of and references, or (None, None)."""
+    if child_of is not None:
+        if isinstance(child_of, opentracing.Span):
+            child_of = child_of.context
+        return child_of, opentracing.ReferenceType.CHILD_OF
+    if references:
+        return references[0].referenced_context, references[0].type
+    return None, None
+
+
 def get_method_type(is_client_stream, is_server_stream):
     if is_client_stream and is_server_stream:
         return 'BIDI_STREAMING'
@@ -37,29 +81,3 @@ def get_deadline_millis(timeout):
         return 'None'
     return str(int(round(timeout * 1000)))
 
-
-class _RequestLoggingIterator(object):
-
-    def __init__(self, request_iterator, span):
-        self._request_iterator = request_iterator
-        self._span = span
-
-    def __iter__(self):
-        return self
-
-    def next(self):
-        request = next(self._request_iterator)
-        self._span.log_kv({'request': request})
-        return request
-
-    def __next__(self):
-        return self.next()
-
-
-def log_or_wrap_request_or_iterator(span, is_client_stream,
-                                    request_or_iterator):
-    if is_client_stream:
-        return _RequestLoggingIterator(request_or_iterator, span)
-    else:
-        span.log_kv({'request': request_or_iterator})
-        return request_or_iterator
@@ -0,0 +1,219 @@
+import collections
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+class SpanTable(
+        collections.namedtuple('SpanTable', (
+            'span_id', 'trace_id', 'parent_id', 'reference_type', 'method',
+            'kind', 'error', 'start_ns', 'finish_ns', 'methods'))):
+    """Recorded spans as NumPy arrays, one row per span.
+
+  Loading and analyzing spans requires the numpy package.
+
+  Attributes:
+    span_id: An int64 array of the span ids.
+    trace_id: An int64 array of the trace ids.
+    parent_id: An int64 array of the ids of the referenced spans, -1 for none.
+    reference_type: An int8 array of the reference types: 0 for none, 1 for
+      opentracing.ReferenceType.CHILD_OF and 2 for FOLLOWS_FROM.
+    method: An int32 array of indices into methods of the operation names,
+      i.e., the full methods of RPC spans.
+    kind: An int8 array of the span kinds: 0 for spans that are not RPC spans,
+      1 for client spans and 2 for server spans.
+    error: A bool array, True for spans tagged as errors.
+    start_ns: An int64 array of the start times in nanoseconds since the epoch.
+    finish_ns: An int64 array of the finish times in nanoseconds since the
+      epoch.
+    methods: A list of the distinct operation names.
+
+  Spans loaded from files have their span and trace ids replaced by dense
+  integers, so tracers whose ids do not fit 64 bits can be analyzed.
+  """
+
+
+class LatencyStats(
+        collections.namedtuple('LatencyStats', (
+            'method', 'kind', 'count', 'error_rate', 'percentiles'))):
+    """The latencies of the spans of one method and kind.
+
+  Attributes:
+    method: The operation name.
+    kind: 'client', 'server' or None for spans that are not RPC spans.
+    count: The number of spans.
+    error_rate: The fraction of the spans tagged as errors.
+    percentiles: A dict from percentile to duration in seconds.
+  """
+
+
+class DeltaStats(
+        collections.namedtuple('DeltaStats', (
+            'method', 'count', 'mean', 'percentiles'))):
+    """The time a method's RPCs spend outside of the server's handler.
+
+  Attributes:
+    method: The full method of the server spans.
+    count: The number of server spans whose parent is a client span.
+    mean: The mean of the client span's duration less the server span's, in
+      seconds, i.e., of the time spent on the network and in queues.
+    percentiles: A dict from percentile to delta in seconds.
+  """
+
+
+class FanOutStats(
+        collections.namedtuple('FanOutStats', (
+            'method', 'count', 'mean', 'max', 'percentiles'))):
+    """The number of outgoing RPCs made while handling a method's RPCs.
+
+  Attributes:
+    method: The full method of the server spans.
+    count: The number of server spans.
+    mean: The mean number of client spans descending from a server span
+      without another RPC span in between.
+    max: The largest number of such client spans.
+    percentiles: A dict from percentile to number of client spans.
+  """
+
+
+class CriticalPath(
+        collections.namedtuple('CriticalPath', (
+            'trace_id', 'method', 'duration', 'segments'))):
+    """The critical path of a span tree.
+
+  Attributes:
+    trace_id: The trace id of the tree.
+    method: The operation name of the root span.
+    duration: The duration of the root span in seconds.
+    segments: A list of (stack, start time, finish time) tuples, in the order
+      they follow one another, of the time the tree's latency depends on. The
+      stack is a tuple of the operation names from the root down to the span
+      that was running its own code during the segment. A server span whose
+      parent is a client span of the same method shares its parent's frame, so
+      an RPC's time on the network counts as its caller's own time.
+  """
+
+
+def load_recording(recorder):
+    """Loads the finished spans of a recording tracer.
+
+  Args:
+    recorder: A grpc_opentracing.recording.SpanRecorder.
+
+  Returns:
+    A SpanTable. Its columns are converted from the recorder's columns without
+    visiting the spans one by one.
+  """
+    from grpc_opentracing.analysis import _analysis
+    return _analysis.table_from_columns(recorder.columns())
+
+
+def load_spans(spans):
+    """Loads reporting.FinishedSpans, e.g., from reporting.read_span_files().
+
+  Args:
+    spans: An iterable of FinishedSpans.
+
+  Returns:
+    A SpanTable.
+  """
+    from grpc_opentracing.analysis import _analysis
+    return _analysis.table_from_spans(spans)
+
+
+def load_span_files(*paths):
+    """Loads the spans written by reporting.file_sink()s.
+
+  Args:
+    *paths: Files written by file_sink()s, or prefixes of file_sink()s.
+
+  Returns:
+    A SpanTable.
+  """
+    from grpc_opentracing.analysis import _analysis
+    return _analysis.table_from_files(paths)
+
+
+def latency_stats(table, percentiles=DEFAULT_PERCENTILES):
+    """Computes the latency percentiles and error rates of every method.
+
+  Args:
+    table: A SpanTable.
+    percentiles: The percentiles to compute, between 0 and 100.
+
+  Returns:
+    A list of LatencyStats, one per method and span kind, sorted by method.
+  """
+    from grpc_opentracing.analysis import _analysis
+    return _analysis.latency_stats(table, percentiles)
+
+
+def client_server_deltas(table, percentiles=DEFAULT_PERCENTILES):
+    """Computes the time between client and server spans of every method.
+
+  Args:
+    table: A SpanTable.
+    percentiles: The percentiles to compute, between 0 and 100.
+
+  Returns:
+    A list of DeltaStats, one per method with both client and server spans,
+    sorted by method.
+  """
+    from grpc_opentracing.analysis import _analysis
+    return _analysis.client_server_deltas(table, percentiles)
+
+
+def fan_out_stats(table, percentiles=DEFAULT_PERCENTILES):
+    """Computes how many RPCs the handlers of every method make.
+
+  Args:
+    table: A SpanTable.
+    percentiles: The percentiles to compute, between 0 and 100.
+
+  Returns:
+    A list of FanOutStats, one per method with server spans, sorted by method.
+  """
+    from grpc_opentracing.analysis import _analysis
+    return _analysis.fan_out_stats(table, percentiles)
+
+
+def critical_paths(table):
+    """Computes the critical path of every tree of spans.
+
+  Trees are formed by the CHILD_OF references the interceptors create, so a
+  client span's tree includes the server span and the RPCs its handler made.
+  The critical path leads from the root's finish back through the child that
+  finished last, and so on, and so tells which downstream RPCs determine the
+  end-to-end latency of a fan-out rather than just which are slow.
+
+  Args:
+    table: A SpanTable.
+
+  Returns:
+    A list of CriticalPaths, one per root span.
+  """
+    from grpc_opentracing.analysis import _critical_path
+    return _critical_path.critical_paths(table)
+
+
+def folded_stacks(table):
+    """Aggregates the critical paths of all span trees by stack.
+
+  Args:
+    table: A SpanTable.
+
+  Returns:
+    A dict from stacks, i.e., tuples of operation names as in CriticalPath, to
+    the total time in seconds spent on critical paths in their last frame's
+    own code. Joined with semicolons, with the time in microseconds, these are
+    the folded stacks read by flame graph tools.
+  """
+    from grpc_opentracing.analysis import _critical_path
+    return _critical_path.folded_stacks(table)
+
+
+###################################  __all__  #################################
+
+__all__ = ('DEFAULT_PERCENTILES', 'CriticalPath', 'DeltaStats', 'FanOutStats',
+           'LatencyStats', 'SpanTable', 'client_server_deltas',
+           'critical_paths', 'fan_out_stats', 'folded_stacks', 'latency_stats',
+           'load_recording', 'load_span_files', 'load_spans',)
@@ -0,0 +1,163 @@
+"""Command line tools for analyzing recorded spans.
+
+  python -m grpc_opentracing.analysis stats [--percentiles 50,90,99] PATH...
+
+prints the latency percentiles, error rates, client-server deltas and fan-out
+of every method in the files written by reporting.file_sink()s,
+
+  python -m grpc_opentracing.analysis critical-path [--top 10] PATH...
+
+prints the critical paths of the slowest traces, and
+
+  python -m grpc_opentracing.analysis folded PATH... | flamegraph.pl
+
+prints the folded stacks of the critical paths of all traces.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+
+from grpc_opentracing.analysis import (client_server_deltas, critical_paths,
+                                       fan_out_stats, folded_stacks,
+                                       latency_stats, load_span_files)
+
+
+def _milliseconds(seconds):
+    return '%.3f' % (seconds * 1e3)
+
+
+def _print_table(title, header, rows):
+    print(title)
+    rows = [header] + rows
+    widths = [
+        max(len(row[column]) for row in rows) for column in range(len(header))
+    ]
+    for row in rows:
+        print('  '.join(
+            value.ljust(width) if column == 0 else value.rjust(width)
+            for column, (value, width) in enumerate(zip(row, widths))))
+    print()
+
+
+def _print_stats(percentiles, latencies, deltas, fan_outs):
+    labels = ['p%g' % percentile for percentile in percentiles]
+    _print_table('Latency (ms)', ['method', 'kind', 'count', 'errors'] + labels,
+                 [[
+                     str(stat.method), stat.kind or '-', str(stat.count),
+                     '%.2f%%' % (stat.error_rate * 100)
+                 ] + [
+                     _milliseconds(stat.percentiles[percentile])
+                     for percentile in percentiles
+                 ] for stat in latencies])
+    _print_table('Client - server (ms)', ['method', 'count', 'mean'] + labels,
+                 [[str(stat.method),
+                   str(stat.count),
+                   _milliseconds(stat.mean)] + [
+                       _milliseconds(stat.percentiles[percentile])
+                       for percentile in percentiles
+                   ] for stat in deltas])
+    _print_table('Fan-out (client spans per server span)',
+                 ['method', 'count', 'mean', 'max'] + labels,
+                 [[
+                     str(stat.method),
+                     str(stat.count),
+                     '%.2f' % stat.mean,
+                     str(stat.max)
+                 ] + ['%g' % stat.percentiles[percentile]
+                      for percentile in percentiles] for stat in fan_outs])
+
+
+def _to_json(stats):
+    result = []
+    for stat in stats:
+        stat = stat._asdict()
+        stat['percentiles'] = dict(
+            ('p%g' % percentile, value)
+            for percentile, value in stat['percentiles'].items())
+        result.append(stat)
+    return result
+
+
+def _stats(args):
+    percentiles = [float(value) for value in args.percentiles.split(',')]
+    table = load_span_files(*args.paths)
+    latencies = latency_stats(table, percentiles)
+    deltas = client_server_deltas(table, percentiles)
+    fan_outs = fan_out_stats(table, percentiles)
+    if args.json:
+        print(json.dumps(
+            {
+                'latency': _to_json(latencies),
+                'client_server_delta': _to_json(deltas),
+                'fan_out': _to_json(fan_outs),
+            },
+            sort_keys=True,
+            indent=2))
+    else:
+        _print_stats(percentiles, latencies, deltas, fan_outs)
+
+
+def _critical_path(args):
+    paths = sorted(
+        critical_paths(load_span_files(*args.paths)),
+        key=lambda path: path.duration,
+        reverse=True)
+    for path in paths[:args.top]:
+        print('%s trace %d: %s ms' % (path.method, path.trace_id,
+                                      _milliseconds(path.duration)))
+        for stack, start, finish in path.segments:
+            print('  %10s  %s' % (_milliseconds(finish - start),
+                                  ';'.join(stack)))
+        print()
+
+
+def _folded(args):
+    folded = folded_stacks(load_span_files(*args.paths))
+    for stack, seconds in sorted(folded.items()):
+        microseconds = int(round(seconds * 1e6))
+        if microseconds:
+            print('%s %d' % (';'.join(stack), microseconds))
+
+
+def _add_paths(parser):
+    parser.add_argument(
+        'paths',
+        nargs='+',
+        metavar='PATH',
+        help='a file written by a file sink, or the prefix of a file sink')
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m grpc_opentracing.analysis')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    stats = subparsers.add_parser(
+        'stats', help='print per-method statistics of recorded spans')
+    _add_paths(stats)
+    stats.add_argument(
+        '--percentiles',
+        default='50,90,99',
+        help='comma-separated percentiles to compute')
+    stats.add_argument(
+        '--json', action='store_true', help='print the statistics as JSON')
+    stats.set_defaults(handler=_stats)
+    critical_path = subparsers.add_parser(
+        'critical-path', help='print the critical paths of the slowest traces')
+    _add_paths(critical_path)
+    critical_path.add_argument(
+        '--top', type=int, default=10, help='the number of traces to print')
+    critical_path.set_defaults(handler=_critical_path)
+    folded = subparsers.add_parser(
+        'folded',
+        help='print the critical paths of all traces as folded stacks, in '
+        'microseconds, for flame graph tools')
+    _add_paths(folded)
+    folded.set_defaults(handler=_folded)
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    run()
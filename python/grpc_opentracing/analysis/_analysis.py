@@ -0,0 +1,242 @@
+"""Column-wise analysis of recorded RPC spans.
+
+Every statistic is computed over whole columns: spans are grouped by sorting
+them once by method and value, percentiles are read from the group offsets,
+and parents are looked up with a binary search over the sorted span ids.
+"""
+
+import array
+import itertools
+
+import numpy as np
+import opentracing
+from opentracing.ext import tags as ot_tags
+from grpc_opentracing.analysis import (DeltaStats, FanOutStats, LatencyStats,
+                                       SpanTable)
+from grpc_opentracing.reporting import read_span_files
+
+KIND_OTHER = 0
+KIND_CLIENT = 1
+KIND_SERVER = 2
+
+_KIND_CODES = {
+    ot_tags.SPAN_KIND_RPC_CLIENT: KIND_CLIENT,
+    ot_tags.SPAN_KIND_RPC_SERVER: KIND_SERVER,
+}
+_KIND_NAMES = {KIND_CLIENT: 'client', KIND_SERVER: 'server'}
+
+# The codes of SpanColumns.reference_type.
+CHILD_OF = 1
+_REFERENCE_CODES = {
+    opentracing.ReferenceType.CHILD_OF: CHILD_OF,
+    opentracing.ReferenceType.FOLLOWS_FROM: 2,
+}
+
+
+def _tag_rows(columns, key, rows):
+    """Returns the rows of the spans with a tag and the tag values."""
+    if key not in columns.strings:
+        return rows[:0], []
+    tag_keys = np.array(columns.tag_keys, dtype=np.int32)
+    positions = np.flatnonzero(tag_keys == columns.strings.index(key))
+    tag_values = columns.tag_values
+    return rows[positions], [tag_values[index] for index in positions.tolist()]
+
+
+def table_from_columns(columns):
+    count = len(columns.span_id)
+    operations, method = np.unique(
+        np.array(columns.operation, dtype=np.int32), return_inverse=True)
+    tag_offsets = np.array(columns.tag_offsets, dtype=np.int64)
+    rows = np.repeat(np.arange(count), np.diff(tag_offsets))
+    kind = np.zeros(count, dtype=np.int8)
+    kind_rows, values = _tag_rows(columns, ot_tags.SPAN_KIND, rows)
+    kind[kind_rows] = [_KIND_CODES.get(value, KIND_OTHER) for value in values]
+    error = np.zeros(count, dtype=bool)
+    error_rows, values = _tag_rows(columns, ot_tags.ERROR, rows)
+    error[error_rows] = [bool(value) for value in values]
+    return SpanTable(
+        span_id=np.array(columns.span_id, dtype=np.int64),
+        trace_id=np.array(columns.trace_id, dtype=np.int64),
+        parent_id=np.array(columns.parent_id, dtype=np.int64),
+        reference_type=np.array(columns.reference_type, dtype=np.int8),
+        method=method.astype(np.int32).reshape(count),
+        kind=kind,
+        error=error,
+        start_ns=np.array(columns.start_ns, dtype=np.int64),
+        finish_ns=np.array(columns.finish_ns, dtype=np.int64),
+        methods=[columns.strings[operation] for operation in operations])
+
+
+def _interner(codes):
+
+    def intern(value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    return intern
+
+
+def table_from_spans(spans):
+    span_ids = _interner({})
+    trace_ids = _interner({})
+    methods = {}
+    method_code = _interner(methods)
+    columns = dict((name, array.array(typecode))
+                   for name, typecode in (('span_id', 'q'), ('trace_id', 'q'),
+                                          ('parent_id', 'q'),
+                                          ('reference_type', 'b'),
+                                          ('method', 'i'), ('kind', 'b'),
+                                          ('error', 'b'), ('start_ns', 'q'),
+                                          ('finish_ns', 'q')))
+    for span in spans:
+        tags = span.tags
+        columns['span_id'].append(span_ids(span.span_id))
+        columns['trace_id'].append(trace_ids(span.trace_id))
+        columns['parent_id'].append(-1 if span.parent_id is None else
+                                    span_ids(span.parent_id))
+        columns['reference_type'].append(
+            _REFERENCE_CODES.get(span.reference_type, 0))
+        columns['method'].append(method_code(span.operation_name))
+        columns['kind'].append(
+            _KIND_CODES.get(tags.get(ot_tags.SPAN_KIND), KIND_OTHER))
+        columns['error'].append(bool(tags.get(ot_tags.ERROR, False)))
+        columns['start_ns'].append(int(span.start_time * 1e9))
+        columns['finish_ns'].append(int(span.finish_time * 1e9))
+    names = [None] * len(methods)
+    for name, code in methods.items():
+        names[code] = name
+    arrays = dict((name, np.array(column, dtype=column.typecode))
+                  for name, column in columns.items())
+    arrays['error'] = arrays['error'].astype(bool)
+    return SpanTable(methods=names, **arrays)
+
+
+def table_from_files(paths):
+    return table_from_spans(
+        itertools.chain.from_iterable(read_span_files(path) for path in paths))
+
+
+def durations(table):
+    """Returns the durations of the spans in seconds."""
+    return (table.finish_ns - table.start_ns) / 1e9
+
+
+def parent_rows(table):
+    """Returns the rows of the spans' CHILD_OF parents, -1 for none."""
+    order = np.argsort(table.span_id, kind='stable')
+    sorted_ids = table.span_id[order]
+    if not len(sorted_ids):
+        return np.zeros(0, dtype=np.int64)
+    positions = np.minimum(
+        np.searchsorted(sorted_ids, table.parent_id), len(sorted_ids) - 1)
+    found = (table.parent_id >= 0) & (sorted_ids[positions] == table.parent_id)
+    found &= table.reference_type == CHILD_OF
+    return np.where(found, order[positions], -1)
+
+
+def _groups(keys, values, percentiles):
+    """Groups values by key.
+
+  Returns:
+    The distinct keys, the order that sorts the values by key and value, the
+    offsets of the groups in that order, their sizes and an array of their
+    percentiles with one row per group.
+  """
+    order = np.lexsort((values, keys))
+    keys = keys[order]
+    values = values[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    counts = np.diff(np.append(starts, len(keys)))
+    # Linear interpolation between the closest ranks, as in numpy.percentile.
+    positions = np.outer(counts - 1, np.asarray(percentiles, float) / 100)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    low = values[starts[:, None] + lower]
+    high = values[starts[:, None] + upper]
+    return (keys[starts], order, starts, counts,
+            low + (high - low) * (positions - lower))
+
+
+def _percentiles(percentiles, row):
+    return dict(zip(percentiles, row.tolist()))
+
+
+def latency_stats(table, percentiles):
+    if not len(table.span_id):
+        return []
+    keys = table.method.astype(np.int64) * 3 + table.kind
+    keys, order, starts, counts, values = _groups(keys, durations(table),
+                                                  percentiles)
+    errors = np.add.reduceat(table.error[order].astype(np.int64), starts)
+    stats = [
+        LatencyStats(table.methods[key // 3], _KIND_NAMES.get(key % 3),
+                     count, error_count / float(count),
+                     _percentiles(percentiles, row))
+        for key, count, error_count, row in zip(keys.tolist(), counts.tolist(),
+                                                errors.tolist(), values)
+    ]
+    return sorted(stats, key=lambda stat: (str(stat.method), stat.kind or ''))
+
+
+def client_server_deltas(table, percentiles):
+    parents = parent_rows(table)
+    servers = np.flatnonzero((table.kind == KIND_SERVER) & (parents >= 0))
+    servers = servers[table.kind[parents[servers]] == KIND_CLIENT]
+    if not len(servers):
+        return []
+    span_durations = durations(table)
+    deltas = span_durations[parents[servers]] - span_durations[servers]
+    keys, order, starts, counts, values = _groups(table.method[servers],
+                                                  deltas, percentiles)
+    sums = np.add.reduceat(deltas[order], starts)
+    stats = [
+        DeltaStats(table.methods[key], count, total / count,
+                   _percentiles(percentiles, row))
+        for key, count, total, row in zip(keys.tolist(), counts.tolist(),
+                                          sums.tolist(), values)
+    ]
+    return sorted(stats, key=lambda stat: str(stat.method))
+
+
+def rpc_ancestors(table, rows, parents):
+    """Returns the rows of the closest RPC span ancestors of rows, -1 for
+  none."""
+    ancestors = parents[rows]
+    # Skip over the spans the handlers start themselves, one level of all the
+    # trees at a time.
+    for _ in range(len(parents)):
+        pending = np.flatnonzero(ancestors >= 0)
+        pending = pending[table.kind[ancestors[pending]] == KIND_OTHER]
+        if not len(pending):
+            break
+        ancestors[pending] = parents[ancestors[pending]]
+    return ancestors
+
+
+def fan_out_stats(table, percentiles):
+    servers = np.flatnonzero(table.kind == KIND_SERVER)
+    if not len(servers):
+        return []
+    parents = parent_rows(table)
+    ancestors = rpc_ancestors(table,
+                              np.flatnonzero(table.kind == KIND_CLIENT),
+                              parents)
+    ancestors = ancestors[ancestors >= 0]
+    ancestors = ancestors[table.kind[ancestors] == KIND_SERVER]
+    fan_outs = np.bincount(
+        ancestors, minlength=len(table.span_id))[servers].astype(np.float64)
+    keys, order, starts, counts, values = _groups(table.method[servers],
+                                                  fan_outs, percentiles)
+    sums = np.add.reduceat(fan_outs[order], starts)
+    maxima = np.maximum.reduceat(fan_outs[order], starts)
+    stats = [
+        FanOutStats(table.methods[key], count, total / count, int(maximum),
+                    _percentiles(percentiles, row))
+        for key, count, total, maximum, row in zip(
+            keys.tolist(), counts.tolist(), sums.tolist(), maxima.tolist(),
+            values)
+    ]
+    return sorted(stats, key=lambda stat: str(stat.method))
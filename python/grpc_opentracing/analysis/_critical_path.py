@@ -0,0 +1,120 @@
+"""Critical paths of span trees.
+
+The critical path of a span is found by walking back from its finish: the
+child that finished last before that point is on the path, up to the point
+the child started, from which the walk continues with the children that
+finished before it. The remaining time is the span's own. Spans that overlap
+the point but finished after it are clipped to it.
+"""
+
+import numpy as np
+from grpc_opentracing.analysis import CriticalPath
+from grpc_opentracing.analysis._analysis import (KIND_CLIENT, KIND_SERVER,
+                                                 parent_rows)
+
+
+def _children(parents, finish_ns):
+    """Returns the children of every row, latest finishing first, as offsets
+  into a list of rows."""
+    rows = np.flatnonzero(parents >= 0)
+    order = np.lexsort((-finish_ns[rows], parents[rows]))
+    children = rows[order]
+    offsets = np.searchsorted(parents[children],
+                              np.arange(len(parents) + 1))
+    return offsets.tolist(), children.tolist()
+
+
+def _walk(root, offsets, children, start_ns, finish_ns):
+    """Returns the critical path below root as (row, start, finish) segments
+  in nanoseconds, in no particular order."""
+    segments = []
+    pending = [(root, start_ns[root], finish_ns[root])]
+    while pending:
+        row, lower, upper = pending.pop()
+        point = upper
+        for child in children[offsets[row]:offsets[row + 1]]:
+            if point <= lower or finish_ns[child] <= lower:
+                break
+            if start_ns[child] >= point:
+                continue
+            child_finish = min(finish_ns[child], point)
+            child_start = max(start_ns[child], lower)
+            if child_finish < point:
+                segments.append((row, child_finish, point))
+            pending.append((child, child_start, child_finish))
+            point = child_start
+        if point > lower:
+            segments.append((row, lower, point))
+    return segments
+
+
+def _frames(table, parents):
+    """Returns the stack of method names of every row.
+
+  A server span whose parent is a client span of the same method shares its
+  parent's frame, so every RPC is one frame.
+  """
+    methods = table.methods
+    method = table.method.tolist()
+    kind = table.kind.tolist()
+    parent_list = parents.tolist()
+    stacks = [None] * len(method)
+    for row in range(len(method)):
+        path = []
+        current = row
+        while current >= 0 and stacks[current] is None:
+            path.append(current)
+            current = parent_list[current]
+        stack = () if current < 0 else stacks[current]
+        for current in reversed(path):
+            parent = parent_list[current]
+            if (parent >= 0 and kind[current] == KIND_SERVER and
+                    kind[parent] == KIND_CLIENT and
+                    method[current] == method[parent]):
+                stacks[current] = stack
+            else:
+                stack = stack + (methods[method[current]],)
+                stacks[current] = stack
+    return stacks
+
+
+def critical_paths(table):
+    parents = parent_rows(table)
+    offsets, children = _children(parents, table.finish_ns)
+    start_ns = table.start_ns.tolist()
+    finish_ns = table.finish_ns.tolist()
+    stacks = _frames(table, parents)
+    paths = []
+    for root in np.flatnonzero(parents < 0).tolist():
+        segments = []
+        for row, start, finish in sorted(
+                _walk(root, offsets, children, start_ns, finish_ns),
+                key=lambda segment: segment[1]):
+            stack = stacks[row]
+            if segments and segments[-1][0] == stack and \
+                    segments[-1][2] == start:
+                segments[-1][2] = finish
+            else:
+                segments.append([stack, start, finish])
+        paths.append(
+            CriticalPath(
+                int(table.trace_id[root]), stacks[root][-1],
+                (finish_ns[root] - start_ns[root]) / 1e9,
+                [(stack, start / 1e9, finish / 1e9)
+                 for stack, start, finish in segments]))
+    return paths
+
+
+def folded_stacks(table):
+    parents = parent_rows(table)
+    offsets, children = _children(parents, table.finish_ns)
+    start_ns = table.start_ns.tolist()
+    finish_ns = table.finish_ns.tolist()
+    stacks = _frames(table, parents)
+    folded = {}
+    for root in np.flatnonzero(parents < 0).tolist():
+        for row, start, finish in _walk(root, offsets, children, start_ns,
+                                        finish_ns):
+            stack = stacks[row]
+            folded[stack] = folded.get(stack, 0) + finish - start
+    return dict((stack, value / 1e9) for stack, value in folded.items())
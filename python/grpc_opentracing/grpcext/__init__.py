@@ -95,6 +95,32 @@ def intercept_channel(channel, *interceptors):
     return _interceptor.intercept_channel(channel, *interceptors)
 
 
+def asyncio_future(future, loop=None):
+    """Creates an asyncio.Future that completes with a grpc.Future.
+
+  No thread is blocked waiting on the RPC: the asyncio future is resolved
+  from the grpc.Future's done callback via loop.call_soon_threadsafe. Done
+  callbacks added by interceptors before this call, such as the one that
+  finishes the RPC's span, have run by the time the asyncio future resolves.
+  The awaiting coroutine resumes in its own contextvars context; no span of
+  the RPC is activated in it. If the loop is closed before the RPC completes,
+  the response is dropped. Cancelling the asyncio future cancels the RPC.
+  Requires Python 3.7+.
+
+  Args:
+    future: A grpc.Future, e.g., as returned by the future() method of a
+      multi-callable of an intercepted channel.
+    loop: The event loop of the asyncio future. Defaults to the current event
+      loop.
+
+  Returns:
+    An asyncio.Future of the RPC's response. If the RPC fails it is set to the
+    grpc.RpcError raised by the grpc.Future.
+  """
+    from grpc_opentracing.grpcext import _asyncio
+    return _asyncio.asyncio_future(future, loop)
+
+
 class UnaryServerInfo(six.with_metaclass(abc.ABCMeta)):
     """Consists of various information about a unary RPC on the service-side.
 
@@ -177,9 +203,53 @@ def intercept_server(server, *interceptors):
     return _interceptor.intercept_server(server, *interceptors)
 
 
+def serve_prefork(address,
+                  configure_server,
+                  interceptors_factory=None,
+                  num_workers=None,
+                  max_workers=10,
+                  options=(),
+                  server_credentials=None,
+                  grace=None):
+    """Serves from several forked worker processes sharing one port.
+
+  Each worker creates its own server, interceptors and thread pool after the
+  fork and binds the address with SO_REUSEPORT, so the kernel balances
+  connections across workers and each has its own GIL. SIGTERM or SIGINT
+  sent to the launcher stops every worker gracefully, and a worker exiting on
+  its own stops the rest. No gRPC channel or server should be created in the
+  launching process before calling this, since gRPC does not survive os.fork()
+  once it has started its threads. Only available on POSIX systems.
+
+  Args:
+    address: The address to bind, e.g., '[::]:50051'. The port must not be 0.
+    configure_server: A callable taking the intercepted server of a worker,
+      e.g., to add servicers to it.
+    interceptors_factory: An optional callable, called once in each worker,
+      returning the UnaryServerInterceptors or StreamServerInterceptors to
+      intercept its server with. Per-worker tracers should be created here.
+    num_workers: The number of worker processes. Defaults to the number of
+      CPUs.
+    max_workers: The size of the thread pool of each worker's server.
+    options: Additional channel arguments for each worker's server.
+    server_credentials: Optional ServerCredentials to bind a secure port with.
+    grace: The grace period in seconds of each server's stop() on shutdown.
+
+  Returns:
+    True if every worker shut down cleanly, False otherwise. Blocks until all
+    workers have exited.
+  """
+    from grpc_opentracing.grpcext import _prefork
+    return _prefork.serve_prefork(address, configure_server,
+                                  interceptors_factory, num_workers,
+                                  max_workers, options, server_credentials,
+                                  grace)
+
+
 ###################################  __all__  #################################
 
 __all__ = ('UnaryClientInterceptor', 'StreamClientInfo',
            'StreamClientInterceptor', 'UnaryServerInfo', 'StreamServerInfo',
            'UnaryServerInterceptor', 'StreamServerInterceptor',
-           'intercept_channel', 'intercept_server',)
+           'intercept_channel', 'intercept_server', 'asyncio_future',
+           'serve_prefork',)
@@ -0,0 +1,40 @@
+"""Bridging of gRPC Python futures into asyncio."""
+
+import asyncio
+
+
+def _transfer(future, asyncio_future):
+    if asyncio_future.done():
+        return
+    if future.cancelled():
+        asyncio_future.cancel()
+        return
+    error = future.exception()
+    if error is not None:
+        asyncio_future.set_exception(error)
+    else:
+        asyncio_future.set_result(future.result())
+
+
+def asyncio_future(future, loop=None):
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    result = loop.create_future()
+
+    def cancel(asyncio_future):
+        if asyncio_future.cancelled():
+            future.cancel()
+
+    def done(future):
+        try:
+            loop.call_soon_threadsafe(_transfer, future, result)
+        except RuntimeError:
+            # The loop was closed before the RPC completed; nothing awaits it.
+            pass
+
+    result.add_done_callback(cancel)
+    # Callbacks on a grpc.Future run in the order they were added, so any
+    # added by interceptors, e.g., to finish the RPC's span, have run by the
+    # time the asyncio future is resolved.
+    future.add_done_callback(done)
+    return result
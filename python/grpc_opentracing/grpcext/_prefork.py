@@ -0,0 +1,120 @@
+"""A launcher for servers made of several forked worker processes."""
+
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent import futures
+
+import grpc
+from grpc_opentracing import grpcext
+
+_SHUTDOWN_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+_POLL_INTERVAL = 1.0
+
+
+def _block_shutdown_signals(block):
+    if hasattr(signal, 'pthread_sigmask'):
+        signal.pthread_sigmask(signal.SIG_BLOCK
+                               if block else signal.SIG_UNBLOCK,
+                               _SHUTDOWN_SIGNALS)
+
+
+def _describe_exit(status):
+    """Describes the status of a worker as returned by os.wait()."""
+    if os.WIFSIGNALED(status):
+        return 'was killed by signal %d' % os.WTERMSIG(status)
+    return 'exited with status %d' % os.WEXITSTATUS(status)
+
+
+def _serve_worker(address, configure_server, interceptors_factory,
+                  max_workers, options, server_credentials, grace):
+    stopped = threading.Event()
+    for signum in _SHUTDOWN_SIGNALS:
+        signal.signal(signum, lambda signum, frame: stopped.set())
+    _block_shutdown_signals(False)
+    # Interceptors, and the tracers behind them, are created after the fork so
+    # that every worker has its own reporter threads and connections.
+    interceptors = () if interceptors_factory is None else \
+        interceptors_factory()
+    server = grpcext.intercept_server(
+        grpc.server(
+            futures.ThreadPoolExecutor(max_workers=max_workers),
+            options=options), *interceptors)
+    configure_server(server)
+    if server_credentials is None:
+        port = server.add_insecure_port(address)
+    else:
+        port = server.add_secure_port(address, server_credentials)
+    if not port:
+        logging.error('worker %d failed to bind %s', os.getpid(), address)
+        return 1
+    server.start()
+    while not stopped.is_set():
+        stopped.wait(_POLL_INTERVAL)
+    server.stop(grace).wait()
+    return 0
+
+
+def _fork_worker(*args):
+    # Shutdown signals stay blocked until the child has replaced the parent's
+    # handlers, which would otherwise signal the child's siblings.
+    _block_shutdown_signals(True)
+    pid = os.fork()
+    if pid:
+        _block_shutdown_signals(False)
+        return pid
+    status = 1
+    try:
+        status = _serve_worker(*args)
+    except Exception:
+        logging.exception('worker %d failed', os.getpid())
+    finally:
+        os._exit(status)
+
+
+def serve_prefork(address, configure_server, interceptors_factory,
+                  num_workers, max_workers, options, server_credentials,
+                  grace):
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+    options = tuple(options) + (('grpc.so_reuseport', 1),)
+    args = (address, configure_server, interceptors_factory, max_workers,
+            options, server_credentials, grace)
+    workers = set()
+    shutting_down = []
+
+    def shut_down(signum=None, frame=None):
+        if not shutting_down:
+            shutting_down.append(True)
+            for pid in workers:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except OSError:
+                    pass
+
+    previous_handlers = dict((signum, signal.signal(signum, shut_down))
+                             for signum in _SHUTDOWN_SIGNALS)
+    clean = True
+    try:
+        for _ in range(num_workers):
+            if shutting_down:
+                break
+            workers.add(_fork_worker(*args))
+        while workers:
+            pid, status = os.wait()
+            if pid not in workers:
+                continue
+            workers.discard(pid)
+            if status or not shutting_down:
+                # A worker that exits on its own takes the others down with
+                # it rather than leaving the server at partial capacity.
+                logging.error('worker %d %s', pid, _describe_exit(status))
+                clean = False
+                shut_down()
+    finally:
+        shut_down()
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+    return clean
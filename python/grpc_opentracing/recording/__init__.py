@@ -0,0 +1,134 @@
+import abc
+import collections
+
+import six
+
+
+class SpanColumns(
+        collections.namedtuple('SpanColumns', (
+            'span_id', 'trace_id', 'parent_id', 'reference_type', 'operation',
+            'start_ns', 'finish_ns', 'tag_offsets', 'tag_keys', 'tag_values',
+            'log_offsets', 'log_ns', 'log_fields', 'strings', 'link_offsets',
+            'link_ids', 'link_types'))):
+    """The finished spans of a recording tracer, one row per span.
+
+  Attributes:
+    span_id: An array.array of the span ids.
+    trace_id: An array.array of the trace ids.
+    parent_id: An array.array of the ids of the referenced spans, -1 for none.
+    reference_type: An array.array of the reference types: 0 for none, 1 for
+      opentracing.ReferenceType.CHILD_OF and 2 for FOLLOWS_FROM.
+    operation: An array.array of indices into strings of the operation names.
+    start_ns: An array.array of the start times in nanoseconds since the epoch.
+    finish_ns: An array.array of the finish times in nanoseconds since the
+      epoch.
+    tag_offsets: An array.array with one more entry than there are spans. The
+      tags of the span in row i are at indices tag_offsets[i] through
+      tag_offsets[i + 1] - 1 of tag_keys and tag_values.
+    tag_keys: An array.array of indices into strings of the tag keys.
+    tag_values: A list of the tag values.
+    log_offsets: An array.array indexing log_ns and log_fields like tag_offsets
+      indexes the tags.
+    log_ns: An array.array of the log timestamps in nanoseconds since the epoch.
+    log_fields: A list of the key-value dicts of the logs.
+    strings: A list of the operation names and tag keys.
+    link_offsets: An array.array indexing link_ids and link_types like
+      tag_offsets indexes the tags.
+    link_ids: An array.array of the ids of the spans referenced in addition
+      to the one in parent_id, e.g., by spans that both follow from a span
+      and are children of another.
+    link_types: An array.array of the types of these references, coded as in
+      reference_type.
+  """
+
+
+class SpanRecorder(six.with_metaclass(abc.ABCMeta)):
+    """Provides access to the spans recorded by a recording tracer."""
+
+    @abc.abstractmethod
+    def get_span(self, span_id):
+        """Looks up a span.
+
+    Args:
+      span_id: The id of the span.
+
+    Returns:
+      A reporting.FinishedSpan, which also has a get_tag(key) method, a
+      finished attribute and a references attribute, a list of the
+      (span_id, opentracing.ReferenceType) of all the spans it references,
+      its parent's first, or None if no span with the id was started or it
+      was dropped without being finished. If the span has not been finished
+      yet, finished is False and finish_time is None.
+    """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def find_spans(self,
+                   operation_name=None,
+                   trace_id=None,
+                   parent_id=None,
+                   tags=None):
+        """Finds finished spans.
+
+    Args:
+      operation_name: If not None, only spans with this operation name match.
+      trace_id: If not None, only spans of this trace match.
+      parent_id: If not None, only spans referencing this span, as their
+        parent or otherwise, match.
+      tags: If not None, a dict of tags that matching spans must all have.
+
+    Returns:
+      A list of the matching spans, as in get_span, in the order they
+      finished in on each thread.
+    """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_relationship(self, parent_id, child_id):
+        """Returns the opentracing.ReferenceType by which one span references
+    another, or None if it does not."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def columns(self):
+        """Returns a SpanColumns snapshot of the finished spans."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def counters(self):
+        """Returns a dict with the number of 'recorded' spans and of 'dropped'
+    spans, which were started after max_spans had been reached."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def clear(self):
+        """Discards the recorded spans."""
+        raise NotImplementedError()
+
+
+def recording_tracer(max_spans=None):
+    """Creates a thread-safe tracer that records spans in memory.
+
+  Finished spans are stored in array-backed columns rather than as objects,
+  so millions of spans can be kept for load tests, benchmarks and in-process
+  trace capture. Span ids are assigned sequentially from 1 and the trace id of
+  a span is the span id of the root of its trace. Span contexts are propagated
+  in the TEXT_MAP, HTTP_HEADERS and BINARY formats. Spans that have been
+  started but not finished can be looked up only while the application
+  references them; spans that are dropped without being finished are neither
+  recorded nor retained.
+
+  Args:
+    max_spans: The maximum number of spans to record, or None for no limit.
+      Spans started after the limit has been reached are not recorded.
+
+  Returns:
+    An opentracing.Tracer that is also a SpanRecorder.
+  """
+    from grpc_opentracing.recording import _tracer
+    return _tracer.RecordingTracer(max_spans)
+
+
+###################################  __all__  #################################
+
+__all__ = ('SpanColumns', 'SpanRecorder', 'recording_tracer',)
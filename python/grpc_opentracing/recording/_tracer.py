@@ -0,0 +1,548 @@
+"""A tracer that records finished spans in array-backed columns."""
+
+import array
+import struct
+import threading
+import time
+import weakref
+
+import opentracing
+try:
+    from opentracing.scope_managers import ThreadLocalScopeManager
+except ImportError:
+    ThreadLocalScopeManager = None
+from grpc_opentracing import _fork
+from grpc_opentracing.recording import SpanColumns, SpanRecorder
+from grpc_opentracing._utilities import parent_reference
+from grpc_opentracing.reporting import FinishedSpan
+
+_NO_ID = -1
+_MAX_ID = (1 << 63) - 1
+_REFERENCE_TYPES = (None, opentracing.ReferenceType.CHILD_OF,
+                    opentracing.ReferenceType.FOLLOWS_FROM)
+_REFERENCE_CODES = dict(
+    (reference_type, code)
+    for code, reference_type in enumerate(_REFERENCE_TYPES))
+
+_TRACE_ID_HEADER = 'ot-tracer-traceid'
+_SPAN_ID_HEADER = 'ot-tracer-spanid'
+_BAGGAGE_HEADER_PREFIX = 'ot-baggage-'
+
+# The BINARY format: the trace and span ids followed by the number of baggage
+# items and their UTF-8 keys and values, each preceded by its length.
+_BINARY_IDS = struct.Struct('<qqH')
+_BINARY_LENGTH = struct.Struct('<H')
+
+def _to_ns(seconds):
+    return int(seconds * 1e9)
+
+
+def _links(child_of, references):
+    """Returns the (span_id, reference_type) of the references of a span
+  beyond the one to its parent."""
+    if child_of is None:
+        references = references[1:] if references else ()
+    return [(reference.referenced_context.span_id, reference.type)
+            for reference in references or ()
+            if isinstance(reference.referenced_context, _SpanContext)]
+
+
+class _SpanContext(opentracing.SpanContext):
+
+    def __init__(self, trace_id, span_id, baggage=None):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self._baggage = {} if baggage is None else baggage
+
+    @property
+    def baggage(self):
+        return self._baggage
+
+
+class _Span(opentracing.Span, FinishedSpan):
+
+    def __init__(self, tracer, context, parent_id, reference_type,
+                 operation_name, start_time, tags, recorded, links):
+        super(_Span, self).__init__(tracer, context)
+        self.trace_id = context.trace_id
+        self.span_id = context.span_id
+        self.parent_id = parent_id
+        self.reference_type = reference_type
+        self.links = links
+        self.operation_name = operation_name
+        self.start_time = start_time
+        self.finish_time = None
+        self.tags = {} if tags is None else dict(tags)
+        self.logs = []
+        self.span = None
+        self._recorded = recorded
+
+    @property
+    def finished(self):
+        return self.finish_time is not None
+
+    @property
+    def references(self):
+        if self.parent_id is None:
+            return list(self.links)
+        return [(self.parent_id, self.reference_type)] + self.links
+
+    def set_operation_name(self, operation_name):
+        self.operation_name = operation_name
+        return self
+
+    def set_tag(self, key, value):
+        self.tags[key] = value
+        return self
+
+    def get_tag(self, key):
+        return self.tags.get(key, None)
+
+    def log_kv(self, key_values, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self.logs.append((timestamp, key_values))
+        return self
+
+    def set_baggage_item(self, key, value):
+        baggage = dict(self.context.baggage)
+        baggage[key] = value
+        self._context = _SpanContext(self.trace_id, self.span_id, baggage)
+        return self
+
+    def get_baggage_item(self, key):
+        return self.context.baggage.get(key, None)
+
+    def finish(self, finish_time=None):
+        if self.finish_time is not None:
+            return
+        self.finish_time = time.time() if finish_time is None else finish_time
+        self._tracer._record(self)
+
+
+class _Strings(object):
+    """Interns operation names and tag keys."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = []
+        self._indices = {}
+
+    def index(self, value):
+        index = self._indices.get(value)
+        if index is None:
+            with self.lock:
+                index = self._indices.get(value)
+                if index is None:
+                    index = len(self.values)
+                    self.values.append(value)
+                    self._indices[value] = index
+        return index
+
+
+class _Columns(object):
+    """The columns of the spans finished on one thread.
+
+  Only its thread appends to it, but a lock is still taken so that readers on
+  other threads see whole rows.
+  """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.span_id = array.array('q')
+        self.trace_id = array.array('q')
+        self.parent_id = array.array('q')
+        self.reference_type = array.array('b')
+        self.operation = array.array('i')
+        self.start_ns = array.array('q')
+        self.finish_ns = array.array('q')
+        self.tag_offsets = array.array('q', [0])
+        self.tag_keys = array.array('i')
+        self.tag_values = []
+        self.log_offsets = array.array('q', [0])
+        self.log_ns = array.array('q')
+        self.log_fields = []
+        self.link_offsets = array.array('q', [0])
+        self.link_ids = array.array('q')
+        self.link_types = array.array('b')
+
+    def append(self, span, strings):
+        operation = strings.index(span.operation_name)
+        tag_keys = [strings.index(key) for key in span.tags]
+        with self.lock:
+            self.span_id.append(span.span_id)
+            self.trace_id.append(span.trace_id)
+            self.parent_id.append(_NO_ID
+                                  if span.parent_id is None else span.parent_id)
+            self.reference_type.append(_REFERENCE_CODES[span.reference_type])
+            self.operation.append(operation)
+            self.start_ns.append(_to_ns(span.start_time))
+            self.finish_ns.append(_to_ns(span.finish_time))
+            self.tag_keys.extend(tag_keys)
+            self.tag_values.extend(span.tags.values())
+            self.tag_offsets.append(len(self.tag_keys))
+            for timestamp, key_values in span.logs:
+                self.log_ns.append(_to_ns(timestamp))
+                self.log_fields.append(key_values)
+            self.log_offsets.append(len(self.log_ns))
+            for span_id, reference_type in span.links:
+                self.link_ids.append(span_id)
+                self.link_types.append(_REFERENCE_CODES[reference_type])
+            self.link_offsets.append(len(self.link_ids))
+
+    def __len__(self):
+        return len(self.span_id)
+
+
+def _concatenate(shards, strings):
+    columns = _Columns()
+    for shard in shards:
+        with shard.lock:
+            tag_base = len(columns.tag_keys)
+            log_base = len(columns.log_ns)
+            link_base = len(columns.link_ids)
+            columns.span_id.extend(shard.span_id)
+            columns.trace_id.extend(shard.trace_id)
+            columns.parent_id.extend(shard.parent_id)
+            columns.reference_type.extend(shard.reference_type)
+            columns.operation.extend(shard.operation)
+            columns.start_ns.extend(shard.start_ns)
+            columns.finish_ns.extend(shard.finish_ns)
+            columns.tag_offsets.extend(
+                offset + tag_base for offset in shard.tag_offsets[1:])
+            columns.tag_keys.extend(shard.tag_keys)
+            columns.tag_values.extend(shard.tag_values)
+            columns.log_offsets.extend(
+                offset + log_base for offset in shard.log_offsets[1:])
+            columns.log_ns.extend(shard.log_ns)
+            columns.log_fields.extend(shard.log_fields)
+            columns.link_offsets.extend(
+                offset + link_base for offset in shard.link_offsets[1:])
+            columns.link_ids.extend(shard.link_ids)
+            columns.link_types.extend(shard.link_types)
+    with strings.lock:
+        string_values = list(strings.values)
+    return SpanColumns(columns.span_id, columns.trace_id, columns.parent_id,
+                       columns.reference_type, columns.operation,
+                       columns.start_ns, columns.finish_ns,
+                       columns.tag_offsets, columns.tag_keys,
+                       columns.tag_values, columns.log_offsets,
+                       columns.log_ns, columns.log_fields, string_values,
+                       columns.link_offsets, columns.link_ids,
+                       columns.link_types)
+
+
+class _RecordedSpan(FinishedSpan):
+    """A view of a row of SpanColumns."""
+
+    finished = True
+    span = None
+
+    def __init__(self, columns, row):
+        self._columns = columns
+        self._row = row
+
+    @property
+    def span_id(self):
+        return self._columns.span_id[self._row]
+
+    @property
+    def trace_id(self):
+        return self._columns.trace_id[self._row]
+
+    @property
+    def parent_id(self):
+        parent_id = self._columns.parent_id[self._row]
+        return None if parent_id == _NO_ID else parent_id
+
+    @property
+    def reference_type(self):
+        return _REFERENCE_TYPES[self._columns.reference_type[self._row]]
+
+    @property
+    def operation_name(self):
+        return self._columns.strings[self._columns.operation[self._row]]
+
+    @property
+    def start_time(self):
+        return self._columns.start_ns[self._row] / 1e9
+
+    @property
+    def finish_time(self):
+        return self._columns.finish_ns[self._row] / 1e9
+
+    @property
+    def tags(self):
+        columns = self._columns
+        begin = columns.tag_offsets[self._row]
+        end = columns.tag_offsets[self._row + 1]
+        return dict((columns.strings[columns.tag_keys[index]],
+                     columns.tag_values[index]) for index in range(begin, end))
+
+    @property
+    def logs(self):
+        columns = self._columns
+        begin = columns.log_offsets[self._row]
+        end = columns.log_offsets[self._row + 1]
+        return [(columns.log_ns[index] / 1e9, columns.log_fields[index])
+                for index in range(begin, end)]
+
+    @property
+    def references(self):
+        columns = self._columns
+        begin = columns.link_offsets[self._row]
+        end = columns.link_offsets[self._row + 1]
+        references = [(columns.link_ids[index],
+                       _REFERENCE_TYPES[columns.link_types[index]])
+                      for index in range(begin, end)]
+        parent_id = self.parent_id
+        if parent_id is not None:
+            references.insert(0, (parent_id, self.reference_type))
+        return references
+
+    def get_tag(self, key):
+        return self.tags.get(key, None)
+
+
+class RecordingTracer(opentracing.Tracer, SpanRecorder):
+
+    def __init__(self, max_spans):
+        if ThreadLocalScopeManager is None:
+            super(RecordingTracer, self).__init__()
+        else:
+            super(RecordingTracer, self).__init__(ThreadLocalScopeManager())
+        self._max_spans = max_spans
+        self._lock = threading.Lock()
+        # Zero is reserved for invalid ids by the W3C and B3 formats.
+        self._next_id = 1
+        self._admitted = 0
+        self._dropped = 0
+        self._strings = _Strings()
+        self._local = threading.local()
+        self._shards = []
+        # Held weakly, so that spans that are never finished are not kept.
+        self._open_spans = weakref.WeakValueDictionary()
+        self._snapshot = None
+        _fork.register(self)
+
+    def _after_fork_in_child(self):
+        # Keep the recorded spans, but not locks some other thread held.
+        self._lock = threading.Lock()
+        self._strings.lock = threading.Lock()
+        for shard in self._shards:
+            shard.lock = threading.Lock()
+
+    def start_span(self,
+                   operation_name=None,
+                   child_of=None,
+                   references=None,
+                   tags=None,
+                   start_time=None,
+                   ignore_active_span=False):
+        parent_context, reference_type = parent_reference(child_of, references)
+        links = _links(child_of, references)
+        if parent_context is None and not ignore_active_span:
+            active_span = getattr(self, 'active_span', None)
+            if active_span is not None:
+                parent_context = active_span.context
+                reference_type = opentracing.ReferenceType.CHILD_OF
+        if not isinstance(parent_context, _SpanContext):
+            parent_context = None
+        with self._lock:
+            span_id = self._next_id
+            self._next_id += 1
+            recorded = self._max_spans is None or \
+                self._admitted < self._max_spans
+            if recorded:
+                self._admitted += 1
+            else:
+                self._dropped += 1
+        if parent_context is None:
+            context = _SpanContext(span_id, span_id)
+            parent_id = None
+            reference_type = None
+        else:
+            context = _SpanContext(parent_context.trace_id, span_id,
+                                   dict(parent_context.baggage))
+            parent_id = parent_context.span_id
+        span = _Span(self, context, parent_id, reference_type, operation_name,
+                     time.time() if start_time is None else start_time, tags,
+                     recorded, links)
+        if recorded:
+            self._open_spans[span_id] = span
+        return span
+
+    def _record(self, span):
+        if not span._recorded:
+            return
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Columns()
+            with self._lock:
+                self._shards.append(shard)
+        shard.append(span, self._strings)
+        self._open_spans.pop(span.span_id, None)
+
+    def _inject_binary(self, span_context, carrier):
+        if not isinstance(carrier, bytearray):
+            raise opentracing.InvalidCarrierException()
+        baggage = span_context.baggage
+        carrier += _BINARY_IDS.pack(span_context.trace_id, span_context.span_id,
+                                    len(baggage))
+        for key, value in baggage.items():
+            for string in (key, value):
+                encoded = string.encode('utf-8')
+                carrier += _BINARY_LENGTH.pack(len(encoded))
+                carrier += encoded
+
+    def _extract_binary(self, carrier):
+        if not isinstance(carrier, (bytes, bytearray)):
+            raise opentracing.InvalidCarrierException()
+        if not carrier:
+            return None
+        try:
+            trace_id, span_id, count = _BINARY_IDS.unpack_from(carrier)
+            offset = _BINARY_IDS.size
+            strings = []
+            for _ in range(2 * count):
+                length, = _BINARY_LENGTH.unpack_from(carrier, offset)
+                offset += _BINARY_LENGTH.size
+                if offset + length > len(carrier):
+                    raise ValueError()
+                strings.append(
+                    bytes(carrier[offset:offset + length]).decode('utf-8'))
+                offset += length
+        except (struct.error, ValueError):
+            raise opentracing.SpanContextCorruptedException()
+        if trace_id < 0 or span_id < 0:
+            raise opentracing.SpanContextCorruptedException()
+        return _SpanContext(trace_id, span_id,
+                            dict(zip(strings[::2], strings[1::2])))
+
+    def inject(self, span_context, format, carrier):
+        if format == opentracing.Format.BINARY:
+            return self._inject_binary(span_context, carrier)
+        if format not in (opentracing.Format.TEXT_MAP,
+                          opentracing.Format.HTTP_HEADERS):
+            raise opentracing.UnsupportedFormatException(format)
+        if not isinstance(carrier, dict):
+            raise opentracing.InvalidCarrierException()
+        carrier[_TRACE_ID_HEADER] = '%x' % span_context.trace_id
+        carrier[_SPAN_ID_HEADER] = '%x' % span_context.span_id
+        for key, value in span_context.baggage.items():
+            carrier[_BAGGAGE_HEADER_PREFIX + key] = value
+
+    def extract(self, format, carrier):
+        if format == opentracing.Format.BINARY:
+            return self._extract_binary(carrier)
+        if format not in (opentracing.Format.TEXT_MAP,
+                          opentracing.Format.HTTP_HEADERS):
+            raise opentracing.UnsupportedFormatException(format)
+        if not isinstance(carrier, dict):
+            raise opentracing.InvalidCarrierException()
+        trace_id = span_id = None
+        baggage = {}
+        for key, value in carrier.items():
+            key = key.lower()
+            if key == _TRACE_ID_HEADER:
+                trace_id = value
+            elif key == _SPAN_ID_HEADER:
+                span_id = value
+            elif key.startswith(_BAGGAGE_HEADER_PREFIX):
+                baggage[key[len(_BAGGAGE_HEADER_PREFIX):]] = value
+        if trace_id is None and span_id is None:
+            return None
+        try:
+            trace_id, span_id = int(trace_id, 16), int(span_id, 16)
+        except (TypeError, ValueError):
+            raise opentracing.SpanContextCorruptedException()
+        if not 0 <= trace_id <= _MAX_ID or not 0 <= span_id <= _MAX_ID:
+            raise opentracing.SpanContextCorruptedException()
+        return _SpanContext(trace_id, span_id, baggage)
+
+    def span_context_from_ids(self, trace_id, span_id, sampled, trace_state):
+        if trace_id > _MAX_ID or span_id > _MAX_ID:
+            raise opentracing.SpanContextCorruptedException()
+        return _SpanContext(trace_id, span_id)
+
+    def _snapshot_rows(self):
+        with self._lock:
+            shards = list(self._shards)
+        size = sum(len(shard) for shard in shards)
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[0] != size:
+            columns = _concatenate(shards, self._strings)
+            rows = dict((span_id, row)
+                        for row, span_id in enumerate(columns.span_id))
+            snapshot = (size, columns, rows)
+            self._snapshot = snapshot
+        return snapshot[1], snapshot[2]
+
+    def columns(self):
+        return self._snapshot_rows()[0]
+
+    def get_span(self, span_id):
+        span = self._open_spans.get(span_id)
+        if span is not None:
+            return span
+        columns, rows = self._snapshot_rows()
+        row = rows.get(span_id)
+        return None if row is None else _RecordedSpan(columns, row)
+
+    def find_spans(self,
+                   operation_name=None,
+                   trace_id=None,
+                   parent_id=None,
+                   tags=None):
+        columns = self.columns()
+        operation = None
+        if operation_name is not None:
+            if operation_name not in columns.strings:
+                return []
+            operation = columns.strings.index(operation_name)
+        spans = []
+        for row in range(len(columns.span_id)):
+            if operation is not None and columns.operation[row] != operation:
+                continue
+            if trace_id is not None and columns.trace_id[row] != trace_id:
+                continue
+            if parent_id is not None and columns.parent_id[row] != parent_id:
+                links = columns.link_ids[columns.link_offsets[row]:
+                                         columns.link_offsets[row + 1]]
+                if parent_id not in links:
+                    continue
+            span = _RecordedSpan(columns, row)
+            if tags is not None:
+                span_tags = span.tags
+                if any(key not in span_tags or span_tags[key] != value
+                       for key, value in tags.items()):
+                    continue
+            spans.append(span)
+        return spans
+
+    def get_relationship(self, parent_id, child_id):
+        span = self.get_span(child_id)
+        if span is None:
+            return None
+        for span_id, reference_type in span.references:
+            if span_id == parent_id:
+                return reference_type
+        return None
+
+    def counters(self):
+        with self._lock:
+            dropped = self._dropped
+            shards = list(self._shards)
+        return {
+            'recorded': sum(len(shard) for shard in shards),
+            'dropped': dropped
+        }
+
+    def clear(self):
+        with self._lock:
+            self._shards = []
+            self._local = threading.local()
+            self._open_spans.clear()
+            self._snapshot = None
+            self._admitted = 0
+            self._dropped = 0
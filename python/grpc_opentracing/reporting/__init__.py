@@ -0,0 +1,191 @@
+import abc
+
+import six
+
+
+class FinishedSpan(six.with_metaclass(abc.ABCMeta)):
+    """Describes a span that has been finished.
+
+  Attributes:
+    trace_id: The id of the span's trace, or None if the span's context does
+      not have a trace_id attribute.
+    span_id: The id of the span, or None if the span's context does not have a
+      span_id attribute.
+    parent_id: The span_id of the span referenced by the span, or None.
+    reference_type: The opentracing.ReferenceType of the reference to the
+      parent, or None.
+    operation_name: The span's operation name, e.g., the full RPC method.
+    start_time: The span's start time in seconds since the epoch.
+    finish_time: The span's finish time in seconds since the epoch.
+    tags: A dict of the span's tags.
+    logs: A list of (timestamp, key_values) pairs of the span's logs.
+    span: The span created by the wrapped tracer.
+  """
+
+
+class SpanSink(six.with_metaclass(abc.ABCMeta)):
+    """Receives batches of finished spans, e.g., to export them."""
+
+    @abc.abstractmethod
+    def export(self, spans):
+        """Exports a batch of finished spans.
+
+    Called from a single background thread.
+
+    Args:
+      spans: A list of FinishedSpans.
+    """
+        raise NotImplementedError()
+
+    def close(self):
+        """Releases the resources of the sink. Called once no more spans will be
+    exported."""
+        pass
+
+
+def batching_tracer(tracer,
+                    sink=None,
+                    max_batch_size=512,
+                    max_batch_delay=1.0,
+                    max_queue_size=8192,
+                    buffer_size=64):
+    """Wraps a tracer so that finished spans are reported in batches.
+
+  Spans started by the returned tracer record their tags and logs instead of
+  applying them to the wrapped tracer's spans. When finished they are
+  appended to a buffer local to the finishing thread; full buffers are handed
+  to a background thread through a bounded queue, which merges them into
+  batches of at most max_batch_size spans and passes each batch to the sink,
+  at the latest max_batch_delay seconds after it started collecting it. When
+  the queue is full, buffers are dropped rather than blocking the RPC.
+  Injecting, extracting and baggage are delegated to the wrapped tracer.
+
+  Args:
+    tracer: An object implementing the opentracing.Tracer interface.
+    sink: The SpanSink to hand batches to. By default the recorded tags and
+      logs are applied to the wrapped tracer's spans, which are then finished,
+      i.e., they are reported by the wrapped tracer from the background thread.
+    max_batch_size: The maximum number of spans in a batch.
+    max_batch_delay: The maximum number of seconds a finished span waits
+      before its batch is handed to the sink.
+    max_queue_size: The maximum number of finished spans waiting in the queue.
+    buffer_size: The number of finished spans a thread buffers before handing
+      them to the queue.
+
+  Returns:
+    An opentracing.Tracer that can be passed to the interceptors. In addition,
+    it provides counters(), returning a dict with the number of 'queued',
+    'dropped', 'flushed' and 'failed' spans, flush(timeout=None), which hands
+    all finished spans to the sink and returns whether it did so in time, and
+    close(timeout=None), which flushes, stops the background thread and
+    closes the sink.
+  """
+    from grpc_opentracing.reporting import _batching
+    return _batching.BatchingTracer(tracer, sink, max_batch_size,
+                                    max_batch_delay, max_queue_size,
+                                    buffer_size)
+
+
+def ring_file_sink(path, capacity=4 * 1024 * 1024):
+    """Creates a SpanSink that writes spans into a memory-mapped ring file.
+
+  Each span is encoded into a binary record and copied into the ring with a
+  single write into the mapped memory; the sink never blocks on a reader or a
+  collector. When the ring is full the oldest records are overwritten. A
+  separate process can follow the file with ring_file_reader() or with
+  `python -m grpc_opentracing.reporting tail PATH`, e.g., to forward the spans
+  to a collector.
+
+  A ring file has a single writer, so every process needs its own file; a
+  forked child process writes to <path>-<pid> instead. An existing ring file
+  of the same capacity is appended to.
+
+  Args:
+    path: The path of the ring file, which is created if needed.
+    capacity: The size of the ring in bytes, a multiple of 8. Spans whose
+      record is larger are dropped.
+
+  Returns:
+    A SpanSink to pass to batching_tracer(). In addition, it provides
+    counters(), returning a dict with the number of 'written', 'overwritten'
+    and 'dropped' spans.
+  """
+    from grpc_opentracing.reporting import _ring
+    return _ring.RingFileSink(path, capacity)
+
+
+def ring_file_reader(path, from_start=True):
+    """Opens a ring file written by a ring_file_sink() for reading.
+
+  Args:
+    path: The path of the ring file.
+    from_start: Whether to start with the oldest span in the ring rather than
+      with the next span written.
+
+  Returns:
+    A reader providing read(max_spans=None), returning a list of the
+    FinishedSpans written since the previous call, overruns(), returning the
+    number of times the writer overwrote spans before they were read, and
+    close(). The spans' span attribute is None.
+  """
+    from grpc_opentracing.reporting import _ring
+    return _ring.RingFileReader(path, from_start)
+
+
+def file_sink(prefix,
+              format='json',
+              compress=False,
+              max_bytes=64 * 1024 * 1024,
+              max_files=None,
+              resource=None):
+    """Creates a SpanSink that writes spans to size-rotated files.
+
+  Each batch of spans is encoded and written to the current file with a single
+  write, so full traces of, e.g., benchmark runs and load tests can be kept
+  without a collector and analyzed later with read_span_files(). Files are
+  named <prefix>.<sequence number>.jsonl or <prefix>.<sequence number>.otlp,
+  with .gz appended when compressed; a sink started with the prefix of
+  existing files continues their sequence. A forked child process writes its
+  own files, with the prefix <prefix>-<pid>.
+
+  Args:
+    prefix: The path of the files without the sequence number and extension.
+    format: 'json' for one JSON object per line and span, or 'otlp' for
+      length-delimited OTLP ExportTraceServiceRequest protobuf messages, one
+      per batch, which requires the opentelemetry-proto package.
+    compress: Whether to gzip the files.
+    max_bytes: The number of uncompressed bytes after which the sink starts a
+      new file. A batch is never split across files.
+    max_files: The maximum number of files to keep, or None to keep all. The
+      oldest files are deleted first.
+    resource: An optional dict of the OTLP resource attributes, e.g.,
+      {'service.name': 'frontend'}.
+
+  Returns:
+    A SpanSink to pass to batching_tracer(). In addition, it provides
+    counters(), returning a dict with the number of spans 'written' and of
+    'files' started.
+  """
+    from grpc_opentracing.reporting import _files
+    return _files.FileSink(prefix, format, compress, max_bytes, max_files,
+                           resource)
+
+
+def read_span_files(path):
+    """Reads the spans written by a file_sink().
+
+  Args:
+    path: A file written by a file_sink(), or the prefix of a file_sink(), to
+      read all of its files, oldest first.
+
+  Returns:
+    An iterator over FinishedSpans, whose span attribute is None.
+  """
+    from grpc_opentracing.reporting import _files
+    return _files.read_span_files(path)
+
+
+###################################  __all__  #################################
+
+__all__ = ('FinishedSpan', 'SpanSink', 'batching_tracer', 'file_sink',
+           'read_span_files', 'ring_file_reader', 'ring_file_sink',)
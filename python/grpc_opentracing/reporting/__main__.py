@@ -0,0 +1,66 @@
+"""Command line tools for span reporting.
+
+  python -m grpc_opentracing.reporting tail [--follow] PATH
+
+prints the spans in a ring file as JSON lines.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import sys
+import time
+
+from grpc_opentracing.reporting import ring_file_reader
+from grpc_opentracing.reporting._files import span_to_json
+
+
+def _tail(args):
+    reader = ring_file_reader(args.path, from_start=not args.new)
+    try:
+        while True:
+            for span in reader.read():
+                print(json.dumps(span_to_json(span), sort_keys=True))
+            sys.stdout.flush()
+            if not args.follow:
+                break
+            time.sleep(args.poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if reader.overruns():
+            print(
+                'fell behind the writer %d times' % reader.overruns(),
+                file=sys.stderr)
+        reader.close()
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m grpc_opentracing.reporting')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    tail = subparsers.add_parser(
+        'tail', help='print the spans in a ring file as JSON lines')
+    tail.add_argument('path', help='the ring file')
+    tail.add_argument(
+        '--follow',
+        action='store_true',
+        help='keep printing spans as they are written')
+    tail.add_argument(
+        '--new',
+        action='store_true',
+        help='skip the spans already in the ring')
+    tail.add_argument(
+        '--poll_interval',
+        type=float,
+        default=0.1,
+        help='seconds to wait for new spans when following')
+    tail.set_defaults(handler=_tail)
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    run()
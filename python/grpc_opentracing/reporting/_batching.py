@@ -0,0 +1,292 @@
+"""A tracer wrapper that reports finished spans in batches."""
+
+import logging
+import threading
+import time
+import weakref
+
+from six.moves import queue
+
+import opentracing
+from grpc_opentracing import _fork
+from grpc_opentracing._counters import ShardedCounters
+from grpc_opentracing._utilities import context_ids, parent_reference
+from grpc_opentracing.reporting import FinishedSpan, SpanSink
+
+_STOP = object()
+
+
+class _BatchingSpan(opentracing.Span, FinishedSpan):
+
+    def __init__(self, tracer, span, operation_name, start_time, tags,
+                 parent_context, reference_type):
+        super(_BatchingSpan, self).__init__(tracer, span.context)
+        self.span = span
+        self.trace_id, self.span_id = context_ids(span.context)
+        self.parent_id = None
+        self.reference_type = None
+        if parent_context is not None:
+            self.parent_id = context_ids(parent_context)[1]
+            if self.parent_id is not None:
+                self.reference_type = reference_type
+        self.operation_name = operation_name
+        self.start_time = start_time
+        self.finish_time = None
+        self.tags = {} if tags is None else dict(tags)
+        self.logs = []
+        self._initial_operation_name = operation_name
+
+    @property
+    def context(self):
+        return self.span.context
+
+    def set_operation_name(self, operation_name):
+        self.operation_name = operation_name
+        return self
+
+    def set_tag(self, key, value):
+        self.tags[key] = value
+        return self
+
+    def log_kv(self, key_values, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self.logs.append((timestamp, key_values))
+        return self
+
+    def set_baggage_item(self, key, value):
+        self.span.set_baggage_item(key, value)
+        return self
+
+    def get_baggage_item(self, key):
+        return self.span.get_baggage_item(key)
+
+    def finish(self, finish_time=None):
+        if self.finish_time is not None:
+            return
+        self.finish_time = time.time() if finish_time is None else finish_time
+        self._tracer._report(self)
+
+
+class _FinishingSink(SpanSink):
+    """Applies the recorded tags and logs to the wrapped tracer's spans and
+  finishes them."""
+
+    def export(self, spans):
+        for finished_span in spans:
+            span = finished_span.span
+            if finished_span.operation_name != \
+                    finished_span._initial_operation_name:
+                span.set_operation_name(finished_span.operation_name)
+            for key, value in finished_span.tags.items():
+                span.set_tag(key, value)
+            for timestamp, key_values in finished_span.logs:
+                span.log_kv(key_values, timestamp)
+            span.finish(finished_span.finish_time)
+
+
+class _Buffer(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = []
+
+    def take(self):
+        with self.lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+
+class _BufferOwner(object):
+    __slots__ = ('__weakref__',)
+
+
+class _Flush(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class BatchingTracer(opentracing.Tracer):
+
+    def __init__(self, tracer, sink, max_batch_size, max_batch_delay,
+                 max_queue_size, buffer_size):
+        scope_manager = getattr(tracer, 'scope_manager', None)
+        if scope_manager is None:
+            super(BatchingTracer, self).__init__()
+        else:
+            super(BatchingTracer, self).__init__(scope_manager)
+        self._tracer = tracer
+        self._sink = _FinishingSink() if sink is None else sink
+        self._max_batch_size = max_batch_size
+        self._max_batch_delay = max_batch_delay
+        self._max_queue_size = max_queue_size
+        self._buffer_size = buffer_size
+        self._counters = ShardedCounters(('queued', 'dropped', 'flushed',
+                                          'failed'))
+        self._reset()
+        _fork.register(self)
+
+    def _reset(self):
+        # The queue holds buffers of up to buffer_size spans, so bounding its
+        # length bounds the number of spans waiting in it.
+        self._queue = queue.Queue(
+            max(1, self._max_queue_size // self._buffer_size))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._buffers = {}
+        self._thread = None
+
+    def _after_fork_in_child(self):
+        # Spans finished in the parent are the parent's to report.
+        self._reset()
+
+    def start_span(self,
+                   operation_name=None,
+                   child_of=None,
+                   references=None,
+                   tags=None,
+                   start_time=None,
+                   **kwargs):
+        if start_time is None:
+            start_time = time.time()
+        span = self._tracer.start_span(
+            operation_name=operation_name,
+            child_of=child_of,
+            references=references,
+            tags=tags,
+            start_time=start_time,
+            **kwargs)
+        parent_context, reference_type = parent_reference(child_of,
+                                                          references)
+        if parent_context is None and not kwargs.get('ignore_active_span'):
+            active_span = getattr(self._tracer, 'active_span', None)
+            if active_span is not None:
+                parent_context = active_span.context
+                reference_type = opentracing.ReferenceType.CHILD_OF
+        return _BatchingSpan(self, span, operation_name, start_time, tags,
+                             parent_context, reference_type)
+
+    def inject(self, span_context, format, carrier):
+        return self._tracer.inject(span_context, format, carrier)
+
+    def extract(self, format, carrier):
+        return self._tracer.extract(format, carrier)
+
+    def _retire_buffer(self, owner_ref):
+        with self._lock:
+            buffer = self._buffers.pop(owner_ref, None)
+        if buffer is not None:
+            spans = buffer.take()
+            if spans:
+                self._enqueue(spans)
+
+    def _report(self, span):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            owner = _BufferOwner()
+            buffer = _Buffer()
+            with self._lock:
+                self._buffers[weakref.ref(owner, self._retire_buffer)] = buffer
+            self._local.owner = owner
+            self._local.buffer = buffer
+            if self._thread is None:
+                self._start()
+        with buffer.lock:
+            buffer.spans.append(span)
+            if len(buffer.spans) < self._buffer_size:
+                return
+            spans, buffer.spans = buffer.spans, []
+        self._enqueue(spans)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='grpc_opentracing-batching-tracer')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _enqueue(self, spans):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self._counters.increment('dropped', len(spans))
+            return
+        self._counters.increment('queued', len(spans))
+
+    def _sweep(self, batch):
+        with self._lock:
+            buffers = list(self._buffers.values())
+        for buffer in buffers:
+            spans = buffer.take()
+            if spans:
+                self._counters.increment('queued', len(spans))
+                batch.extend(spans)
+
+    def _export(self, batch):
+        try:
+            self._sink.export(batch)
+        except Exception:
+            logging.exception('exporting spans failed')
+            self._counters.increment('failed', len(batch))
+        else:
+            self._counters.increment('flushed', len(batch))
+
+    def _export_all(self, batch):
+        for start in range(0, len(batch), self._max_batch_size):
+            self._export(batch[start:start + self._max_batch_size])
+        del batch[:]
+
+    def _run(self):
+        batch = []
+        deadline = time.time() + self._max_batch_delay
+        while True:
+            try:
+                item = self._queue.get(
+                    timeout=max(0, deadline - time.time()))
+            except queue.Empty:
+                item = None
+            if item is _STOP or isinstance(item, _Flush):
+                self._sweep(batch)
+                self._export_all(batch)
+                if item is _STOP:
+                    return
+                item.done.set()
+                continue
+            if item:
+                batch.extend(item)
+                while len(batch) >= self._max_batch_size:
+                    self._export(batch[:self._max_batch_size])
+                    del batch[:self._max_batch_size]
+            if time.time() >= deadline:
+                # Spans idling in the buffers of threads that finish few spans
+                # are only picked up here.
+                self._sweep(batch)
+                self._export_all(batch)
+                deadline = time.time() + self._max_batch_delay
+
+    def counters(self):
+        return self._counters.snapshot()
+
+    def flush(self, timeout=None):
+        if self._thread is None:
+            self._start()
+        flush = _Flush()
+        try:
+            self._queue.put(flush, timeout=timeout)
+        except queue.Full:
+            return False
+        return flush.done.wait(timeout)
+
+    def close(self, timeout=None):
+        flushed = self.flush(timeout)
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        self._sink.close()
+        return flushed
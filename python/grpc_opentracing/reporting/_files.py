@@ -0,0 +1,369 @@
+"""A span sink that writes finished spans to size-rotated files, and readers of
+those files.
+
+Files are named <prefix>.<sequence number><extension>, where the extension is
+.jsonl for JSON lines and .otlp for length-delimited OTLP protobuf messages,
+with .gz appended when they are compressed. A JSON lines file has one JSON
+object per span. An OTLP file holds one ExportTraceServiceRequest per batch,
+each preceded by its length as a varint.
+"""
+
+import binascii
+import glob
+import gzip
+import json
+import os
+import re
+
+import opentracing
+import six
+from grpc_opentracing import _fork
+from grpc_opentracing._counters import ShardedCounters
+from grpc_opentracing.reporting import FinishedSpan, SpanSink
+
+_EXTENSIONS = {'json': '.jsonl', 'otlp': '.otlp'}
+_COMPRESSED_EXTENSION = '.gz'
+_SEQUENCE_DIGITS = 6
+
+
+def span_to_json(span):
+    """Returns a JSON-serializable dict describing a FinishedSpan."""
+    return {
+        'trace_id': span.trace_id,
+        'span_id': span.span_id,
+        'parent_id': span.parent_id,
+        'reference_type': span.reference_type,
+        'operation_name': span.operation_name,
+        'start_time': span.start_time,
+        'finish_time': span.finish_time,
+        'tags': span.tags,
+        'logs': span.logs,
+    }
+
+
+class _LoadedSpan(FinishedSpan):
+
+    def __init__(self, trace_id, span_id, parent_id, reference_type,
+                 operation_name, start_time, finish_time, tags, logs):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.reference_type = reference_type
+        self.operation_name = operation_name
+        self.start_time = start_time
+        self.finish_time = finish_time
+        self.tags = tags
+        self.logs = logs
+        self.span = None
+
+
+def _span_from_json(value):
+    return _LoadedSpan(value['trace_id'], value['span_id'], value['parent_id'],
+                       value['reference_type'],
+                       value['operation_name'], value['start_time'],
+                       value['finish_time'], value['tags'],
+                       [tuple(log) for log in value['logs']])
+
+
+def _encode_json(spans):
+    return b''.join(
+        json.dumps(
+            span_to_json(span), separators=(',', ':'),
+            default=str).encode('utf-8') + b'\n' for span in spans)
+
+
+def _encode_varint(value):
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def _read_varint(stream):
+    value = shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            if shift:
+                raise ValueError('truncated length prefix')
+            return None
+        byte = six.indexbytes(byte, 0)
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value
+        shift += 7
+
+
+class _OtlpEncoder(object):
+    """Encodes spans as OTLP ExportTraceServiceRequests."""
+
+    def __init__(self, resource):
+        from opentelemetry.proto.collector.trace.v1 import trace_service_pb2
+        from opentelemetry.proto.trace.v1 import trace_pb2
+        self._trace_service_pb2 = trace_service_pb2
+        self._trace_pb2 = trace_pb2
+        self._resource = resource
+
+    def _set_value(self, any_value, value):
+        if isinstance(value, bool):
+            any_value.bool_value = value
+        elif isinstance(value, six.integer_types) and \
+                -(1 << 63) <= value < 1 << 63:
+            any_value.int_value = value
+        elif isinstance(value, float):
+            any_value.double_value = value
+        elif isinstance(value, bytes):
+            any_value.bytes_value = value
+        elif isinstance(value, six.string_types):
+            any_value.string_value = value
+        else:
+            any_value.string_value = str(value)
+
+    def _add_attributes(self, attributes, key_values):
+        for key, value in key_values.items():
+            attribute = attributes.add()
+            attribute.key = key
+            self._set_value(attribute.value, value)
+
+    def __call__(self, spans):
+        trace_pb2 = self._trace_pb2
+        request = self._trace_service_pb2.ExportTraceServiceRequest()
+        resource_spans = request.resource_spans.add()
+        self._add_attributes(resource_spans.resource.attributes,
+                             self._resource)
+        scope_spans = resource_spans.scope_spans.add()
+        scope_spans.scope.name = 'grpc_opentracing'
+        for span in spans:
+            otlp_span = scope_spans.spans.add()
+            otlp_span.trace_id = _id_bytes(span.trace_id, 16)
+            otlp_span.span_id = _id_bytes(span.span_id, 8)
+            if span.parent_id is not None:
+                otlp_span.parent_span_id = _id_bytes(span.parent_id, 8)
+            otlp_span.name = span.operation_name or ''
+            otlp_span.start_time_unix_nano = int(span.start_time * 1e9)
+            otlp_span.end_time_unix_nano = int(span.finish_time * 1e9)
+            tags = dict(span.tags)
+            otlp_span.kind = {
+                'client': trace_pb2.Span.SPAN_KIND_CLIENT,
+                'server': trace_pb2.Span.SPAN_KIND_SERVER,
+            }.get(tags.pop('span.kind', None),
+                  trace_pb2.Span.SPAN_KIND_INTERNAL)
+            if tags.pop('error', False):
+                otlp_span.status.code = trace_pb2.Status.STATUS_CODE_ERROR
+            self._add_attributes(otlp_span.attributes, tags)
+            for timestamp, key_values in span.logs:
+                event = otlp_span.events.add()
+                event.time_unix_nano = int(timestamp * 1e9)
+                key_values = dict(key_values)
+                event.name = str(key_values.pop('event', 'log'))
+                self._add_attributes(event.attributes, key_values)
+            if span.reference_type == opentracing.ReferenceType.FOLLOWS_FROM \
+                    and span.parent_id is not None:
+                link = otlp_span.links.add()
+                link.trace_id = otlp_span.trace_id
+                link.span_id = otlp_span.parent_span_id
+        encoded = request.SerializeToString()
+        return _encode_varint(len(encoded)) + encoded
+
+
+def _id_bytes(span_id, size):
+    if isinstance(span_id, six.string_types):
+        try:
+            span_id = int(span_id, 16)
+        except ValueError:
+            pass
+    if isinstance(span_id, six.integer_types) and \
+            0 <= span_id < 1 << (8 * size):
+        return binascii.unhexlify('%0*x' % (2 * size, span_id))
+    return b'\x00' * size
+
+
+def _id(id_bytes):
+    return int(binascii.hexlify(id_bytes), 16)
+
+
+def _value(any_value):
+    kind = any_value.WhichOneof('value')
+    return None if kind is None else getattr(any_value, kind)
+
+
+def _attributes(attributes):
+    return dict((attribute.key, _value(attribute.value))
+                for attribute in attributes)
+
+
+def _read_otlp(stream):
+    from opentelemetry.proto.collector.trace.v1 import trace_service_pb2
+    from opentelemetry.proto.trace.v1 import trace_pb2
+    kinds = {
+        trace_pb2.Span.SPAN_KIND_CLIENT: 'client',
+        trace_pb2.Span.SPAN_KIND_SERVER: 'server',
+    }
+    while True:
+        length = _read_varint(stream)
+        if length is None:
+            return
+        request = trace_service_pb2.ExportTraceServiceRequest()
+        request.ParseFromString(stream.read(length))
+        for resource_spans in request.resource_spans:
+            for scope_spans in resource_spans.scope_spans:
+                for otlp_span in scope_spans.spans:
+                    tags = _attributes(otlp_span.attributes)
+                    if otlp_span.kind in kinds:
+                        tags['span.kind'] = kinds[otlp_span.kind]
+                    if otlp_span.status.code == \
+                            trace_pb2.Status.STATUS_CODE_ERROR:
+                        tags['error'] = True
+                    logs = []
+                    for event in otlp_span.events:
+                        key_values = _attributes(event.attributes)
+                        key_values['event'] = event.name
+                        logs.append((event.time_unix_nano / 1e9, key_values))
+                    parent_id = reference_type = None
+                    if otlp_span.parent_span_id:
+                        parent_id = _id(otlp_span.parent_span_id)
+                        reference_type = opentracing.ReferenceType.CHILD_OF
+                        if otlp_span.links:
+                            reference_type = \
+                                opentracing.ReferenceType.FOLLOWS_FROM
+                    yield _LoadedSpan(
+                        _id(otlp_span.trace_id), _id(otlp_span.span_id),
+                        parent_id,
+                        reference_type, otlp_span.name,
+                        otlp_span.start_time_unix_nano / 1e9,
+                        otlp_span.end_time_unix_nano / 1e9, tags, logs)
+
+
+def _open(path, mode):
+    if path.endswith(_COMPRESSED_EXTENSION):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _close_inherited(stream):
+    """Closes the file descriptor of a file opened by _open in the parent
+  process, dropping any buffered or compressed data instead of writing it into
+  the parent's file."""
+    if isinstance(stream, gzip.GzipFile):
+        # Without its fileobj, closing the GzipFile writes no trailer.
+        buffered = stream.myfileobj
+        stream.fileobj = stream.myfileobj = None
+        stream = buffered
+    # Once the raw file is closed, the buffered writer closes without
+    # flushing.
+    stream.raw.close()
+
+
+def read_span_files(path):
+    paths = [path] if os.path.isfile(path) else span_files(path)
+    for path in paths:
+        for span in _read_span_file(path):
+            yield span
+
+
+def _read_span_file(path):
+    with _open(path, 'rb') as stream:
+        name = path[:-len(_COMPRESSED_EXTENSION)] \
+            if path.endswith(_COMPRESSED_EXTENSION) else path
+        if name.endswith(_EXTENSIONS['otlp']):
+            for span in _read_otlp(stream):
+                yield span
+        else:
+            for line in stream:
+                if line.strip():
+                    yield _span_from_json(json.loads(line.decode('utf-8')))
+
+
+def _numbered_span_files(prefix):
+    pattern = re.compile(
+        re.escape(os.path.basename(prefix)) + r'\.(\d{%d,})(%s)(%s)?$' %
+        (_SEQUENCE_DIGITS, '|'.join(
+            re.escape(extension) for extension in _EXTENSIONS.values()),
+         re.escape(_COMPRESSED_EXTENSION)))
+    files = []
+    for path in glob.glob(glob.escape(prefix) + '.*'
+                          if hasattr(glob, 'escape') else prefix + '.*'):
+        match = pattern.match(os.path.basename(path))
+        if match:
+            files.append((int(match.group(1)), path))
+    return sorted(files)
+
+
+def span_files(prefix):
+    """Returns the paths of the files written by a FileSink with the given
+  prefix, oldest first."""
+    return [path for _, path in _numbered_span_files(prefix)]
+
+
+class FileSink(SpanSink):
+
+    def __init__(self, prefix, format, compress, max_bytes, max_files,
+                 resource):
+        if format not in _EXTENSIONS:
+            raise ValueError('format must be one of %s' %
+                             ', '.join(sorted(_EXTENSIONS)))
+        self._extension = _EXTENSIONS[format] + \
+            (_COMPRESSED_EXTENSION if compress else '')
+        self._encode = _encode_json if format == 'json' else \
+            _OtlpEncoder(resource or {})
+        self._max_bytes = max_bytes
+        self._max_files = max_files
+        self._start(prefix)
+        self._counters = ShardedCounters(('written', 'files'))
+        _fork.register(self)
+
+    def _start(self, prefix):
+        self._prefix = prefix
+        # A restarted sink starts a new file after the existing ones.
+        existing = _numbered_span_files(prefix)
+        self._sequence = existing[-1][0] + 1 if existing else 0
+        self._file = None
+        self._size = 0
+
+    def _after_fork_in_child(self):
+        # The parent keeps writing its files, so the child writes its own.
+        if self._file is not None:
+            _close_inherited(self._file)
+        self._start('%s-%d' % (self._prefix, os.getpid()))
+
+    def _path(self, sequence):
+        return '%s.%0*d%s' % (self._prefix, _SEQUENCE_DIGITS, sequence,
+                              self._extension)
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = _open(self._path(self._sequence), 'wb')
+        self._sequence += 1
+        self._size = 0
+        self._counters.increment('files')
+        if self._max_files is not None:
+            for path in span_files(self._prefix)[:-self._max_files]:
+                os.remove(path)
+
+    def export(self, spans):
+        if not spans:
+            return
+        encoded = self._encode(spans)
+        if self._file is None or (self._size and
+                                  self._size + len(encoded) > self._max_bytes):
+            self._rotate()
+        # One write per batch, which the file object passes on to the
+        # operating system, or the compressor, right away.
+        self._file.write(encoded)
+        self._file.flush()
+        self._size += len(encoded)
+        self._counters.increment('written', len(spans))
+
+    def counters(self):
+        return self._counters.snapshot()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
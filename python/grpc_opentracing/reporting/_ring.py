@@ -0,0 +1,281 @@
+"""A span sink that writes finished spans into a memory-mapped ring file.
+
+The file starts with a header followed by the ring, a circular data region of
+capacity bytes:
+
+  magic (8s) version (I) reserved (I) capacity (Q) head (Q) tail (Q)
+
+head and tail are byte positions that only ever grow; a position p lies at
+offset p % capacity in the ring. head is the position after the last complete
+record and tail the position of the oldest record that has not been
+overwritten. The writer advances tail before it overwrites a record and head
+after it has written one, so a reader that copies the record at position p
+and then still sees tail <= p has copied it intact.
+
+Every record is 8 byte aligned and starts with
+
+  length (I) kind (H) flags (H)
+
+where length includes the record header and the padding. A padding record
+fills the end of the ring when the next record does not fit there. A span
+record continues with
+
+  trace_id_high (Q) trace_id_low (Q) span_id (Q) parent_id (Q)
+  start_ns (q) finish_ns (q) name_length (I) attributes_length (I)
+
+followed by the UTF-8 operation name and the UTF-8 JSON object
+{"tags": {...}, "logs": [[timestamp, {...}], ...]}.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+import opentracing
+import six
+from grpc_opentracing import _fork
+from grpc_opentracing._counters import ShardedCounters
+from grpc_opentracing.reporting import FinishedSpan, SpanSink
+
+_MAGIC = b'GOTRING1'
+_VERSION = 1
+_FILE_HEADER = struct.Struct('<8sIIQQQ')
+_HEAD_OFFSET = 24
+_TAIL_OFFSET = 32
+_DATA_OFFSET = 64
+_POSITION = struct.Struct('<Q')
+_RECORD_PREFIX = struct.Struct('<IHH')
+_SPAN_RECORD = struct.Struct('<IHHQQQQqqII')
+_ALIGNMENT = 8
+
+_KIND_PADDING = 0
+_KIND_SPAN = 1
+
+_HAS_TRACE_ID = 0x1
+_HAS_SPAN_ID = 0x2
+_HAS_PARENT = 0x4
+_FOLLOWS_FROM = 0x8
+
+_MASK_64 = (1 << 64) - 1
+
+
+def _aligned(length):
+    return (length + _ALIGNMENT - 1) & ~(_ALIGNMENT - 1)
+
+
+def _is_id(value, bits):
+    return isinstance(value, six.integer_types) and \
+        not isinstance(value, bool) and 0 <= value < 1 << bits
+
+
+def _encode_span(span):
+    flags = 0
+    trace_id = span_id = parent_id = 0
+    if _is_id(span.trace_id, 128):
+        flags |= _HAS_TRACE_ID
+        trace_id = span.trace_id
+    if _is_id(span.span_id, 64):
+        flags |= _HAS_SPAN_ID
+        span_id = span.span_id
+    if _is_id(span.parent_id, 64):
+        flags |= _HAS_PARENT
+        parent_id = span.parent_id
+        if span.reference_type == opentracing.ReferenceType.FOLLOWS_FROM:
+            flags |= _FOLLOWS_FROM
+    name = (span.operation_name or '').encode('utf-8')
+    attributes = json.dumps(
+        {
+            'tags': span.tags,
+            'logs': span.logs
+        },
+        separators=(',', ':'),
+        default=str).encode('utf-8')
+    length = _aligned(_SPAN_RECORD.size + len(name) + len(attributes))
+    record = bytearray(length)
+    _SPAN_RECORD.pack_into(record, 0, length, _KIND_SPAN, flags,
+                           trace_id >> 64, trace_id & _MASK_64, span_id,
+                           parent_id, int(span.start_time * 1e9),
+                           int(span.finish_time * 1e9), len(name),
+                           len(attributes))
+    offset = _SPAN_RECORD.size
+    record[offset:offset + len(name)] = name
+    offset += len(name)
+    record[offset:offset + len(attributes)] = attributes
+    return record
+
+
+class _RingSpan(FinishedSpan):
+
+    def __init__(self, record):
+        (_, _, flags, trace_id_high, trace_id_low, span_id, parent_id,
+         start_ns, finish_ns, name_length,
+         attributes_length) = _SPAN_RECORD.unpack_from(record, 0)
+        self.trace_id = (trace_id_high << 64 | trace_id_low) \
+            if flags & _HAS_TRACE_ID else None
+        self.span_id = span_id if flags & _HAS_SPAN_ID else None
+        self.parent_id = None
+        self.reference_type = None
+        if flags & _HAS_PARENT:
+            self.parent_id = parent_id
+            self.reference_type = opentracing.ReferenceType.FOLLOWS_FROM \
+                if flags & _FOLLOWS_FROM else opentracing.ReferenceType.CHILD_OF
+        self.start_time = start_ns / 1e9
+        self.finish_time = finish_ns / 1e9
+        offset = _SPAN_RECORD.size
+        self.operation_name = bytes(
+            record[offset:offset + name_length]).decode('utf-8')
+        offset += name_length
+        attributes = json.loads(
+            bytes(record[offset:offset + attributes_length]).decode('utf-8'))
+        self.tags = attributes['tags']
+        self.logs = [tuple(log) for log in attributes['logs']]
+        self.span = None
+
+
+def _map(path, capacity):
+    """Maps the ring file at path, creating or re-initializing it unless it is
+  a ring file of the given capacity. A capacity of None maps an existing ring
+  file of any capacity."""
+    flags = os.O_RDONLY if capacity is None else os.O_RDWR | os.O_CREAT
+    fd = os.open(path, flags, 0o644)
+    try:
+        existing = os.read(fd, _FILE_HEADER.size)
+        if len(existing) == _FILE_HEADER.size:
+            magic, version, _, existing_capacity, _, _ = _FILE_HEADER.unpack(
+                existing)
+        else:
+            magic = version = existing_capacity = None
+        is_ring = magic == _MAGIC and version == _VERSION
+        if capacity is None:
+            if not is_ring:
+                raise ValueError('%s is not a ring file' % path)
+            capacity = existing_capacity
+            return mmap.mmap(
+                fd, _DATA_OFFSET + capacity,
+                access=mmap.ACCESS_READ), capacity
+        if not is_ring or existing_capacity != capacity:
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, _DATA_OFFSET + capacity)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd,
+                     _FILE_HEADER.pack(_MAGIC, _VERSION, 0, capacity, 0, 0))
+        return mmap.mmap(fd, _DATA_OFFSET + capacity), capacity
+    finally:
+        os.close(fd)
+
+
+class RingFileSink(SpanSink):
+
+    def __init__(self, path, capacity):
+        if capacity < _SPAN_RECORD.size or capacity % _ALIGNMENT:
+            raise ValueError('capacity must be a multiple of %d of at least %d '
+                             'bytes' % (_ALIGNMENT, _SPAN_RECORD.size))
+        self._path = path
+        self._closed = False
+        self._open(path, capacity)
+        self._counters = ShardedCounters(('written', 'overwritten',
+                                          'dropped'))
+        _fork.register(self)
+
+    def _open(self, path, capacity):
+        # Records written before a restart are kept, and readers following
+        # the file keep their positions.
+        self._map, self._capacity = _map(path, capacity)
+        self._head = _POSITION.unpack_from(self._map, _HEAD_OFFSET)[0]
+        self._tail = _POSITION.unpack_from(self._map, _TAIL_OFFSET)[0]
+
+    def _after_fork_in_child(self):
+        if self._closed:
+            return
+        # A ring file has a single writer, so the child writes its own.
+        self._map.close()
+        self._open('%s-%d' % (self._path, os.getpid()), self._capacity)
+
+    def _make_room(self, length):
+        while self._head + length - self._tail > self._capacity:
+            length_at_tail, kind, _ = _RECORD_PREFIX.unpack_from(
+                self._map, _DATA_OFFSET + self._tail % self._capacity)
+            self._tail += length_at_tail
+            if kind == _KIND_SPAN:
+                self._counters.increment('overwritten')
+        _POSITION.pack_into(self._map, _TAIL_OFFSET, self._tail)
+
+    def _write(self, record):
+        length = len(record)
+        offset = self._head % self._capacity
+        padding = self._capacity - offset
+        if padding < length:
+            self._make_room(padding)
+            _RECORD_PREFIX.pack_into(self._map, _DATA_OFFSET + offset,
+                                     padding, _KIND_PADDING, 0)
+            self._head += padding
+            _POSITION.pack_into(self._map, _HEAD_OFFSET, self._head)
+            offset = 0
+        self._make_room(length)
+        start = _DATA_OFFSET + offset
+        self._map[start:start + length] = bytes(record)
+        self._head += length
+        _POSITION.pack_into(self._map, _HEAD_OFFSET, self._head)
+
+    def export(self, spans):
+        for span in spans:
+            record = _encode_span(span)
+            if len(record) > self._capacity:
+                self._counters.increment('dropped')
+                continue
+            self._write(record)
+            self._counters.increment('written')
+
+    def counters(self):
+        return self._counters.snapshot()
+
+    def close(self):
+        self._closed = True
+        self._map.close()
+
+
+class RingFileReader(object):
+
+    def __init__(self, path, from_start):
+        self._map, self._capacity = _map(path, None)
+        self._position = self._read_position(
+            _TAIL_OFFSET if from_start else _HEAD_OFFSET)
+        self._overruns = 0
+
+    def _read_position(self, offset):
+        return _POSITION.unpack_from(self._map, offset)[0]
+
+    def read(self, max_spans=None):
+        spans = []
+        head = self._read_position(_HEAD_OFFSET)
+        while self._position < head and \
+                (max_spans is None or len(spans) < max_spans):
+            tail = self._read_position(_TAIL_OFFSET)
+            if self._position < tail:
+                # The writer has lapped the reader.
+                self._overruns += 1
+                self._position = tail
+                continue
+            offset = _DATA_OFFSET + self._position % self._capacity
+            length, kind, _ = _RECORD_PREFIX.unpack_from(self._map, offset)
+            if length < _RECORD_PREFIX.size or length % _ALIGNMENT or \
+                    self._position % self._capacity + length > self._capacity:
+                if self._read_position(_TAIL_OFFSET) <= self._position:
+                    # The file is corrupt; skip to the newest record.
+                    self._overruns += 1
+                    self._position = head
+                continue
+            record = self._map[offset:offset + length]
+            if self._read_position(_TAIL_OFFSET) > self._position:
+                continue
+            self._position += length
+            if kind == _KIND_SPAN:
+                spans.append(_RingSpan(record))
+        return spans
+
+    def overruns(self):
+        return self._overruns
+
+    def close(self):
+        self._map.close()
@@ -26,6 +26,11 @@ setup(
     author='LightStep',
     license='',
     install_requires=['opentracing>=1.2.2', 'grpcio>=1.1.3', 'six>=1.10'],
+    extras_require={
+        'opentelemetry': ['opentelemetry-api>=1.0'],
+        'otlp': ['opentelemetry-proto>=1.0'],
+        'analysis': ['numpy'],
+    },
     setup_requires=['pytest-runner'],
     tests_require=['pytest', 'future'],
     keywords=['opentracing'],
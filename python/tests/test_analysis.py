@@ -0,0 +1,164 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from _service import Service
+from grpc_opentracing import open_tracing_client_interceptor, \
+    open_tracing_server_interceptor
+from grpc_opentracing.recording import recording_tracer
+from grpc_opentracing.reporting import batching_tracer, file_sink
+
+if numpy is not None:
+    from grpc_opentracing.analysis import client_server_deltas, \
+        critical_paths, fan_out_stats, folded_stacks, latency_stats, \
+        load_recording, load_span_files
+    from grpc_opentracing.analysis.__main__ import run
+
+
+def _record_fan_out(tracer):
+    """Records two RPCs of /A whose handlers call /B twice each, once from a
+  span of their own, and one failed RPC of /B."""
+    for root in range(2):
+        start = root * 10.0
+        client = tracer.start_span(
+            '/A', tags={'span.kind': 'client'}, start_time=start)
+        server = tracer.start_span(
+            '/A',
+            child_of=client,
+            tags={'span.kind': 'server'},
+            start_time=start + 0.5)
+        local = tracer.start_span('local', child_of=server,
+                                  start_time=start + 1)
+        for index, parent in enumerate((server, local)):
+            call_start = start + 1 + index
+            call = tracer.start_span(
+                '/B',
+                child_of=parent,
+                tags={'span.kind': 'client'},
+                start_time=call_start)
+            handler = tracer.start_span(
+                '/B',
+                child_of=call,
+                tags={'span.kind': 'server'},
+                start_time=call_start + 0.25)
+            handler.finish(call_start + 0.75)
+            call.finish(call_start + 1)
+        local.finish(start + 3)
+        server.finish(start + 3.5)
+        client.finish(start + 4)
+    failed = tracer.start_span(
+        '/B', tags={'span.kind': 'client', 'error': True}, start_time=20)
+    failed.finish(21)
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class AnalysisTest(unittest.TestCase):
+    """Test the statistics computed from recorded spans."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _check_stats(self, table):
+        latencies = dict(((stat.method, stat.kind), stat)
+                         for stat in latency_stats(table, (0, 50, 100)))
+        self.assertEqual(
+            sorted(latencies), [('/A', 'client'), ('/A', 'server'),
+                                ('/B', 'client'), ('/B', 'server'),
+                                ('local', None)])
+        self.assertEqual(latencies['/A', 'client'].count, 2)
+        self.assertEqual(latencies['/A', 'client'].percentiles[50], 4)
+        self.assertEqual(latencies['/B', 'client'].count, 5)
+        self.assertEqual(latencies['/B', 'client'].error_rate, 0.2)
+        self.assertEqual(latencies['/B', 'server'].error_rate, 0)
+        self.assertEqual(latencies['/B', 'server'].percentiles[100], 0.5)
+
+        deltas = client_server_deltas(table)
+        self.assertEqual([stat.method for stat in deltas], ['/A', '/B'])
+        self.assertEqual(deltas[0].count, 2)
+        self.assertAlmostEqual(deltas[0].mean, 1)
+        self.assertEqual(deltas[1].count, 4)
+        self.assertAlmostEqual(deltas[1].percentiles[99], 0.5)
+
+        fan_outs = fan_out_stats(table)
+        self.assertEqual([stat.method for stat in fan_outs], ['/A', '/B'])
+        self.assertEqual(fan_outs[0].count, 2)
+        self.assertEqual(fan_outs[0].mean, 2)
+        self.assertEqual(fan_outs[0].max, 2)
+        self.assertEqual(fan_outs[1].count, 4)
+        self.assertEqual(fan_outs[1].max, 0)
+
+    def testRecording(self):
+        _record_fan_out(self._tracer)
+        self._check_stats(load_recording(self._tracer))
+
+    def testSpanFiles(self):
+        prefix = os.path.join(self._directory, 'spans')
+        tracer = batching_tracer(self._tracer, file_sink(prefix))
+        _record_fan_out(tracer)
+        self.assertTrue(tracer.close(5))
+        self._check_stats(load_span_files(prefix))
+
+    def testRpcSpans(self):
+        service = Service([open_tracing_client_interceptor(self._tracer)],
+                          [open_tracing_server_interceptor(self._tracer)])
+        service.unary_unary_multi_callable(b'\x01')
+        table = load_recording(self._tracer)
+        self.assertEqual([(stat.method, stat.kind, stat.count)
+                          for stat in latency_stats(table)],
+                         [('/test/UnaryUnary', 'client', 1),
+                          ('/test/UnaryUnary', 'server', 1)])
+        deltas = client_server_deltas(table)
+        self.assertEqual(len(deltas), 1)
+        self.assertGreaterEqual(deltas[0].mean, 0)
+
+    def testEmpty(self):
+        table = load_recording(self._tracer)
+        self.assertEqual(latency_stats(table), [])
+        self.assertEqual(client_server_deltas(table), [])
+        self.assertEqual(fan_out_stats(table), [])
+
+    def testCriticalPaths(self):
+        _record_fan_out(self._tracer)
+        table = load_recording(self._tracer)
+        paths = critical_paths(table)
+        self.assertEqual([(path.method, path.duration) for path in paths],
+                         [('/A', 4), ('/A', 4), ('/B', 1)])
+        # The first call to /B finished before the span that made the second
+        # one started, so only the second is on the critical path.
+        self.assertEqual(paths[0].segments, [
+            (('/A',), 0, 1),
+            (('/A', 'local'), 1, 2),
+            (('/A', 'local', '/B'), 2, 3),
+            (('/A',), 3, 4),
+        ])
+        self.assertEqual(
+            folded_stacks(table), {
+                ('/A',): 4,
+                ('/A', 'local'): 2,
+                ('/A', 'local', '/B'): 2,
+                ('/B',): 1,
+            })
+
+    def testCommandLine(self):
+        prefix = os.path.join(self._directory, 'spans')
+        tracer = batching_tracer(self._tracer, file_sink(prefix))
+        _record_fan_out(tracer)
+        self.assertTrue(tracer.close(5))
+        run(['stats', prefix])
+        run(['stats', '--json', '--percentiles', '50,99.9', prefix])
+        run(['critical-path', '--top', '1', prefix])
+        run(['folded', prefix])
+
+
+if __name__ == '__main__':
+    unittest.main()
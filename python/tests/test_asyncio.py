@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+
+import grpc
+
+from _service import Service, ErroringHandler
+from grpc_opentracing.recording import recording_tracer
+from grpc_opentracing import grpcext, open_tracing_client_interceptor, open_tracing_server_interceptor
+import opentracing
+
+
+class OpenTracingAsyncioFutureTest(unittest.TestCase):
+    """Test that traced futures can be awaited from asyncio."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        self._service = Service([open_tracing_client_interceptor(self._tracer)],
+                                [open_tracing_server_interceptor(self._tracer)])
+
+    def testUnaryUnaryOpenTracingFuture(self):
+        multi_callable = self._service.unary_unary_multi_callable
+        request = b'\x01'
+        expected_response = self._service.handler.handle_unary_unary(request,
+                                                                     None)
+
+        async def call():
+            response = await grpcext.asyncio_future(
+                multi_callable.future(request))
+            return response, self._tracer.get_span(1).finished
+
+        loop = asyncio.new_event_loop()
+        try:
+            response, finished = loop.run_until_complete(call())
+        finally:
+            loop.close()
+
+        self.assertEqual(response, expected_response)
+        self.assertTrue(finished)
+        self.assertEqual(
+            self._tracer.get_relationship(1, 2),
+            opentracing.ReferenceType.CHILD_OF)
+
+
+class OpenTracingAsyncioFutureErroringTest(unittest.TestCase):
+    """Test that errors of traced futures are raised in asyncio."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        self._service = Service([open_tracing_client_interceptor(self._tracer)],
+                                [open_tracing_server_interceptor(self._tracer)],
+                                ErroringHandler())
+
+    def testUnaryUnaryOpenTracingFuture(self):
+        multi_callable = self._service.unary_unary_multi_callable
+
+        async def call():
+            return await grpcext.asyncio_future(multi_callable.future(b'\x01'))
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertRaises(grpc.RpcError, loop.run_until_complete, call())
+        finally:
+            loop.close()
+
+        span0 = self._tracer.get_span(1)
+        self.assertTrue(span0.finished)
+        self.assertTrue(span0.get_tag('error'))
+
+
+class _Future(object):
+
+    def __init__(self):
+        self.callbacks = []
+
+    def add_done_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def cancel(self):
+        return False
+
+
+class OpenTracingAsyncioClosedLoopTest(unittest.TestCase):
+    """Test that futures completing after their loop closed are dropped."""
+
+    def testClosedLoop(self):
+        future = _Future()
+        loop = asyncio.new_event_loop()
+        grpcext.asyncio_future(future, loop)
+        loop.close()
+        for callback in future.callbacks:
+            callback(future)
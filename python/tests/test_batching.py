@@ -0,0 +1,85 @@
+import json
+import unittest
+
+from _service import Service, Handler
+from grpc_opentracing import follow_message_contexts, inject_message_contexts, open_tracing_client_interceptor, open_tracing_server_interceptor
+from grpc_opentracing.recording import recording_tracer
+import opentracing
+
+
+def _serialize(request):
+    return json.dumps(request).encode('utf-8')
+
+
+def _carrier(request):
+    return json.loads(request.decode('utf-8'))['trace']
+
+
+class _BatchHandler(Handler):
+
+    def __init__(self):
+        super(_BatchHandler, self).__init__()
+        self.items = []
+
+    def handle_stream_unary(self, request_iterator, servicer_context):
+        requests = follow_message_contexts(request_iterator, servicer_context,
+                                           _carrier, 'AddItem')
+        for request in requests:
+            self.items.append(json.loads(request.decode('utf-8'))['item'])
+            if requests.current_span is not None:
+                requests.current_span.set_tag('item', self.items[-1])
+        return b''
+
+
+class MessageContextTest(unittest.TestCase):
+    """Test that batched requests are traced in their own traces."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        self._handler = _BatchHandler()
+        self._service = Service([open_tracing_client_interceptor(self._tracer)],
+                                [open_tracing_server_interceptor(self._tracer)],
+                                self._handler)
+
+    def testStreamUnary(self):
+        upstream_spans = [
+            self._tracer.start_span('upstream') for _ in range(3)
+        ]
+        items = [(span, {
+            'item': 'item%d' % index,
+            'trace': {}
+        }) for index, span in enumerate(upstream_spans)]
+        # A request without a span context is not traced.
+        items.append((None, {'item': 'untraced', 'trace': {}}))
+        multi_callable = self._service.channel.stream_unary(
+            '/test/StreamUnary', request_serializer=_serialize)
+        multi_callable(
+            inject_message_contexts(self._tracer, iter(items),
+                                    lambda request: request['trace']))
+        for span in upstream_spans:
+            span.finish()
+        self.assertEqual(self._handler.items,
+                         ['item0', 'item1', 'item2', 'untraced'])
+
+        server_span = self._tracer.find_spans(tags={'span.kind': 'server'})[0]
+        message_spans = self._tracer.find_spans(operation_name='AddItem')
+        self.assertEqual(len(message_spans), 3)
+        for span in message_spans:
+            index = span.get_tag('message.index')
+            self.assertEqual(span.get_tag('item'), 'item%d' % index)
+            self.assertEqual(
+                self._tracer.get_relationship(upstream_spans[index].span_id,
+                                              span.span_id),
+                opentracing.ReferenceType.FOLLOWS_FROM)
+            self.assertEqual(
+                self._tracer.get_relationship(server_span.span_id,
+                                              span.span_id),
+                opentracing.ReferenceType.CHILD_OF)
+            self.assertEqual(span.references, [
+                (upstream_spans[index].span_id,
+                 opentracing.ReferenceType.FOLLOWS_FROM),
+                (server_span.span_id, opentracing.ReferenceType.CHILD_OF)
+            ])
+        self.assertEqual(len(set(span.trace_id for span in message_spans)), 3)
+        self.assertNotIn(server_span.trace_id,
+                         [span.trace_id for span in message_spans])
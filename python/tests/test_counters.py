@@ -0,0 +1,29 @@
+import threading
+import unittest
+
+from grpc_opentracing._counters import ShardedCounters
+
+
+class ShardedCountersTest(unittest.TestCase):
+    """Test that counts from every thread are summed, including exited ones."""
+
+    def testConcurrentIncrements(self):
+        counters = ShardedCounters(('a', 'b'))
+        barrier = threading.Event()
+
+        def count():
+            barrier.wait()
+            for _ in range(1000):
+                counters.increment('a')
+            counters.increment('b', 2)
+
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        barrier.set()
+        for thread in threads:
+            thread.join()
+        del threads
+        counters.increment('a')
+
+        self.assertEqual(counters.snapshot(), {'a': 8001, 'b': 16})
@@ -0,0 +1,91 @@
+import logging
+import unittest
+
+try:
+    from google.protobuf import descriptor_pb2
+except ImportError:
+    descriptor_pb2 = None
+
+from _service import Service
+from grpc_opentracing import field_extractor, open_tracing_client_interceptor, open_tracing_server_interceptor
+from grpc_opentracing.recording import recording_tracer
+
+_FIELDS = {
+    '/test/UnaryUnary': {
+        'FieldDescriptorProto.name': 'field.name',
+        'google.protobuf.FieldDescriptorProto.label': 'field.label',
+        'FieldDescriptorProto.options.deprecated': 'field.deprecated',
+    },
+    '/test/StreamStream': ['FieldDescriptorProto.number'],
+}
+
+
+@unittest.skipIf(descriptor_pb2 is None, 'protobuf is not installed')
+class FieldExtractorTest(unittest.TestCase):
+    """Test that declared message fields are read into span tags and logs."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        extractor = field_extractor(_FIELDS)
+        self._service = Service([
+            open_tracing_client_interceptor(
+                self._tracer, field_extractor=extractor)
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer, field_extractor=extractor)
+        ])
+
+    def _client_span(self):
+        spans = self._tracer.find_spans(tags={'span.kind': 'client'})
+        self.assertEqual(len(spans), 1)
+        return spans[0]
+
+    def _field(self, number):
+        field = descriptor_pb2.FieldDescriptorProto(
+            name='name', number=number, label=3)
+        field.options.deprecated = True
+        return field
+
+    def testUnaryUnary(self):
+        multi_callable = self._service.channel.unary_unary(
+            '/test/UnaryUnary',
+            request_serializer=descriptor_pb2.FieldDescriptorProto.
+            SerializeToString,
+            response_deserializer=descriptor_pb2.FieldDescriptorProto.
+            FromString)
+        multi_callable(self._field(1))
+        span = self._client_span()
+        self.assertEqual(span.get_tag('field.name'), 'name')
+        self.assertEqual(span.get_tag('field.label'), 'LABEL_REPEATED')
+        self.assertEqual(span.get_tag('field.deprecated'), True)
+        # The server receives bytes, which have no fields.
+        server_span = self._tracer.find_spans(tags={'span.kind': 'server'})[0]
+        self.assertIsNone(server_span.get_tag('field.name'))
+
+    def testStreamStream(self):
+        multi_callable = self._service.channel.stream_stream(
+            '/test/StreamStream',
+            request_serializer=descriptor_pb2.FieldDescriptorProto.
+            SerializeToString,
+            response_deserializer=descriptor_pb2.FieldDescriptorProto.
+            FromString)
+        list(multi_callable(iter([self._field(1), self._field(2)])))
+        self.assertEqual(
+            sorted(key_values['FieldDescriptorProto.number']
+                   for _, key_values in self._client_span().logs), [1, 1, 2, 2])
+
+    def testInvalidPath(self):
+        extractor = field_extractor({
+            '/test/UnaryUnary': [
+                'FieldDescriptorProto.missing', 'FieldDescriptorProto.options',
+                'FieldDescriptorProto.name'
+            ]
+        })
+        logging.disable(logging.ERROR)
+        try:
+            key_values = extractor.extract('/test/UnaryUnary', self._field(1))
+        finally:
+            logging.disable(logging.NOTSET)
+        self.assertEqual(key_values, [('FieldDescriptorProto.name', 'name')])
+        self.assertEqual(
+            extractor.extract('/test/Other', self._field(1)), ())
@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from grpc_opentracing.recording import recording_tracer
+from grpc_opentracing.reporting import batching_tracer, file_sink, \
+    read_span_files, ring_file_sink
+from grpc_opentracing import open_tracing_client_interceptor, open_tracing_server_interceptor, background_span_finisher, message_spans, rebind_tracer, rebind_tracer_after_fork, _fork
+
+
+@unittest.skipUnless(
+    hasattr(os, 'register_at_fork'), 'requires os.register_at_fork')
+class ForkTest(unittest.TestCase):
+    """Test that interceptor state is reset in forked children."""
+
+    def _run_in_child(self, check):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                result = b'ok' if check() else b'failed'
+            except Exception as e:
+                result = repr(e).encode()
+            os.write(write_fd, result)
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd, 'rb') as child_output:
+            result = child_output.read()
+        os.waitpid(pid, 0)
+        return result
+
+    def testRebindTracerAfterFork(self):
+        span_finisher = background_span_finisher()
+        interceptors = (open_tracing_client_interceptor(
+            recording_tracer(), span_finisher=span_finisher),
+                        open_tracing_server_interceptor(
+                            recording_tracer(), span_finisher=span_finisher))
+        child_tracer = recording_tracer()
+        rebind_tracer_after_fork(lambda: child_tracer, *interceptors)
+        self.assertTrue(span_finisher.submit(lambda: None))
+        self.assertTrue(span_finisher.flush(5))
+
+        def check():
+            counters = span_finisher.counters()
+            return (all(interceptor._tracer is child_tracer
+                        for interceptor in interceptors) and
+                    counters['queued'] == 0 and
+                    span_finisher.submit(lambda: None) and
+                    span_finisher.flush(5))
+
+        self.assertEqual(self._run_in_child(check), b'ok')
+        self.assertIsNot(interceptors[0]._tracer, child_tracer)
+        span_finisher.close()
+
+    def testCountersLock(self):
+        spans = message_spans()
+        spans.over_max_spans()
+        # Held by this thread across the fork, as another thread of the
+        # parent could.
+        lock = spans._counters._lock
+        with lock:
+            result = self._run_in_child(
+                lambda: spans.counters() == {'traced': 0, 'over_max_spans': 0})
+        self.assertEqual(result, b'ok')
+        self.assertEqual(spans.counters()['over_max_spans'], 1)
+
+    def testRingFileSink(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'spans.ring')
+            sink = ring_file_sink(path, 4096)
+
+            def check():
+                return os.path.exists('%s-%d' % (path, os.getpid()))
+
+            self.assertEqual(self._run_in_child(check), b'ok')
+            sink.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def testFileSink(self):
+        directory = tempfile.mkdtemp()
+        try:
+            prefix = os.path.join(directory, 'spans')
+            sink = file_sink(prefix, compress=True)
+            tracer = batching_tracer(recording_tracer(), sink)
+            tracer.start_span('parent').finish()
+            self.assertTrue(tracer.flush(5))
+            stream = sink._file
+            fd = stream.fileno()
+
+            def check():
+                try:
+                    os.fstat(fd)
+                except OSError:
+                    return stream.fileobj is None and sink._file is None
+                return False
+
+            self.assertEqual(self._run_in_child(check), b'ok')
+            tracer.start_span('after').finish()
+            self.assertTrue(tracer.close(5))
+            self.assertEqual([
+                span.operation_name
+                for span in read_span_files(prefix + '.000000.jsonl.gz')
+            ], ['parent', 'after'])
+        finally:
+            shutil.rmtree(directory)
+
+    def testRebindingsPruned(self):
+        interceptor = open_tracing_client_interceptor(recording_tracer())
+        rebind_tracer_after_fork(recording_tracer, interceptor)
+        rebindings = len(_fork._rebindings)
+        del interceptor
+        rebind_tracer_after_fork(recording_tracer,
+                                 open_tracing_client_interceptor(
+                                     recording_tracer()))
+        self.assertEqual(len(_fork._rebindings), rebindings)
+
+    def testRebindTracer(self):
+        interceptor = open_tracing_client_interceptor(recording_tracer())
+        tracer = recording_tracer()
+        rebind_tracer(tracer, interceptor)
+        self.assertIs(interceptor._tracer, tracer)
+        self.assertRaises(TypeError, rebind_tracer, tracer, object())
@@ -0,0 +1,185 @@
+import unittest
+
+import grpc
+
+from _service import Service, ErroringHandler, Handler
+from grpc_opentracing import background_span_finisher, \
+    open_telemetry_client_interceptor, open_telemetry_server_interceptor, \
+    span_rotation
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import \
+        InMemorySpanExporter
+    from opentelemetry.trace.propagation.tracecontext import \
+        TraceContextTextMapPropagator
+except ImportError:
+    trace = None
+
+
+class _CurrentSpanHandler(Handler):
+
+    def __init__(self):
+        super(_CurrentSpanHandler, self).__init__()
+        self.current_span = None
+
+    def handle_unary_unary(self, request, servicer_context):
+        self.current_span = trace.get_current_span()
+        return super(_CurrentSpanHandler, self).handle_unary_unary(
+            request, servicer_context)
+
+
+@unittest.skipIf(trace is None, 'opentelemetry-sdk is not installed')
+class OpenTelemetryTest(unittest.TestCase):
+    """Test that the interceptors create OpenTelemetry spans."""
+
+    def setUp(self):
+        self._exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(self._exporter))
+        self._tracer = provider.get_tracer(__name__)
+        propagator = TraceContextTextMapPropagator()
+        self._client_interceptor = open_telemetry_client_interceptor(
+            self._tracer, propagator, log_payloads=True)
+        self._server_interceptor = open_telemetry_server_interceptor(
+            self._tracer, propagator, log_payloads=True)
+
+    def _spans(self):
+        spans = dict((span.kind, span)
+                     for span in self._exporter.get_finished_spans())
+        self.assertEqual(len(spans), 2)
+        return spans[trace.SpanKind.CLIENT], spans[trace.SpanKind.SERVER]
+
+    def _check_spans(self, method):
+        client_span, server_span = self._spans()
+        for span in (client_span, server_span):
+            self.assertEqual(span.name, 'test/' + method)
+            self.assertEqual(span.attributes['rpc.system'], 'grpc')
+            self.assertEqual(span.attributes['rpc.service'], 'test')
+            self.assertEqual(span.attributes['rpc.method'], method)
+            self.assertEqual(span.attributes['rpc.grpc.status_code'], 0)
+            self.assertTrue(span.status.is_ok)
+            self.assertIn('response', [
+                key for event in span.events for key in event.attributes
+            ])
+        self.assertEqual(server_span.context.trace_id,
+                         client_span.context.trace_id)
+        self.assertEqual(server_span.parent.span_id, client_span.context.span_id)
+        self.assertNotIn('component', server_span.attributes)
+
+    def testUnaryUnary(self):
+        service = Service([self._client_interceptor],
+                          [self._server_interceptor])
+        service.unary_unary_multi_callable(b'\x01')
+        self._check_spans('UnaryUnary')
+
+    def testStreamStream(self):
+        service = Service([self._client_interceptor],
+                          [self._server_interceptor])
+        list(service.stream_stream_multi_callable(iter([b'\x01', b'\x02'])))
+        self._check_spans('StreamStream')
+
+    def testCurrentSpanIsParent(self):
+        service = Service([self._client_interceptor],
+                          [self._server_interceptor])
+        with self._tracer.start_as_current_span('parent') as parent:
+            service.unary_unary_multi_callable(b'\x01')
+        spans = dict((span.name, span)
+                     for span in self._exporter.get_finished_spans())
+        self.assertEqual(spans['test/UnaryUnary'].parent.span_id,
+                         parent.get_span_context().span_id)
+
+    def testCurrentSpanInHandler(self):
+        for span_finisher in (None, background_span_finisher()):
+            self._exporter.clear()
+            handler = _CurrentSpanHandler()
+            server_interceptor = open_telemetry_server_interceptor(
+                self._tracer,
+                TraceContextTextMapPropagator(),
+                span_finisher=span_finisher)
+            service = Service([], [server_interceptor], handler)
+            service.unary_unary_multi_callable(b'\x01')
+            if span_finisher is not None:
+                self.assertTrue(span_finisher.close(5))
+            server_span, = self._exporter.get_finished_spans()
+            self.assertEqual(handler.current_span.get_span_context().span_id,
+                             server_span.context.span_id)
+
+    def testFollowsFromIsLink(self):
+        server_interceptor = open_telemetry_server_interceptor(
+            self._tracer,
+            TraceContextTextMapPropagator(),
+            span_rotation=span_rotation(max_messages=1))
+        service = Service([self._client_interceptor], [server_interceptor])
+        list(service.stream_stream_multi_callable(iter([b'\x01', b'\x02'])))
+        server_spans = [
+            span for span in self._exporter.get_finished_spans()
+            if span.kind == trace.SpanKind.SERVER
+        ]
+        self.assertEqual(len(server_spans), 3)
+        server_spans.sort(key=lambda span: span.start_time)
+        for previous, span in zip(server_spans, server_spans[1:]):
+            self.assertIsNone(span.parent)
+            self.assertEqual([link.context.span_id for link in span.links],
+                             [previous.context.span_id])
+
+    def testError(self):
+        service = Service([self._client_interceptor],
+                          [self._server_interceptor], ErroringHandler())
+        self.assertRaises(grpc.RpcError, service.unary_unary_multi_callable,
+                          b'\x01')
+        client_span, server_span = self._spans()
+        for span in (client_span, server_span):
+            self.assertFalse(span.status.is_ok)
+            self.assertIn('exception',
+                          [event.name for event in span.events])
+        self.assertEqual(server_span.attributes['rpc.grpc.status_code'],
+                         grpc.StatusCode.INVALID_ARGUMENT.value[0])
+
+
+@unittest.skipIf(trace is None, 'opentelemetry-sdk is not installed')
+class OpenTelemetryPropagationCodecTest(unittest.TestCase):
+    """Test that the built-in codecs propagate OpenTelemetry span contexts."""
+
+    def setUp(self):
+        self._exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(self._exporter))
+        self._tracer = provider.get_tracer(__name__)
+
+    def _check_propagation(self, client_interceptor, server_interceptor):
+        service = Service([client_interceptor], [server_interceptor])
+        service.unary_unary_multi_callable(b'\x01')
+        spans = dict((span.kind, span)
+                     for span in self._exporter.get_finished_spans())
+        client_span = spans[trace.SpanKind.CLIENT]
+        server_span = spans[trace.SpanKind.SERVER]
+        self.assertEqual(server_span.context.trace_id,
+                         client_span.context.trace_id)
+        self.assertEqual(server_span.parent.span_id, client_span.context.span_id)
+        self.assertTrue(server_span.parent.trace_flags.sampled)
+        return service.handler.invocation_metadata
+
+    def testW3CToPropagator(self):
+        metadata = self._check_propagation(
+            open_telemetry_client_interceptor(
+                self._tracer, propagation_codec='w3c'),
+            open_telemetry_server_interceptor(self._tracer,
+                                              TraceContextTextMapPropagator()))
+        self.assertIn('traceparent', [key for key, _ in metadata])
+
+    def testPropagatorToW3C(self):
+        self._check_propagation(
+            open_telemetry_client_interceptor(self._tracer,
+                                              TraceContextTextMapPropagator()),
+            open_telemetry_server_interceptor(
+                self._tracer, propagation_codec='w3c'))
+
+    def testB3(self):
+        metadata = self._check_propagation(
+            open_telemetry_client_interceptor(
+                self._tracer, propagation_codec='b3'),
+            open_telemetry_server_interceptor(
+                self._tracer, propagation_codec='b3'))
+        self.assertIn('b3', [key for key, _ in metadata])
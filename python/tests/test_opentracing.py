@@ -1,10 +1,16 @@
+import hashlib
+import shutil
+import tempfile
+import threading
 import unittest
 
 import grpc
 
-from _service import Service, ErroringHandler, ExceptionErroringHandler
-from _tracer import Tracer, SpanRelationship
-from grpc_opentracing import open_tracing_client_interceptor, open_tracing_server_interceptor
+from _service import Service, Handler, ErroringHandler, ExceptionErroringHandler
+from grpc_opentracing.recording import recording_tracer
+from grpc_opentracing import open_tracing_client_interceptor, open_tracing_server_interceptor, background_span_finisher, message_spans, payload_store, span_rotation, stream_summary
+from grpc_opentracing import _server
+from grpc_opentracing._payload import LazyPayload
 import opentracing
 
 
@@ -12,7 +18,7 @@ class OpenTracingTest(unittest.TestCase):
     """Test that tracers create the correct spans when RPC calls are invoked."""
 
     def setUp(self):
-        self._tracer = Tracer()
+        self._tracer = recording_tracer()
         self._service = Service([open_tracing_client_interceptor(self._tracer)],
                                 [open_tracing_server_interceptor(self._tracer)])
 
@@ -25,16 +31,16 @@ class OpenTracingTest(unittest.TestCase):
 
         self.assertEqual(response, expected_response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertEqual(span1.get_tag('span.kind'), 'server')
 
         self.assertEqual(
-            self._tracer.get_relationship(0, 1),
+            self._tracer.get_relationship(1, 2),
             opentracing.ReferenceType.CHILD_OF)
 
     def testUnaryUnaryOpenTracingFuture(self):
@@ -47,16 +53,16 @@ class OpenTracingTest(unittest.TestCase):
 
         self.assertEqual(response, expected_response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertEqual(span1.get_tag('span.kind'), 'server')
 
         self.assertEqual(
-            self._tracer.get_relationship(0, 1),
+            self._tracer.get_relationship(1, 2),
             opentracing.ReferenceType.CHILD_OF)
 
     def testUnaryUnaryOpenTracingWithCall(self):
@@ -69,16 +75,16 @@ class OpenTracingTest(unittest.TestCase):
         self.assertEqual(response, expected_response)
         self.assertIs(grpc.StatusCode.OK, call.code())
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertEqual(span1.get_tag('span.kind'), 'server')
 
         self.assertEqual(
-            self._tracer.get_relationship(0, 1),
+            self._tracer.get_relationship(1, 2),
             opentracing.ReferenceType.CHILD_OF)
 
     def testUnaryStreamOpenTracing(self):
@@ -90,16 +96,16 @@ class OpenTracingTest(unittest.TestCase):
 
         self.assertEqual(list(response), list(expected_response))
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertEqual(span1.get_tag('span.kind'), 'server')
 
         self.assertEqual(
-            self._tracer.get_relationship(0, 1),
+            self._tracer.get_relationship(1, 2),
             opentracing.ReferenceType.CHILD_OF)
 
     def testStreamUnaryOpenTracing(self):
@@ -111,16 +117,16 @@ class OpenTracingTest(unittest.TestCase):
 
         self.assertEqual(response, expected_response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertEqual(span1.get_tag('span.kind'), 'server')
 
         self.assertEqual(
-            self._tracer.get_relationship(0, 1),
+            self._tracer.get_relationship(1, 2),
             opentracing.ReferenceType.CHILD_OF)
 
     def testStreamUnaryOpenTracingWithCall(self):
@@ -133,16 +139,16 @@ class OpenTracingTest(unittest.TestCase):
         self.assertEqual(response, expected_response)
         self.assertIs(grpc.StatusCode.OK, call.code())
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertEqual(span1.get_tag('span.kind'), 'server')
 
         self.assertEqual(
-            self._tracer.get_relationship(0, 1),
+            self._tracer.get_relationship(1, 2),
             opentracing.ReferenceType.CHILD_OF)
 
     def testStreamUnaryOpenTracingFuture(self):
@@ -155,16 +161,16 @@ class OpenTracingTest(unittest.TestCase):
 
         self.assertEqual(response, expected_response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertEqual(span1.get_tag('span.kind'), 'server')
 
         self.assertEqual(
-            self._tracer.get_relationship(0, 1),
+            self._tracer.get_relationship(1, 2),
             opentracing.ReferenceType.CHILD_OF)
 
     def testStreamStreamOpenTracing(self):
@@ -176,16 +182,16 @@ class OpenTracingTest(unittest.TestCase):
 
         self.assertEqual(list(response), list(expected_response))
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertEqual(span1.get_tag('span.kind'), 'server')
 
         self.assertEqual(
-            self._tracer.get_relationship(0, 1),
+            self._tracer.get_relationship(1, 2),
             opentracing.ReferenceType.CHILD_OF)
 
 
@@ -193,7 +199,7 @@ class OpenTracingInteroperabilityClientTest(unittest.TestCase):
     """Test that a traced client can interoperate with a non-trace server."""
 
     def setUp(self):
-        self._tracer = Tracer()
+        self._tracer = recording_tracer()
         self._service = Service([open_tracing_client_interceptor(self._tracer)],
                                 [])
 
@@ -206,11 +212,11 @@ class OpenTracingInteroperabilityClientTest(unittest.TestCase):
 
         self.assertEqual(response, expected_response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
     def testUnaryUnaryOpenTracingWithCall(self):
@@ -223,11 +229,11 @@ class OpenTracingInteroperabilityClientTest(unittest.TestCase):
         self.assertEqual(response, expected_response)
         self.assertIs(grpc.StatusCode.OK, call.code())
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
     def testUnaryStreamOpenTracing(self):
@@ -239,11 +245,11 @@ class OpenTracingInteroperabilityClientTest(unittest.TestCase):
 
         self.assertEqual(list(response), list(expected_response))
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
     def testStreamUnaryOpenTracing(self):
@@ -255,11 +261,11 @@ class OpenTracingInteroperabilityClientTest(unittest.TestCase):
 
         self.assertEqual(response, expected_response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
     def testStreamUnaryOpenTracingWithCall(self):
@@ -272,11 +278,11 @@ class OpenTracingInteroperabilityClientTest(unittest.TestCase):
         self.assertEqual(response, expected_response)
         self.assertIs(grpc.StatusCode.OK, call.code())
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
     def testStreamStreamOpenTracing(self):
@@ -288,11 +294,11 @@ class OpenTracingInteroperabilityClientTest(unittest.TestCase):
 
         self.assertEqual(list(response), list(expected_response))
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'client')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
 
@@ -302,7 +308,7 @@ class OpenTracingMetadataTest(unittest.TestCase):
   """
 
     def setUp(self):
-        self._tracer = Tracer()
+        self._tracer = recording_tracer()
         self._service = Service([open_tracing_client_interceptor(self._tracer)],
                                 [open_tracing_server_interceptor(self._tracer)])
 
@@ -320,11 +326,490 @@ class OpenTracingMetadataTest(unittest.TestCase):
         self.assertIn(('abc', '123'), future.trailing_metadata())
 
 
+class OpenTracingBinaryMetadataTest(unittest.TestCase):
+    """Test that span contexts can be propagated in binary metadata."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+
+    def _check_relationship(self):
+        client_span = self._tracer.find_spans(tags={'span.kind': 'client'})[0]
+        server_span = self._tracer.find_spans(tags={'span.kind': 'server'})[0]
+        self.assertEqual(
+            self._tracer.get_relationship(client_span.span_id,
+                                          server_span.span_id),
+            opentracing.ReferenceType.CHILD_OF)
+
+    def testUnaryUnaryOpenTracing(self):
+        service = Service([
+            open_tracing_client_interceptor(
+                self._tracer, binary_metadata_key='ot-span-context-bin')
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer, binary_metadata_key='ot-span-context-bin')
+        ])
+        service.unary_unary_multi_callable(b'\x01', None, (('abc', '123'),))
+        keys = [key for key, _ in service.handler.invocation_metadata]
+        self.assertIn('abc', keys)
+        self.assertIn('ot-span-context-bin', keys)
+        self.assertFalse([key for key in keys if key.startswith('ot-tracer-')])
+        self._check_relationship()
+
+    def testStreamStreamOpenTracing(self):
+        service = Service([
+            open_tracing_client_interceptor(
+                self._tracer, binary_metadata_key='ot-span-context-bin')
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer, binary_metadata_key='ot-span-context-bin')
+        ])
+        list(service.stream_stream_multi_callable(iter([b'\x01', b'\x02'])))
+        self._check_relationship()
+
+    def testTextClient(self):
+        service = Service([open_tracing_client_interceptor(self._tracer)], [
+            open_tracing_server_interceptor(
+                self._tracer, binary_metadata_key='ot-span-context-bin')
+        ])
+        service.unary_unary_multi_callable(b'\x01')
+        self._check_relationship()
+
+    def testInvalidKey(self):
+        with self.assertRaises(ValueError):
+            open_tracing_client_interceptor(
+                self._tracer, binary_metadata_key='ot-span-context')
+
+
+class OpenTracingMaxPayloadBytesTest(unittest.TestCase):
+    """Test that logged payloads are bounded and formatted lazily."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        self._service = Service([
+            open_tracing_client_interceptor(
+                self._tracer, log_payloads=True, max_payload_bytes=8)
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer, log_payloads=True, max_payload_bytes=8)
+        ])
+
+    def _payloads(self, key):
+        return [
+            key_values[key]
+            for span in self._tracer.find_spans()
+            for _, key_values in span.logs if key in key_values
+        ]
+
+    def testTruncated(self):
+        self._service.unary_unary_multi_callable(b'\x01' * 100)
+        requests = self._payloads('request')
+        self.assertEqual(len(requests), 2)
+        for request in requests:
+            # Only one escaped byte fits into 8 characters.
+            self.assertEqual(
+                str(request), repr(b'\x01') + '...<99 bytes truncated>')
+
+    def testShortPayload(self):
+        list(
+            self._service.stream_stream_multi_callable(
+                iter([b'\x01', b'\x02'])))
+        self.assertEqual(
+            sorted(str(request) for request in self._payloads('request')),
+            [repr(b'\x01')] * 2 + [repr(b'\x02')] * 2)
+
+    def testText(self):
+        class Message(object):
+
+            def __str__(self):
+                return 'message ' * 4
+
+        payload = LazyPayload(Message(), 12)
+        self.assertEqual(str(payload), 'message mess...<20 characters truncated>')
+        self.assertEqual(str(payload), 'message mess...<20 characters truncated>')
+
+    def testSnapshot(self):
+        class Message(object):
+            data = b'message ' * 4
+
+            def SerializeToString(self, deterministic=False):
+                return self.data
+
+        message = Message()
+        payload = LazyPayload(message, 12)
+        message.data = b'mutated'
+        self.assertEqual(
+            str(payload), repr(b'message m') + '...<23 bytes truncated>')
+
+
+class OpenTracingStreamSummaryTest(unittest.TestCase):
+    """Test that streamed messages are summarized in span tags."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+
+    def _service(self, log_every=None):
+        return Service([
+            open_tracing_client_interceptor(
+                self._tracer,
+                log_payloads=True,
+                stream_summary=stream_summary(log_every))
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer,
+                log_payloads=True,
+                stream_summary=stream_summary(log_every))
+        ])
+
+    def testStreamStream(self):
+        service = self._service()
+        list(
+            service.stream_stream_multi_callable(
+                iter([b'\x01', b'\x02\x02', b'\x03'])))
+        spans = self._tracer.find_spans()
+        self.assertEqual(len(spans), 2)
+        for span in spans:
+            for key in ('request', 'response'):
+                self.assertEqual(span.get_tag(key + '.count'), 3)
+                self.assertEqual(span.get_tag(key + '.bytes'), 4)
+                self.assertEqual(span.get_tag(key + '.max_bytes'), 2)
+                self.assertLessEqual(
+                    span.get_tag(key + '.first_time'),
+                    span.get_tag(key + '.last_time'))
+            self.assertFalse(span.logs)
+
+    def testUnaryStream(self):
+        service = self._service()
+        list(service.unary_stream_multi_callable(b'\x01'))
+        for span in self._tracer.find_spans():
+            self.assertEqual(span.get_tag('response.count'), 5)
+            self.assertIsNone(span.get_tag('request.count'))
+            # Unary requests are still logged.
+            self.assertEqual([key_values for _, key_values in span.logs],
+                             [{'request': b'\x01'}])
+
+    def testLogEvery(self):
+        service = self._service(log_every=2)
+        list(
+            service.stream_stream_multi_callable(
+                iter([b'\x01', b'\x02', b'\x03'])))
+        for span in self._tracer.find_spans():
+            self.assertEqual(span.get_tag('request.count'), 3)
+            self.assertEqual(
+                sorted(key_values['request']
+                       for _, key_values in span.logs
+                       if 'request' in key_values), [b'\x01', b'\x03'])
+
+    def testUnconsumedRequests(self):
+
+        class FirstRequestHandler(Handler):
+
+            def handle_stream_unary(self, request_iterator, servicer_context):
+                return next(request_iterator)
+
+        service = Service([], [
+            open_tracing_server_interceptor(
+                self._tracer, stream_summary=stream_summary())
+        ], FirstRequestHandler())
+        service.stream_unary_multi_callable(iter([b'\x01', b'\x02']))
+        span = self._tracer.find_spans()[0]
+        self.assertEqual(span.get_tag('request.count'), 1)
+
+    def testInvalidLogEvery(self):
+        with self.assertRaises(ValueError):
+            stream_summary(log_every=0)
+
+
+class OpenTracingSpanRotationTest(unittest.TestCase):
+    """Test that the spans of response streams are rotated."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        self._service = Service([
+            open_tracing_client_interceptor(
+                self._tracer,
+                stream_summary=stream_summary(),
+                span_rotation=span_rotation(max_messages=2))
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer,
+                stream_summary=stream_summary(),
+                span_rotation=span_rotation(max_messages=2))
+        ])
+
+    def _check_segments(self, kind):
+        spans = sorted(
+            self._tracer.find_spans(tags={'span.kind': kind}),
+            key=lambda span: span.get_tag('stream.segment'))
+        self.assertEqual([span.get_tag('stream.segment') for span in spans],
+                         [0, 1, 2])
+        self.assertEqual([span.get_tag('response.count') for span in spans],
+                         [2, 2, 1])
+        for previous, span in zip(spans, spans[1:]):
+            self.assertEqual(
+                self._tracer.get_relationship(previous.span_id, span.span_id),
+                opentracing.ReferenceType.FOLLOWS_FROM)
+        return spans
+
+    def testUnaryStream(self):
+        responses = list(
+            self._service.unary_stream_multi_callable(b'\x01'))
+        self.assertEqual(len(responses), 5)
+        client_spans = self._check_segments('client')
+        server_spans = self._check_segments('server')
+        self.assertEqual(
+            self._tracer.get_relationship(client_spans[0].span_id,
+                                          server_spans[0].span_id),
+            opentracing.ReferenceType.CHILD_OF)
+
+    def testLogsRotatedRequests(self):
+        service = Service([
+            open_tracing_client_interceptor(
+                self._tracer,
+                log_payloads=True,
+                span_rotation=span_rotation(max_messages=2))
+        ], [])
+        requests = [b'\x01', b'\x02', b'\x03', b'\x04', b'\x05']
+        self.assertEqual(
+            list(service.stream_stream_multi_callable(iter(requests))),
+            requests)
+        spans = self._tracer.find_spans()
+        self.assertEqual(len(spans), 3)
+        # gRPC consumes the requests on a thread of its own, which logs them
+        # to the rotated-out spans too.
+        self.assertEqual(
+            sorted(key_values['request']
+                   for span in spans
+                   for _, key_values in span.logs
+                   if 'request' in key_values), requests)
+
+    def testShortStream(self):
+        list(self._service.stream_stream_multi_callable(iter([b'\x01'])))
+        for span in self._tracer.find_spans():
+            self.assertIsNone(span.get_tag('stream.segment'))
+
+    def testInvalidRotation(self):
+        with self.assertRaises(ValueError):
+            span_rotation()
+        with self.assertRaises(ValueError):
+            span_rotation(max_seconds=0)
+
+
+class OpenTracingMessageSpansTest(unittest.TestCase):
+    """Test that sampled messages of streams are traced."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+
+    def _call(self, message_spans):
+        service = Service([
+            open_tracing_client_interceptor(
+                self._tracer, message_spans=message_spans)
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer, message_spans=message_spans)
+        ])
+        list(
+            service.stream_stream_multi_callable(
+                iter([b'\x01', b'\x02', b'\x03', b'\x04', b'\x05'])))
+
+    def testSpans(self):
+        spans = message_spans(max_spans=2, sample_every=2)
+        self._call(spans)
+        for kind in ('client', 'server'):
+            rpc_span = self._tracer.find_spans(tags={'span.kind': kind})[0]
+            for key in ('request', 'response'):
+                children = [
+                    span for span in self._tracer.find_spans(
+                        operation_name='/test/StreamStream ' + key)
+                    if self._tracer.get_relationship(
+                        rpc_span.span_id, span.span_id) ==
+                    opentracing.ReferenceType.CHILD_OF
+                ]
+                self.assertEqual(
+                    sorted(span.get_tag('message.index')
+                           for span in children), [0, 2])
+        self.assertEqual(spans.counters(), {
+            'traced': 8,
+            'over_max_spans': 4
+        })
+
+    def testEvents(self):
+        self._call(message_spans(events=True))
+        self.assertEqual(len(self._tracer.find_spans()), 2)
+        for span in self._tracer.find_spans():
+            events = [
+                key_values for _, key_values in span.logs
+                if key_values.get('event') == 'response'
+            ]
+            self.assertEqual(
+                [key_values['message.index'] for key_values in events],
+                list(range(5)))
+            for key_values in events:
+                self.assertGreaterEqual(key_values['message.seconds'], 0)
+
+
+class _BlockingHandler(Handler):
+
+    def __init__(self):
+        super(_BlockingHandler, self).__init__()
+        self.blocked = threading.Event()
+        self.unblock = threading.Event()
+
+    def handle_unary_stream(self, request, servicer_context):
+        yield request
+        self.blocked.set()
+        self.unblock.wait()
+        yield request
+
+
+class OpenTracingCancellationTest(unittest.TestCase):
+    """Test that server spans of cancelled streams are finished promptly."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        self._handler = _BlockingHandler()
+        self._service = Service([],
+                                [open_tracing_server_interceptor(self._tracer)],
+                                self._handler)
+
+    def tearDown(self):
+        self._handler.unblock.set()
+
+    def testCancelledServerStream(self):
+        rpc_infos = []
+        stream_completion = _server._StreamCompletion
+
+        class _StreamCompletion(stream_completion):
+
+            def __init__(self, guarded_span, rpc_info, *args):
+                super(_StreamCompletion, self).__init__(guarded_span, rpc_info,
+                                                        *args)
+                rpc_infos.append(rpc_info)
+
+        _server._StreamCompletion = _StreamCompletion
+        try:
+            call = self._service.unary_stream_multi_callable(b'\x01')
+            self.assertEqual(next(call), b'\x01')
+        finally:
+            _server._StreamCompletion = stream_completion
+        self.assertEqual(rpc_infos[0].request, b'\x01')
+        self.assertTrue(self._handler.blocked.wait(5))
+        call.cancel()
+        # The handler is still blocked, so only the cancellation can have
+        # finished the span.
+        for _ in range(100):
+            if self._tracer.find_spans():
+                break
+            threading.Event().wait(0.01)
+        spans = self._tracer.find_spans()
+        self.assertEqual(len(spans), 1)
+        self.assertTrue(spans[0].get_tag('cancelled'))
+        # Nor does the suspended stream keep the RPC's payloads alive.
+        self.assertIsNone(rpc_infos[0].request)
+        self.assertIsNone(rpc_infos[0].metadata)
+        self._handler.unblock.set()
+
+    def testCompletedServerStream(self):
+        self._handler.unblock.set()
+        self.assertEqual(
+            len(list(self._service.unary_stream_multi_callable(b'\x01'))), 2)
+        spans = self._tracer.find_spans()
+        self.assertEqual(len(spans), 1)
+        self.assertIsNone(spans[0].get_tag('cancelled'))
+
+
+class OpenTracingPayloadStoreTest(unittest.TestCase):
+    """Test that logged payloads are kept in a content-addressed store."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        self._directory = tempfile.mkdtemp()
+        self._store = payload_store(self._directory)
+        self._service = Service([
+            open_tracing_client_interceptor(
+                self._tracer,
+                log_payloads=True,
+                payload_store=self._store)
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer, log_payloads=True, payload_store=self._store)
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def testDeduplicated(self):
+        request = b'\x01' * 1000
+        for _ in range(2):
+            self._service.unary_unary_multi_callable(request)
+        digest = hashlib.sha256(request).hexdigest()
+        spans = self._tracer.find_spans()
+        self.assertEqual(len(spans), 4)
+        for span in spans:
+            self.assertEqual([key_values for _, key_values in span.logs], [{
+                'request.digest': digest,
+                'request.size': 1000
+            }, {
+                'response.digest': digest,
+                'response.size': 1000
+            }])
+        self.assertEqual(self._store.get(digest), request)
+        self.assertEqual(self._store.counters(), {
+            'stored': 1,
+            'deduplicated': 7
+        })
+
+    def testStreamed(self):
+        list(
+            self._service.stream_stream_multi_callable(
+                iter([b'\x01', b'\x02'])))
+        digests = set(key_values['request.digest']
+                      for span in self._tracer.find_spans()
+                      for _, key_values in span.logs
+                      if 'request.digest' in key_values)
+        self.assertEqual(
+            sorted(self._store.get(digest) for digest in digests),
+            [b'\x01', b'\x02'])
+
+    def testSpanFinisher(self):
+        span_finisher = background_span_finisher()
+        service = Service([
+            open_tracing_client_interceptor(
+                self._tracer,
+                log_payloads=True,
+                span_finisher=span_finisher,
+                payload_store=self._store)
+        ], [])
+        service.unary_unary_multi_callable(b'\x01')
+        self.assertTrue(span_finisher.close(5))
+        span = self._tracer.find_spans()[0]
+        digest = span.logs[0][1]['request.digest']
+        self.assertEqual(self._store.get(digest), b'\x01')
+
+    def testLeastRecentlyUsed(self):
+        store = payload_store(self._directory)
+        store._max_known = 2
+        for payload in (b'\x01', b'\x02', b'\x01', b'\x03'):
+            store.put(payload)
+        self.assertEqual(
+            list(store._known),
+            [hashlib.sha256(payload).hexdigest()
+             for payload in (b'\x01', b'\x03')])
+
+    def testMaxPayloadBytes(self):
+        self.assertRaises(
+            ValueError,
+            open_tracing_client_interceptor,
+            self._tracer,
+            max_payload_bytes=100,
+            payload_store=self._store)
+
+
 class OpenTracingInteroperabilityServerTest(unittest.TestCase):
     """Test that a traced server can interoperate with a non-trace client."""
 
     def setUp(self):
-        self._tracer = Tracer()
+        self._tracer = recording_tracer()
         self._service = Service([],
                                 [open_tracing_server_interceptor(self._tracer)])
 
@@ -337,11 +822,11 @@ class OpenTracingInteroperabilityServerTest(unittest.TestCase):
 
         self.assertEqual(response, expected_response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'server')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
     def testUnaryUnaryOpenTracingWithCall(self):
@@ -354,11 +839,11 @@ class OpenTracingInteroperabilityServerTest(unittest.TestCase):
         self.assertEqual(response, expected_response)
         self.assertIs(grpc.StatusCode.OK, call.code())
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'server')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
     def testUnaryStreamOpenTracing(self):
@@ -370,11 +855,11 @@ class OpenTracingInteroperabilityServerTest(unittest.TestCase):
 
         self.assertEqual(list(response), list(expected_response))
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'server')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
     def testStreamUnaryOpenTracing(self):
@@ -386,11 +871,11 @@ class OpenTracingInteroperabilityServerTest(unittest.TestCase):
 
         self.assertEqual(response, expected_response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'server')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
     def testStreamUnaryOpenTracingWithCall(self):
@@ -403,11 +888,11 @@ class OpenTracingInteroperabilityServerTest(unittest.TestCase):
         self.assertEqual(response, expected_response)
         self.assertIs(grpc.StatusCode.OK, call.code())
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'server')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
     def testStreamStreamOpenTracing(self):
@@ -419,11 +904,11 @@ class OpenTracingInteroperabilityServerTest(unittest.TestCase):
 
         self.assertEqual(list(response), list(expected_response))
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertEqual(span0.get_tag('span.kind'), 'server')
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNone(span1)
 
 
@@ -431,7 +916,7 @@ class OpenTracingErroringTest(unittest.TestCase):
     """Test that tracer spans set the error tag when erroring RPC are invoked."""
 
     def setUp(self):
-        self._tracer = Tracer()
+        self._tracer = recording_tracer()
         self._service = Service([open_tracing_client_interceptor(self._tracer)],
                                 [open_tracing_server_interceptor(self._tracer)],
                                 ErroringHandler())
@@ -441,11 +926,11 @@ class OpenTracingErroringTest(unittest.TestCase):
         request = b'\x01'
         self.assertRaises(grpc.RpcError, multi_callable, request)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -454,11 +939,11 @@ class OpenTracingErroringTest(unittest.TestCase):
         request = b'\x01'
         self.assertRaises(grpc.RpcError, multi_callable.with_call, request)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -468,11 +953,11 @@ class OpenTracingErroringTest(unittest.TestCase):
         response = multi_callable(request)
         self.assertRaises(grpc.RpcError, list, response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -481,11 +966,11 @@ class OpenTracingErroringTest(unittest.TestCase):
         requests = [b'\x01', b'\x02']
         self.assertRaises(grpc.RpcError, multi_callable, iter(requests))
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -495,11 +980,11 @@ class OpenTracingErroringTest(unittest.TestCase):
         self.assertRaises(grpc.RpcError, multi_callable.with_call,
                           iter(requests))
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -509,11 +994,11 @@ class OpenTracingErroringTest(unittest.TestCase):
         response = multi_callable(iter(requests))
         self.assertRaises(grpc.RpcError, list, response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -524,7 +1009,7 @@ class OpenTracingExceptionErroringTest(unittest.TestCase):
   """
 
     def setUp(self):
-        self._tracer = Tracer()
+        self._tracer = recording_tracer()
         self._service = Service([open_tracing_client_interceptor(self._tracer)],
                                 [open_tracing_server_interceptor(self._tracer)],
                                 ExceptionErroringHandler())
@@ -534,11 +1019,11 @@ class OpenTracingExceptionErroringTest(unittest.TestCase):
         request = b'\x01'
         self.assertRaises(grpc.RpcError, multi_callable, request)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -547,11 +1032,11 @@ class OpenTracingExceptionErroringTest(unittest.TestCase):
         request = b'\x01'
         self.assertRaises(grpc.RpcError, multi_callable.with_call, request)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -561,11 +1046,11 @@ class OpenTracingExceptionErroringTest(unittest.TestCase):
         response = multi_callable(request)
         self.assertRaises(grpc.RpcError, list, response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -574,11 +1059,11 @@ class OpenTracingExceptionErroringTest(unittest.TestCase):
         requests = [b'\x01', b'\x02']
         self.assertRaises(grpc.RpcError, multi_callable, iter(requests))
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -588,11 +1073,11 @@ class OpenTracingExceptionErroringTest(unittest.TestCase):
         self.assertRaises(grpc.RpcError, multi_callable.with_call,
                           iter(requests))
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
 
@@ -602,10 +1087,83 @@ class OpenTracingExceptionErroringTest(unittest.TestCase):
         response = multi_callable(iter(requests))
         self.assertRaises(grpc.RpcError, list, response)
 
-        span0 = self._tracer.get_span(0)
+        span0 = self._tracer.get_span(1)
         self.assertIsNotNone(span0)
         self.assertTrue(span0.get_tag('error'))
 
-        span1 = self._tracer.get_span(1)
+        span1 = self._tracer.get_span(2)
         self.assertIsNotNone(span1)
         self.assertTrue(span1.get_tag('error'))
+
+
+class OpenTracingBackgroundFinisherTest(unittest.TestCase):
+    """Test that spans are completed by a background span finisher."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        self._span_finisher = background_span_finisher()
+        self._decorated_spans = []
+
+        def span_decorator(span, rpc_info):
+            self._decorated_spans.append(span)
+            span.set_tag('decorated', True)
+
+        self._service = Service([
+            open_tracing_client_interceptor(
+                self._tracer,
+                log_payloads=True,
+                span_decorator=span_decorator,
+                span_finisher=self._span_finisher)
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer,
+                log_payloads=True,
+                span_decorator=span_decorator,
+                span_finisher=self._span_finisher)
+        ])
+
+    def tearDown(self):
+        self._span_finisher.close()
+
+    def _check_spans(self):
+        self.assertTrue(self._span_finisher.flush(5))
+        for identity in (1, 2):
+            span = self._tracer.get_span(identity)
+            self.assertTrue(span.finished)
+            self.assertTrue(span.get_tag('decorated'))
+            self.assertIn(identity, [
+                decorated_span.context.span_id
+                for decorated_span in self._decorated_spans
+            ])
+            self.assertTrue(span.logs)
+        counters = self._span_finisher.counters()
+        self.assertEqual(counters['completed'], 2)
+        self.assertEqual(counters['dropped'], 0)
+
+    def testUnaryUnaryOpenTracing(self):
+        multi_callable = self._service.unary_unary_multi_callable
+        multi_callable(b'\x01')
+        self._check_spans()
+
+    def testUnaryUnaryOpenTracingFuture(self):
+        multi_callable = self._service.unary_unary_multi_callable
+        multi_callable.future(b'\x01').result()
+        self._check_spans()
+
+    def testStreamStreamOpenTracing(self):
+        multi_callable = self._service.stream_stream_multi_callable
+        list(multi_callable(iter([b'\x01', b'\x02'])))
+        self._check_spans()
+
+    def testDropOnFull(self):
+        span_finisher = background_span_finisher(max_queue_size=1)
+        blocker = threading.Event()
+        self.assertTrue(span_finisher.submit(blocker.wait))
+        accepted = [span_finisher.submit(lambda: None) for _ in range(3)]
+        blocker.set()
+        self.assertTrue(span_finisher.close(5))
+        self.assertFalse(all(accepted))
+        counters = span_finisher.counters()
+        self.assertEqual(counters['queued'], 1 + accepted.count(True))
+        self.assertEqual(counters['dropped'], accepted.count(False))
+        self.assertEqual(counters['completed'], counters['queued'])
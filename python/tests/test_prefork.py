@@ -0,0 +1,86 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import unittest
+
+import grpc
+
+from _service import _UNARY_UNARY
+from grpc_opentracing.grpcext._prefork import _describe_exit
+
+_SERVER_SCRIPT = """
+import sys
+
+from _service import _GenericHandler, Handler
+from grpc_opentracing.recording import recording_tracer
+from grpc_opentracing import open_tracing_server_interceptor
+from grpc_opentracing.grpcext import serve_prefork
+
+clean = serve_prefork(
+    '127.0.0.1:%d',
+    lambda server: server.add_generic_rpc_handlers(
+        (_GenericHandler(Handler()),)),
+    lambda: [open_tracing_server_interceptor(recording_tracer())],
+    num_workers=2,
+    grace=1)
+sys.exit(0 if clean else 1)
+"""
+
+
+def _unused_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+class PreforkTest(unittest.TestCase):
+    """Test that prefork workers serve RPCs and shut down gracefully."""
+
+    def testServeAndShutDown(self):
+        port = _unused_port()
+        tests_dir = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [tests_dir] + sys.path[:] + [env.get('PYTHONPATH', '')])
+        process = subprocess.Popen(
+            [sys.executable, '-c', _SERVER_SCRIPT % port], env=env)
+        try:
+            channel = grpc.insecure_channel('127.0.0.1:%d' % port)
+            grpc.channel_ready_future(channel).result(timeout=30)
+            multi_callable = channel.unary_unary(_UNARY_UNARY)
+            for _ in range(10):
+                self.assertEqual(multi_callable(b'\x01', timeout=10), b'\x01')
+            channel.close()
+        finally:
+            process.send_signal(signal.SIGTERM)
+            self.assertEqual(process.wait(), 0)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+class DescribeExitTest(unittest.TestCase):
+    """Test that the wait statuses of workers are decoded."""
+
+    def _wait(self, child):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                child()
+            finally:
+                os._exit(0)
+        return os.waitpid(pid, 0)[1]
+
+    def testExitStatus(self):
+        status = self._wait(lambda: os._exit(1))
+        self.assertEqual(_describe_exit(status), 'exited with status 1')
+
+    def testSignal(self):
+        status = self._wait(lambda: os.kill(os.getpid(), signal.SIGKILL))
+        self.assertEqual(
+            _describe_exit(status),
+            'was killed by signal %d' % signal.SIGKILL)
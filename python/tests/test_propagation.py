@@ -0,0 +1,222 @@
+import unittest
+
+from _service import Service
+from grpc_opentracing import ActiveSpanSource, baggage_limits, \
+    open_tracing_client_interceptor, open_tracing_server_interceptor
+from grpc_opentracing._propagation import B3Propagation, W3CPropagation, \
+    parse_b3, parse_traceparent
+from grpc_opentracing.recording import recording_tracer
+import opentracing
+
+
+class ParseTest(unittest.TestCase):
+    """Test the parsing of W3C traceparent and B3 header values."""
+
+    def testTraceparent(self):
+        self.assertEqual(
+            parse_traceparent(
+                '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'),
+            (0x0af7651916cd43dd8448eb211c80319c, 0xb7ad6b7169203331, True))
+        # Later versions may append fields.
+        self.assertEqual(
+            parse_traceparent(
+                '01-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00-x'),
+            (0x0af7651916cd43dd8448eb211c80319c, 0xb7ad6b7169203331, False))
+        for value in (
+                '', '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331',
+                '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01-',
+                '00-0x0af7651916cd43dd8448eb211c8031-b7ad6b7169203331-01',
+                '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-0g',
+                '00-0af7651916cd43dd8448eb211c80319c-b7ad6b71692033 1-01',
+                '00-0af7651916cd43dd8448eb211c80319c-b7ad6b71692033+1-01',
+                '00_0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01',
+                'ff-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01',
+                '00-00000000000000000000000000000000-b7ad6b7169203331-01',
+                '00-0af7651916cd43dd8448eb211c80319c-0000000000000000-01',
+                '00-0AF7651916CD43DD8448EB211C80319C-b7ad6b7169203331-01',
+                '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-0B'):
+            self.assertRaises(opentracing.SpanContextCorruptedException,
+                              parse_traceparent, value)
+
+    def testB3(self):
+        self.assertEqual(
+            parse_b3('80f198ee56343ba864fe8b2a57d3eff7-e457b5a2e4d86bd1-1-'
+                     '05e3ac9a4f6e3b90'),
+            (0x80f198ee56343ba864fe8b2a57d3eff7, 0xe457b5a2e4d86bd1, True))
+        self.assertEqual(
+            parse_b3('64fe8b2a57d3eff7-e457b5a2e4d86bd1-0'),
+            (0x64fe8b2a57d3eff7, 0xe457b5a2e4d86bd1, False))
+        self.assertEqual(
+            parse_b3('64fe8b2a57d3eff7-e457b5a2e4d86bd1'),
+            (0x64fe8b2a57d3eff7, 0xe457b5a2e4d86bd1, None))
+        self.assertIsNone(parse_b3('0'))
+        for value in ('64fe8b2a57d3eff7', '64fe8b2a57d3eff7-e457b5a2e4d86bd',
+                      '64fe8b2a57d3eff7-e457b5a2e4d86bd1-x',
+                      '64fe8b2a57d3eff7-e457b5a2e4d86bd1-10',
+                      '64fe8b2a57d3eff7-e457b5a2e4d86bg1-1',
+                      '0000000000000000-e457b5a2e4d86bd1-1',
+                      '64fe8b2a57d3eff7-0000000000000000-1',
+                      '64FE8B2A57D3EFF7-e457b5a2e4d86bd1-1'):
+            self.assertRaises(opentracing.SpanContextCorruptedException,
+                              parse_b3, value)
+
+
+class _SpanContext(opentracing.SpanContext):
+
+    def __init__(self, trace_id, span_id):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+class InjectTest(unittest.TestCase):
+    """Test that the codecs do not inject invalid span contexts."""
+
+    def testZeroIds(self):
+        for codec in (W3CPropagation(), B3Propagation()):
+            for span_context in (_SpanContext(0, 1), _SpanContext(1, 0)):
+                self.assertRaises(opentracing.SpanContextCorruptedException,
+                                  codec.inject, None, span_context, ())
+            self.assertEqual(len(codec.inject(None, _SpanContext(1, 1), ())), 1)
+
+
+class PropagationCodecTest(unittest.TestCase):
+    """Test that the built-in codecs propagate span contexts between the
+  interceptors."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+
+    def _check_propagation(self, codec, key):
+        service = Service([
+            open_tracing_client_interceptor(
+                self._tracer, propagation_codec=codec)
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer, propagation_codec=codec)
+        ])
+        service.unary_unary_multi_callable(b'\x01')
+        keys = [key for key, _ in service.handler.invocation_metadata]
+        self.assertIn(key, keys)
+        self.assertFalse([key for key in keys if key.startswith('ot-tracer-')])
+        client_span = self._tracer.find_spans(tags={'span.kind': 'client'})[0]
+        server_span = self._tracer.find_spans(tags={'span.kind': 'server'})[0]
+        self.assertEqual(server_span.trace_id, client_span.trace_id)
+        self.assertEqual(
+            self._tracer.get_relationship(client_span.span_id,
+                                          server_span.span_id),
+            opentracing.ReferenceType.CHILD_OF)
+
+    def testW3C(self):
+        self._check_propagation('w3c', 'traceparent')
+
+    def testB3(self):
+        self._check_propagation('b3', 'b3')
+
+    def testTee(self):
+        tracers = [self._tracer, recording_tracer()]
+        service = Service([
+            open_tracing_client_interceptor(tracers, propagation_codec='w3c')
+        ], [open_tracing_server_interceptor(tracers, propagation_codec='w3c')])
+        service.unary_unary_multi_callable(b'\x01')
+        server_span = self._tracer.find_spans(tags={'span.kind': 'server'})[0]
+        self.assertIsNotNone(server_span.parent_id)
+
+    def testCorruptedContext(self):
+        service = Service([], [
+            open_tracing_server_interceptor(
+                self._tracer, propagation_codec='w3c')
+        ])
+        service.unary_unary_multi_callable(b'\x01', None,
+                                           (('traceparent', 'corrupted'),))
+        server_span = self._tracer.find_spans()[0]
+        self.assertIsNone(server_span.parent_id)
+        self.assertEqual(server_span.logs[0][1]['event'], 'error')
+
+    def testInvalidOptions(self):
+        self.assertRaises(
+            ValueError,
+            open_tracing_client_interceptor,
+            self._tracer,
+            propagation_codec='jaeger')
+        self.assertRaises(
+            ValueError,
+            open_tracing_server_interceptor,
+            opentracing.Tracer(),
+            propagation_codec='w3c')
+        self.assertRaises(
+            ValueError,
+            open_tracing_server_interceptor,
+            self._tracer,
+            binary_metadata_key='ot-span-context-bin',
+            propagation_codec='w3c')
+
+
+class _ActiveSpanSource(ActiveSpanSource):
+
+    def __init__(self, span):
+        self._span = span
+
+    def get_active_span(self):
+        return self._span
+
+
+class BaggageLimitsTest(unittest.TestCase):
+    """Test that baggage beyond the limits is not propagated."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+        self._parent = self._tracer.start_span('parent')
+        for key in ('a', 'b', 'c'):
+            self._parent.set_baggage_item(key, key * 10)
+
+    def _baggage(self, client_limits=None, server_limits=None):
+        baggage = {}
+
+        def span_decorator(span, rpc_info):
+            baggage.update(span.context.baggage)
+
+        service = Service([
+            open_tracing_client_interceptor(
+                self._tracer,
+                active_span_source=_ActiveSpanSource(self._parent),
+                baggage_limits=client_limits)
+        ], [
+            open_tracing_server_interceptor(
+                self._tracer,
+                span_decorator=span_decorator,
+                baggage_limits=server_limits)
+        ])
+        service.unary_unary_multi_callable(b'\x01')
+        metadata_keys = sorted(
+            key for key, _ in service.handler.invocation_metadata
+            if key.startswith('ot-baggage-'))
+        return metadata_keys, baggage
+
+    def testMaxItems(self):
+        limits = baggage_limits(max_items=2)
+        metadata_keys, _ = self._baggage(client_limits=limits)
+        self.assertEqual(len(metadata_keys), 2)
+        self.assertEqual(limits.counters(), {
+            'disallowed': 0,
+            'over_max_items': 1,
+            'over_max_bytes': 0
+        })
+
+    def testMaxBytes(self):
+        limits = baggage_limits(max_bytes=len('ot-baggage-a') + 10)
+        metadata_keys, _ = self._baggage(client_limits=limits)
+        self.assertEqual(len(metadata_keys), 1)
+        self.assertEqual(limits.counters()['over_max_bytes'], 2)
+
+    def testAllowedKeys(self):
+        limits = baggage_limits(allowed_keys=['b'])
+        metadata_keys, baggage = self._baggage(server_limits=limits)
+        # The client sends all items but the server only extracts one.
+        self.assertEqual(metadata_keys,
+                         ['ot-baggage-a', 'ot-baggage-b', 'ot-baggage-c'])
+        self.assertEqual(baggage, {'b': 'b' * 10})
+        self.assertEqual(limits.counters()['disallowed'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
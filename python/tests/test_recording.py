@@ -0,0 +1,146 @@
+import gc
+import threading
+import unittest
+
+from _service import Service
+from grpc_opentracing import open_tracing_client_interceptor, open_tracing_server_interceptor
+from grpc_opentracing.recording import recording_tracer
+import opentracing
+
+
+class RecordingTracerTest(unittest.TestCase):
+    """Test that the recording tracer records and queries spans."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+
+    def testRecordsRpcSpans(self):
+        service = Service([open_tracing_client_interceptor(self._tracer)],
+                          [open_tracing_server_interceptor(self._tracer)])
+        service.unary_unary_multi_callable(b'\x01')
+
+        client_spans = self._tracer.find_spans(tags={'span.kind': 'client'})
+        server_spans = self._tracer.find_spans(tags={'span.kind': 'server'})
+        self.assertEqual(len(client_spans), 1)
+        self.assertEqual(len(server_spans), 1)
+        client_span, server_span = client_spans[0], server_spans[0]
+        self.assertEqual(client_span.operation_name, '/test/UnaryUnary')
+        self.assertEqual(server_span.parent_id, client_span.span_id)
+        self.assertEqual(server_span.trace_id, client_span.trace_id)
+        self.assertEqual(server_span.reference_type,
+                         opentracing.ReferenceType.CHILD_OF)
+        self.assertLessEqual(client_span.start_time, server_span.start_time)
+        self.assertEqual(
+            self._tracer.find_spans(parent_id=client_span.span_id)[0].span_id,
+            server_span.span_id)
+
+    def testColumns(self):
+        with self._tracer.start_span('root', tags={'a': 1}) as root:
+            root.log_kv({'event': 'x'})
+            with self._tracer.start_span('child', child_of=root) as child:
+                child.set_tag('b', 2)
+                child.set_tag('c', 3)
+        columns = self._tracer.columns()
+        self.assertEqual(list(columns.span_id), [2, 1])
+        self.assertEqual(list(columns.parent_id), [1, -1])
+        self.assertEqual(list(columns.trace_id), [1, 1])
+        self.assertEqual(
+            [columns.strings[operation] for operation in columns.operation],
+            ['child', 'root'])
+        self.assertEqual(list(columns.tag_offsets), [0, 2, 3])
+        self.assertEqual(list(columns.log_offsets), [0, 0, 1])
+        self.assertEqual(columns.log_fields, [{'event': 'x'}])
+        self.assertEqual(self._tracer.get_span(1).logs[0][1], {'event': 'x'})
+        self.assertEqual(self._tracer.get_span(2).tags, {'b': 2, 'c': 3})
+
+    def testConcurrentSpans(self):
+
+        def record():
+            for _ in range(500):
+                with self._tracer.start_span('op') as span:
+                    span.set_tag('thread', threading.current_thread().name)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        columns = self._tracer.columns()
+        self.assertEqual(sorted(columns.span_id), list(range(1, 4001)))
+        self.assertEqual(self._tracer.counters()['recorded'], 4000)
+
+    def testMaxSpans(self):
+        tracer = recording_tracer(max_spans=2)
+        for _ in range(3):
+            tracer.start_span('op').finish()
+        self.assertEqual(tracer.counters(), {'recorded': 2, 'dropped': 1})
+        tracer.clear()
+        self.assertEqual(tracer.counters(), {'recorded': 0, 'dropped': 0})
+
+    def testReferences(self):
+        parent = self._tracer.start_span('parent')
+        previous = self._tracer.start_span('previous')
+        span = self._tracer.start_span(
+            'op',
+            child_of=parent,
+            references=[opentracing.follows_from(previous.context)])
+        expected = [(parent.span_id, opentracing.ReferenceType.CHILD_OF),
+                    (previous.span_id, opentracing.ReferenceType.FOLLOWS_FROM)]
+        self.assertEqual(span.references, expected)
+        span.finish()
+        self.assertEqual(self._tracer.get_span(span.span_id).references,
+                         expected)
+        self.assertEqual(
+            self._tracer.get_relationship(previous.span_id, span.span_id),
+            opentracing.ReferenceType.FOLLOWS_FROM)
+        columns = self._tracer.columns()
+        self.assertEqual(list(columns.link_offsets), [0, 1])
+        self.assertEqual(list(columns.link_ids), [previous.span_id])
+        for referenced in (parent, previous):
+            self.assertEqual([
+                found.span_id
+                for found in self._tracer.find_spans(
+                    parent_id=referenced.span_id)
+            ], [span.span_id])
+
+    def testUnfinishedSpans(self):
+        span = self._tracer.start_span('op')
+        span_id = span.span_id
+        self.assertFalse(self._tracer.get_span(span_id).finished)
+        del span
+        gc.collect()
+        self.assertIsNone(self._tracer.get_span(span_id))
+        self.assertEqual(len(self._tracer._open_spans), 0)
+
+    def testPropagation(self):
+        span = self._tracer.start_span('op')
+        span.set_baggage_item('user', 'alice')
+        carrier = {}
+        self._tracer.inject(span.context, opentracing.Format.HTTP_HEADERS,
+                            carrier)
+        span_context = self._tracer.extract(opentracing.Format.HTTP_HEADERS,
+                                            carrier)
+        self.assertEqual(span_context.span_id, span.context.span_id)
+        self.assertEqual(span_context.baggage, {'user': 'alice'})
+        self.assertIsNone(
+            self._tracer.extract(opentracing.Format.HTTP_HEADERS, {}))
+        self.assertRaises(opentracing.SpanContextCorruptedException,
+                          self._tracer.extract,
+                          opentracing.Format.HTTP_HEADERS,
+                          {'ot-tracer-traceid': 'x', 'ot-tracer-spanid': '1'})
+
+    def testBinaryPropagation(self):
+        span = self._tracer.start_span('op')
+        span.set_baggage_item('user', 'alice')
+        carrier = bytearray()
+        self._tracer.inject(span.context, opentracing.Format.BINARY, carrier)
+        span_context = self._tracer.extract(opentracing.Format.BINARY,
+                                            bytes(carrier))
+        self.assertEqual(span_context.trace_id, span.context.trace_id)
+        self.assertEqual(span_context.span_id, span.context.span_id)
+        self.assertEqual(span_context.baggage, {'user': 'alice'})
+        self.assertIsNone(
+            self._tracer.extract(opentracing.Format.BINARY, bytearray()))
+        self.assertRaises(opentracing.SpanContextCorruptedException,
+                          self._tracer.extract, opentracing.Format.BINARY,
+                          carrier[:-1])
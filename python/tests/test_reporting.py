@@ -0,0 +1,317 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+    from opentelemetry.proto.collector.trace.v1 import trace_service_pb2
+except ImportError:
+    trace_service_pb2 = None
+
+from _service import Service
+from grpc_opentracing.recording import recording_tracer
+from grpc_opentracing import open_tracing_client_interceptor, open_tracing_server_interceptor
+from grpc_opentracing.reporting import SpanSink, batching_tracer, \
+    file_sink, read_span_files, ring_file_reader, ring_file_sink
+import opentracing
+
+
+class _CollectingSink(SpanSink):
+
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+
+    def export(self, spans):
+        self.batches.append(list(spans))
+
+    def close(self):
+        self.closed = True
+
+
+class BatchingTracerTest(unittest.TestCase):
+    """Test that the batching tracer hands finished RPC spans to its sink."""
+
+    def setUp(self):
+        self._tracer = recording_tracer()
+
+    def _service(self, tracer):
+        return Service([open_tracing_client_interceptor(tracer)],
+                       [open_tracing_server_interceptor(tracer)])
+
+    def testFinishesWrappedSpans(self):
+        tracer = batching_tracer(self._tracer)
+        service = self._service(tracer)
+        service.unary_unary_multi_callable(b'\x01')
+        self.assertFalse(self._tracer.get_span(1).finished)
+        self.assertTrue(tracer.close(5))
+
+        span0 = self._tracer.get_span(1)
+        self.assertTrue(span0.finished)
+        self.assertEqual(span0.get_tag('span.kind'), 'client')
+        span1 = self._tracer.get_span(2)
+        self.assertTrue(span1.finished)
+        self.assertEqual(span1.get_tag('span.kind'), 'server')
+        self.assertEqual(
+            self._tracer.get_relationship(1, 2),
+            opentracing.ReferenceType.CHILD_OF)
+        self.assertEqual(tracer.counters()['flushed'], 2)
+
+    def testBatchesBySize(self):
+        sink = _CollectingSink()
+        tracer = batching_tracer(
+            self._tracer,
+            sink,
+            max_batch_size=4,
+            max_batch_delay=60,
+            buffer_size=2)
+        service = self._service(tracer)
+        for _ in range(4):
+            service.unary_unary_multi_callable(b'\x01')
+        self.assertTrue(tracer.close(5))
+
+        self.assertTrue(sink.closed)
+        spans = [span for batch in sink.batches for span in batch]
+        self.assertEqual(len(spans), 8)
+        self.assertTrue(all(len(batch) <= 4 for batch in sink.batches))
+        for span in spans:
+            self.assertEqual(span.operation_name, '/test/UnaryUnary')
+            self.assertGreaterEqual(span.finish_time, span.start_time)
+        counters = tracer.counters()
+        self.assertEqual(counters['flushed'], 8)
+        self.assertEqual(counters['dropped'], 0)
+
+    def testIgnoresRepeatedFinish(self):
+        sink = _CollectingSink()
+        tracer = batching_tracer(self._tracer, sink)
+        span = tracer.start_span('a')
+        span.finish(1.0)
+        span.finish(2.0)
+        self.assertTrue(tracer.close(5))
+
+        spans = [span for batch in sink.batches for span in batch]
+        self.assertEqual(len(spans), 1)
+        self.assertEqual(spans[0].finish_time, 1.0)
+        self.assertEqual(tracer.counters()['flushed'], 1)
+
+    def testBatchesByTime(self):
+        sink = _CollectingSink()
+        tracer = batching_tracer(self._tracer, sink, max_batch_delay=0.05)
+        tracer.start_span('a').finish()
+        exported = threading.Event()
+        for _ in range(100):
+            if sink.batches:
+                exported.set()
+                break
+            exported.wait(0.05)
+        self.assertTrue(exported.is_set())
+        self.assertEqual(sink.batches[0][0].operation_name, 'a')
+        tracer.close(5)
+
+    def testDropsWhenQueueIsFull(self):
+        blocked = threading.Event()
+        release = threading.Event()
+
+        class _BlockingSink(SpanSink):
+
+            def export(self, spans):
+                blocked.set()
+                release.wait()
+
+        tracer = batching_tracer(
+            self._tracer,
+            _BlockingSink(),
+            max_batch_size=1,
+            max_queue_size=1,
+            buffer_size=1)
+        tracer.start_span('a').finish()
+        self.assertTrue(blocked.wait(5))
+        for _ in range(3):
+            tracer.start_span('b').finish()
+        release.set()
+        tracer.close(5)
+        counters = tracer.counters()
+        self.assertEqual(counters['queued'] + counters['dropped'], 4)
+        self.assertGreater(counters['dropped'], 0)
+
+
+class RingFileSinkTest(unittest.TestCase):
+    """Test that spans written to a ring file can be read back."""
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = os.path.join(self._directory, 'spans.ring')
+        self._tracer = recording_tracer()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def testReadsRpcSpans(self):
+        sink = ring_file_sink(self._path)
+        tracer = batching_tracer(self._tracer, sink)
+        service = Service([open_tracing_client_interceptor(tracer)],
+                          [open_tracing_server_interceptor(tracer)])
+        service.unary_unary_multi_callable(b'\x01')
+        self.assertTrue(tracer.close(5))
+
+        reader = ring_file_reader(self._path)
+        spans = sorted(reader.read(), key=lambda span: span.span_id)
+        self.assertEqual(len(spans), 2)
+        client_span, server_span = spans
+        self.assertEqual(client_span.operation_name, '/test/UnaryUnary')
+        self.assertEqual(client_span.tags['span.kind'], 'client')
+        self.assertEqual(server_span.tags['span.kind'], 'server')
+        self.assertEqual(server_span.trace_id, client_span.trace_id)
+        self.assertEqual(server_span.parent_id, client_span.span_id)
+        self.assertEqual(server_span.reference_type,
+                         opentracing.ReferenceType.CHILD_OF)
+        self.assertIsNone(client_span.parent_id)
+        self.assertGreaterEqual(client_span.finish_time,
+                                client_span.start_time)
+        self.assertEqual(reader.read(), [])
+        reader.close()
+
+    def testFollowsWrites(self):
+        sink = ring_file_sink(self._path, capacity=1024)
+        tracer = batching_tracer(self._tracer, sink)
+        reader = ring_file_reader(self._path)
+        for round in range(20):
+            for index in range(2):
+                span = tracer.start_span('%d.%d' % (round, index))
+                span.log_kv({'event': 'x' * 20})
+                span.finish()
+            self.assertTrue(tracer.flush(5))
+            self.assertEqual([span.operation_name for span in reader.read()],
+                             ['%d.0' % round, '%d.1' % round])
+        self.assertEqual(reader.overruns(), 0)
+        self.assertGreater(sink.counters()['overwritten'], 0)
+        tracer.close(5)
+        reader.close()
+
+    def testOverrun(self):
+        sink = ring_file_sink(self._path, capacity=1024)
+        reader = ring_file_reader(self._path)
+        tracer = batching_tracer(self._tracer, sink)
+        for index in range(50):
+            tracer.start_span(str(index)).finish()
+        tracer.start_span('large', tags={'payload': 'x' * 2048}).finish()
+        self.assertTrue(tracer.close(5))
+
+        spans = reader.read()
+        self.assertEqual(reader.overruns(), 1)
+        self.assertEqual(spans[-1].operation_name, '49')
+        self.assertLess(len(spans), 50)
+        counters = sink.counters()
+        self.assertEqual(counters['written'], 50)
+        self.assertEqual(counters['dropped'], 1)
+        self.assertEqual(counters['overwritten'], 50 - len(spans))
+        reader.close()
+
+    def testReopen(self):
+        sink = ring_file_sink(self._path, capacity=1024)
+        tracer = batching_tracer(self._tracer, sink)
+        tracer.start_span('a').finish()
+        self.assertTrue(tracer.close(5))
+        reader = ring_file_reader(self._path, from_start=False)
+
+        sink = ring_file_sink(self._path, capacity=1024)
+        tracer = batching_tracer(self._tracer, sink)
+        tracer.start_span('b').finish()
+        self.assertTrue(tracer.close(5))
+        self.assertEqual([span.operation_name for span in reader.read()],
+                         ['b'])
+        reader.close()
+        reader = ring_file_reader(self._path)
+        self.assertEqual([span.operation_name for span in reader.read()],
+                         ['a', 'b'])
+        reader.close()
+
+
+class FileSinkTest(unittest.TestCase):
+    """Test that spans written to rotated files can be read back."""
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._prefix = os.path.join(self._directory, 'spans')
+        self._tracer = recording_tracer()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _write_rpc(self, **kwargs):
+        sink = file_sink(self._prefix, **kwargs)
+        tracer = batching_tracer(self._tracer, sink)
+        service = Service([open_tracing_client_interceptor(tracer)],
+                          [open_tracing_server_interceptor(tracer)])
+        service.unary_unary_multi_callable(b'\x01')
+        self.assertTrue(tracer.close(5))
+        return sink
+
+    def _check_rpc_spans(self, spans):
+        spans = sorted(spans, key=lambda span: span.span_id)
+        self.assertEqual(len(spans), 2)
+        client_span, server_span = spans
+        self.assertEqual(client_span.operation_name, '/test/UnaryUnary')
+        self.assertEqual(client_span.tags['span.kind'], 'client')
+        self.assertEqual(server_span.tags['span.kind'], 'server')
+        self.assertEqual(server_span.trace_id, client_span.trace_id)
+        self.assertEqual(server_span.parent_id, client_span.span_id)
+        self.assertEqual(server_span.reference_type,
+                         opentracing.ReferenceType.CHILD_OF)
+        self.assertIsNone(client_span.parent_id)
+        self.assertGreaterEqual(server_span.finish_time,
+                                server_span.start_time)
+
+    def testJson(self):
+        sink = self._write_rpc()
+        self.assertEqual(sink.counters(), {'written': 2, 'files': 1})
+        self.assertEqual(
+            os.listdir(self._directory), ['spans.000000.jsonl'])
+        self._check_rpc_spans(read_span_files(self._prefix))
+
+    def testCompressed(self):
+        self._write_rpc(compress=True)
+        path = self._prefix + '.000000.jsonl.gz'
+        self.assertEqual(os.listdir(self._directory), [os.path.basename(path)])
+        self._check_rpc_spans(read_span_files(path))
+
+    @unittest.skipIf(trace_service_pb2 is None,
+                     'opentelemetry-proto is not installed')
+    def testOtlp(self):
+        self._write_rpc(format='otlp', resource={'service.name': 'test'})
+        self._check_rpc_spans(read_span_files(self._prefix))
+        with open(self._prefix + '.000000.otlp', 'rb') as stream:
+            data = stream.read()
+        # A single batch, prefixed by its length as a varint.
+        start = 1
+        while bytearray(data)[start - 1] & 0x80:
+            start += 1
+        request = trace_service_pb2.ExportTraceServiceRequest()
+        request.ParseFromString(data[start:])
+        resource = request.resource_spans[0].resource
+        self.assertEqual(resource.attributes[0].value.string_value, 'test')
+
+    def testRotation(self):
+        sink = file_sink(self._prefix, max_bytes=1, max_files=3)
+        tracer = batching_tracer(self._tracer, sink)
+        for index in range(5):
+            tracer.start_span(str(index)).finish()
+            self.assertTrue(tracer.flush(5))
+        self.assertTrue(tracer.close(5))
+        self.assertEqual(sink.counters(), {'written': 5, 'files': 5})
+        self.assertEqual(
+            sorted(os.listdir(self._directory)),
+            ['spans.%06d.jsonl' % index for index in (2, 3, 4)])
+        self.assertEqual(
+            [span.operation_name for span in read_span_files(self._prefix)],
+            ['2', '3', '4'])
+
+        # A new sink continues after the existing files.
+        sink = file_sink(self._prefix)
+        tracer = batching_tracer(self._tracer, sink)
+        tracer.start_span('5').finish()
+        self.assertTrue(tracer.close(5))
+        self.assertEqual(
+            [span.operation_name for span in read_span_files(self._prefix)],
+            ['2', '3', '4', '5'])
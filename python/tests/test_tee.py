@@ -0,0 +1,75 @@
+import unittest
+
+from _service import Service
+from grpc_opentracing import open_tracing_client_interceptor, open_tracing_server_interceptor
+from grpc_opentracing import _tee
+from grpc_opentracing.recording import recording_tracer
+import opentracing
+
+
+class TeeTracerTest(unittest.TestCase):
+    """Test that interceptors given several tracers create spans in each."""
+
+    def setUp(self):
+        self._primary = recording_tracer()
+        self._secondary = recording_tracer()
+        self._decorated = []
+
+        def span_decorator(span, rpc_info):
+            self._decorated.append(rpc_info.full_method)
+            span.set_tag('decorated', True)
+
+        tracers = [self._primary, self._secondary]
+        self._service = Service([
+            open_tracing_client_interceptor(
+                tracers, log_payloads=True, span_decorator=span_decorator)
+        ], [
+            open_tracing_server_interceptor(
+                tracers, log_payloads=True, span_decorator=span_decorator)
+        ])
+
+    def _check_spans(self, tracer):
+        client_span = tracer.find_spans(tags={'span.kind': 'client'})[0]
+        server_span = tracer.find_spans(tags={'span.kind': 'server'})[0]
+        for span in (client_span, server_span):
+            self.assertEqual(span.operation_name, '/test/UnaryUnary')
+            self.assertTrue(span.get_tag('decorated'))
+            self.assertEqual(
+                [list(key_values) for _, key_values in span.logs],
+                [['request'], ['response']])
+        return client_span, server_span
+
+    def testUnaryUnary(self):
+        self._service.unary_unary_multi_callable(b'\x01')
+        self.assertEqual(self._decorated, ['/test/UnaryUnary'] * 2)
+
+        client_span, server_span = self._check_spans(self._primary)
+        self.assertEqual(
+            self._primary.get_relationship(client_span.span_id,
+                                           server_span.span_id),
+            opentracing.ReferenceType.CHILD_OF)
+        # The secondary tracer does not see the propagated context.
+        client_span, server_span = self._check_spans(self._secondary)
+        self.assertIsNone(server_span.parent_id)
+
+    def testInjectsOnce(self):
+        service = Service([
+            open_tracing_client_interceptor(
+                [self._primary, self._secondary])
+        ], [])
+        service.unary_unary_multi_callable(b'\x01')
+        metadata = dict(service.handler.invocation_metadata)
+        self.assertIn('ot-tracer-spanid', metadata)
+        self.assertEqual(
+            int(metadata['ot-tracer-spanid'], 16),
+            self._primary.find_spans()[0].span_id)
+
+    def testLocalParent(self):
+        tracer = _tee.tee([self._primary, self._secondary])
+        parent = tracer.start_span('parent')
+        tracer.start_span('child', child_of=parent).finish()
+        parent.finish()
+        for recorder in (self._primary, self._secondary):
+            child = recorder.find_spans(operation_name='child')[0]
+            parent_span = recorder.find_spans(operation_name='parent')[0]
+            self.assertEqual(child.parent_id, parent_span.span_id)